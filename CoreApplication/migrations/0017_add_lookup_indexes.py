@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoreApplication', '0016_alter_purchaseorder_delivery_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='collectionitem',
+            name='product_id',
+            field=models.BigIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='customer_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderlineitem',
+            name='order_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderlineitem',
+            name='product_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderlineitem',
+            name='variant_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='product_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='sku',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
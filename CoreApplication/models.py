@@ -87,10 +87,10 @@ class ProductVariant(models.Model):
     company = models.ForeignKey(
         "CompanyUser", on_delete=models.CASCADE, related_name="variants")
     product_id = models.BigIntegerField(
-        null=True, blank=True)  # Shopify product ID only
+        null=True, blank=True, db_index=True)  # Shopify product ID only
 
     title = models.CharField(max_length=255, null=True, blank=True)
-    sku = models.CharField(max_length=255, blank=True, null=True)
+    sku = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True)
     compare_at_price = models.DecimalField(
@@ -111,8 +111,8 @@ class Order(models.Model):
     company = models.ForeignKey(
         "CompanyUser", on_delete=models.CASCADE, related_name="orders")
     customer_id = models.BigIntegerField(
-        null=True, blank=True)  # Shopify customer ID
-    order_number = models.CharField(max_length=255, null=True, blank=True)
+        null=True, blank=True, db_index=True)  # Shopify customer ID
+    order_number = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     order_date = models.DateTimeField(null=True, blank=True)
     fulfillment_status = models.CharField(
         max_length=255, null=True, blank=True)
@@ -143,11 +143,11 @@ class OrderLineItem(models.Model):
     company = models.ForeignKey(
         "CompanyUser", on_delete=models.CASCADE, related_name="line_items")
     order_id = models.BigIntegerField(
-        null=True, blank=True)  # Shopify order ID
+        null=True, blank=True, db_index=True)  # Shopify order ID
     product_id = models.BigIntegerField(
-        null=True, blank=True)  # Shopify product ID
+        null=True, blank=True, db_index=True)  # Shopify product ID
     variant_id = models.BigIntegerField(
-        null=True, blank=True)  # Shopify variant ID
+        null=True, blank=True, db_index=True)  # Shopify variant ID
     quantity = models.IntegerField(null=True, blank=True)
     price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True)
@@ -239,7 +239,7 @@ class Collection(models.Model):
 class CollectionItem(models.Model):
     collection = models.ForeignKey(
         Collection, on_delete=models.CASCADE, related_name="items")
-    product_id = models.BigIntegerField()
+    product_id = models.BigIntegerField(db_index=True)
     image_src = models.URLField(
         blank=True, null=True)  # Added image field here
     created_at = models.DateTimeField(auto_now_add=True)
@@ -7,13 +7,12 @@ from CoreApplication.models import CompanyUser
 from .models import CompanyUser, Collection, CollectionItem
 from .models import PromotionalData
 from django.utils.decorators import method_decorator
+from django.utils import timezone
 from django.http import JsonResponse
 from django.views import View
 from datetime import date
 import pandas as pd
 from celery import chain
-from sentence_transformers import SentenceTransformer
-import chromadb
 import base64
 import hmac
 import hashlib
@@ -38,6 +37,15 @@ from CoreApplication.models import (
     CompanyUser, Customer, Product, ProductVariant, Order, OrderLineItem, Prompt
 )
 import secrets
+from vectordb.changes import clear_changes, mark_built, mark_queued, record_changes, reindex_changes, tenants_due
+from vectordb.compaction import compact_tenant_index
+from vectordb.documents import INDEXED_TYPES, vector_id
+from vectordb.embeddings import encode_texts
+from vectordb.enrichment import attach_orders
+from vectordb.neighbours import compute_product_neighbours
+from vectordb.query_planner import parse_types, search as search_vectors
+from vectordb.store import delete_vectors, drop_obsolete_collections, upsert_vectors
+from vectordb.training import iter_index_batches, prefetch
 
 logger = logging.getLogger(__name__)
 
@@ -165,9 +173,10 @@ def fetch_shopify_data_task(self, company_user_id):
         # Customers
         url = f"https://{shopify_store_url}/admin/api/2025-01/customers.json?limit=250"
         for page_no, page in enumerate(fetch_pages(url, headers), start=1):
+            changed = []
             for c in page:
                 addr = c.get("default_address") or {}
-                Customer.objects.update_or_create(
+                customer, _ = Customer.objects.update_or_create(
                     shopify_id=c.get("id"),
                     defaults={
                         "company": user,
@@ -184,10 +193,13 @@ def fetch_shopify_data_task(self, company_user_id):
                         "total_spent": sanitize_decimal(c.get("total_spent")),
                     },
                 )
+                changed.append(customer.pk)
+            record_changes(company_user_id, "customer", changed)
 
         # Products & Variants
         url = f"https://{shopify_store_url}/admin/api/2025-01/products.json?limit=250"
         for page_no, page in enumerate(fetch_pages(url, headers), start=1):
+            changed_products, changed_variants = [], []
             for p in page:
                 product, _ = Product.objects.update_or_create(
                     shopify_id=p.get("id"),
@@ -202,8 +214,9 @@ def fetch_shopify_data_task(self, company_user_id):
                         "updated_at": p.get("updated_at"),
                     },
                 )
+                changed_products.append(product.pk)
                 for v in p.get("variants") or []:
-                    ProductVariant.objects.update_or_create(
+                    variant, _ = ProductVariant.objects.update_or_create(
                         shopify_id=v.get("id"),
                         defaults={
                             "company": user,
@@ -218,11 +231,15 @@ def fetch_shopify_data_task(self, company_user_id):
                             "updated_at": v.get("updated_at"),
                         },
                     )
+                    changed_variants.append(variant.pk)
+            record_changes(company_user_id, "product", changed_products)
+            record_changes(company_user_id, "variant", changed_variants)
 
         # Orders
         url = f"https://{shopify_store_url}/admin/api/2025-01/orders.json?limit=250&status=any"
         total_orders = 0
         for page_no, page in enumerate(fetch_pages(url, headers), start=1):
+            changed_orders, changed_variants = [], []
             for o in page:
                 customer_id = o.get("customer", {}).get(
                     "id") if o.get("customer") else None
@@ -247,6 +264,7 @@ def fetch_shopify_data_task(self, company_user_id):
                         "region": sanitize_text(remove_emoji(addr.get("country"))),
                     },
                 )
+                changed_orders.append(order.pk)
                 for li in o.get("line_items") or []:
                     quantity = li.get("quantity") or 0
                     price = sanitize_decimal(li.get("price"))
@@ -266,6 +284,9 @@ def fetch_shopify_data_task(self, company_user_id):
                             "total": total,
                         },
                     )
+                    changed_variants.append(li.get("variant_id"))
+            record_changes(company_user_id, "order", changed_orders)
+            record_changes(company_user_id, "skumonth", changed_variants)
             total_orders += len(page)
             logger.info(f"✅ Synced {len(page)} orders (page {page_no})")
 
@@ -340,8 +361,8 @@ def process_webhook_task(company_user_id, topic, payload):
                     "country": sanitize_text(remove_emoji(addr.get("country"))),
                 }
             )
-            # Vector DB incremental update
-            update_customer_vector(customer_obj)
+            # Re-embedded by the incremental re-index
+            record_changes(company_user_id, "customer", [customer_obj.pk])
 
         # ---------------- Products ----------------
         elif topic in ["products_create", "products_update"]:
@@ -356,11 +377,16 @@ def process_webhook_task(company_user_id, topic, payload):
                     "status": sanitize_text(remove_emoji(payload.get("status"))),
                 }
             )
-            update_product_vector(product_obj)
+            record_changes(company_user_id, "product", [product_obj.pk])
+            # Variant documents carry the product's title, vendor and type
+            record_changes(company_user_id, "variant", ProductVariant.objects.filter(
+                company_id=company_user_id, product_id=product_obj.shopify_id).values_list("id", flat=True))
 
         elif topic == "products_delete":
-            Product.objects.filter(shopify_id=payload.get("id")).delete()
-            # Optional: remove from vector DB if needed
+            products = Product.objects.filter(shopify_id=payload.get("id"))
+            product_pks = list(products.values_list("id", flat=True))
+            products.delete()
+            delete_vectors(company_user_id, [vector_id("product", pk) for pk in product_pks])
 
         # ---------------- Orders ----------------
         elif topic in ["orders_create", "orders_updated"]:
@@ -376,7 +402,10 @@ def process_webhook_task(company_user_id, topic, payload):
                     "region": sanitize_text(remove_emoji(addr.get("country"))),
                 }
             )
-            update_order_vector(order_obj)
+            record_changes(company_user_id, "order", [order_obj.pk])
+            # Order date/region feed the SKU-month summaries of its items
+            record_changes(company_user_id, "skumonth", OrderLineItem.objects.filter(
+                order_id=order_obj.shopify_id).values_list("variant_id", flat=True))
 
         # ---------------- Order Line Items ----------------
         elif topic in ["order_line_items_create", "order_line_items_update"]:
@@ -393,7 +422,7 @@ def process_webhook_task(company_user_id, topic, payload):
                     "total": payload.get("total")
                 }
             )
-            update_order_line_item_vector(line_item_obj)
+            record_changes(company_user_id, "skumonth", [line_item_obj.variant_id])
 
         # ---------------- Product Variants ----------------
         elif topic in ["product_variants_create", "product_variants_update"]:
@@ -410,7 +439,7 @@ def process_webhook_task(company_user_id, topic, payload):
                     "inventory_quantity": payload.get("inventory_quantity")
                 }
             )
-            update_variant_vector(variant_obj)
+            record_changes(company_user_id, "variant", [variant_obj.pk])
 
         # ---------------- Collections ----------------
         elif topic in ["collections_create", "collections_update"]:
@@ -424,10 +453,16 @@ def process_webhook_task(company_user_id, topic, payload):
                     "image_src": payload.get("image_src")
                 }
             )
-            update_collection_vector(collection_obj)
+            record_changes(company_user_id, "collection", [collection_obj.pk])
 
         elif topic == "collections_delete":
-            Collection.objects.filter(shopify_id=payload.get("id")).delete()
+            collections = Collection.objects.filter(shopify_id=payload.get("id"))
+            vector_ids = [vector_id("collection", pk) for pk in collections.values_list("id", flat=True)]
+            # Items are removed by the cascade, so drop their vectors too
+            vector_ids += [vector_id("collectionitem", pk) for pk in CollectionItem.objects.filter(
+                collection__in=collections).values_list("id", flat=True)]
+            collections.delete()
+            delete_vectors(company_user_id, vector_ids)
 
         # ---------------- Collection Items ----------------
         elif topic in ["collection_items_create", "collection_items_update"]:
@@ -438,7 +473,7 @@ def process_webhook_task(company_user_id, topic, payload):
                     "image_src": payload.get("image_src")
                 }
             )
-            update_collection_item_vector(coll_item_obj)
+            record_changes(company_user_id, "collectionitem", [coll_item_obj.pk])
 
         # ---------------- Promotional Data ----------------
         elif topic in ["promotional_data_create", "promotional_data_update"]:
@@ -458,65 +493,14 @@ def process_webhook_task(company_user_id, topic, payload):
                     "roas": payload.get("roas"),
                 }
             )
-            update_promotional_vector(promo_obj)
+            record_changes(company_user_id, "promo", [promo_obj.pk])
+            record_changes(company_user_id, "skumonth", [promo_obj.variant_id])
 
     except Exception as e:
         logger.error(
             f"❌ Webhook task error ({topic}) for company_user_id={company_user_id}: {e}")
 
 
-# Initialize once globally for efficiency
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-
-def add_or_update_vector(text, metadata, id_prefix, obj_id, company_user_id):
-    folder_path = f"D:/TROOBA_PRODUCTION/chroma_db/tenant_{company_user_id}"
-    client = chromadb.PersistentClient(path=folder_path)
-    collection_name = f"tenant_{company_user_id}"
-    vector_collection = client.get_or_create_collection(name=collection_name)
-
-    vector_collection.add(
-        documents=[text],
-        ids=[f"{id_prefix}_{obj_id}"],
-        embeddings=model.encode([text], convert_to_tensor=False),
-        metadatas=[metadata]
-    )
-
-
-def update_customer_vector(customer):
-    text = f"Customer ID: {customer.id}, Shopify ID: {customer.shopify_id}, Name: {customer.first_name} {customer.last_name}, Email: {customer.email}, Total Spent: {customer.total_spent}"
-    metadata = {
-        "id": customer.id,
-        "shopify_id": customer.shopify_id,
-        "company_id": customer.company_id,
-        "total_spent": float(customer.total_spent or 0)
-    }
-    add_or_update_vector(text, metadata, "customer",
-                         customer.id, customer.company_id)
-
-
-def update_product_vector(product):
-    text = f"Product ID: {product.id}, Shopify ID: {product.shopify_id}, Title: {product.title}, Vendor: {product.vendor}, Product Type: {product.product_type}, Tags: {product.tags}"
-    metadata = {
-        "id": product.id,
-        "shopify_id": product.shopify_id,
-        "company_id": product.company_id
-    }
-    add_or_update_vector(text, metadata, "product",
-                         product.id, product.company_id)
-
-
-def update_order_vector(order):
-    text = f"Order ID: {order.id}, Shopify ID: {order.shopify_id}, Order Number: {order.order_number}, Total: {order.total_price}, Fulfillment: {order.fulfillment_status}, Financial: {order.financial_status}"
-    metadata = {
-        "id": order.id,
-        "shopify_id": order.shopify_id,
-        "company_id": order.company_id,
-        "total_price": float(order.total_price or 0)
-    }
-    add_or_update_vector(text, metadata, "order", order.id, order.company_id)
-
-
 # ---------------- Webhook View ----------------
 @csrf_exempt
 def shopify_webhook_view(request, company_user_id, topic):
@@ -708,6 +692,7 @@ class UploadPromotionalDataView(View):
                 except Exception:
                     return default
 
+            changed_promos, changed_variants = [], []
             for index, row in df.iterrows():
                 raw_variant_id = row.get('variant_id') or row.get(
                     'varient_id')  # handle typo
@@ -727,7 +712,7 @@ class UploadPromotionalDataView(View):
                     continue
 
                 # ✅ Create or update record
-                PromotionalData.objects.update_or_create(
+                promo, _ = PromotionalData.objects.update_or_create(
                     variant_id=variant_id,
                     date=today,
                     defaults={
@@ -748,6 +733,11 @@ class UploadPromotionalDataView(View):
                         'conversion_rate': safe_float(row.get('ConvRate')),
                     }
                 )
+                changed_promos.append(promo.pk)
+                changed_variants.append(variant_id)
+
+            record_changes(user.id, "promo", changed_promos)
+            record_changes(user.id, "skumonth", changed_variants)
 
             return JsonResponse({"message": "Promotional data uploaded successfully"}, status=200)
 
@@ -823,6 +813,7 @@ def fetch_collections_task(self, company_user_id):
             )
             print(
                 f"{'✅ Created' if created else '♻ Updated'} collection '{collection.title}'")
+            record_changes(user.id, "collection", [collection.pk])
 
             # Fetch products for this collection
             collects_url = f"https://{shopify_store_url}/admin/api/2025-01/collects.json?collection_id={collection.shopify_id}"
@@ -835,6 +826,7 @@ def fetch_collections_task(self, company_user_id):
                 continue
 
             collects = collects_resp.json().get("collects", [])
+            changed_items = []
             print(
                 f"📌 Found {len(collects)} products in collection '{collection.title}'")
 
@@ -856,12 +848,14 @@ def fetch_collections_task(self, company_user_id):
                         image_src = images[0].get("src")
 
                 # Save or update product in CollectionItem
-                CollectionItem.objects.update_or_create(
+                item_obj, _ = CollectionItem.objects.update_or_create(
                     collection=collection,
                     product_id=product_id,
                     defaults={"image_src": image_src},
                 )
+                changed_items.append(item_obj.pk)
                 print(f"✅ Product {product_id} saved with image {image_src}")
+            record_changes(user.id, "collectionitem", changed_items)
 
         print("🎉 Collections fetch completed successfully")
         logger.info("Collections fetch completed successfully")
@@ -923,209 +917,136 @@ def fetch_collections_for_all_users():
 logger = logging.getLogger(__name__)
 
 # -----------------------------
-# Helper functions to sanitize metadata
+# Celery Task
 # -----------------------------
 
 
-def safe_int(val):
-    return int(val) if val is not None else 0
+@shared_task(bind=True, max_retries=3)
+def train_vector_db_task(self, previous_result, company_user_id):
+    """
+    Streaming vector training: each table is read page by page, rendered,
+    embedded and written to Chroma one chunk at a time, so worker memory is
+    bounded by VECTOR_TRAINING_CHUNK_SIZE rather than by tenant size. The
+    next chunk is read from the DB while the current one is being encoded.
+    """
+    logger.info(
+        f"🚀 Starting Vector DB training for company_user_id={company_user_id}")
 
+    try:
+        started = timezone.now()
+        chunk_size = settings.VECTOR_TRAINING_CHUNK_SIZE
+        counts = {}
+
+        for entity_type in INDEXED_TYPES:
+            counts[entity_type] = 0
+            batches = prefetch(iter_index_batches(
+                entity_type, company_user_id, chunk_size))
+            for batch_no, (ids, texts, metadatas) in enumerate(batches, start=1):
+                embeddings = encode_texts(texts)
+                upsert_vectors(company_user_id, ids, embeddings, texts, metadatas)
+                counts[entity_type] += len(ids)
+                logger.info(
+                    f"✅ Batch {batch_no} for {entity_type} persisted successfully ({counts[entity_type]} so far).")
+
+        logger.info(f"📦 Data counts — {counts}")
+        # Collections replaced by the per-type split and by SKU-month documents
+        dropped = drop_obsolete_collections(company_user_id)
+        if dropped:
+            logger.info(f"🧹 Dropped obsolete collections: {dropped}")
+        # Everything changed before the build started is now indexed
+        clear_changes(company_user_id, before=started)
+        mark_built(company_user_id, full=True, started=started)
+        logger.info(
+            f"✅ Vector DB training completed for company_user_id={company_user_id}")
 
-def safe_float(val):
-    return float(val) if val is not None else 0.0
+    except Exception as exc:
+        logger.error(
+            f"❌ Vector DB training failed for company_user_id={company_user_id}: {exc}", exc_info=True)
+        self.retry(exc=exc, countdown=60)
 
+# -----------------------------
+# Celery Task: Incremental re-indexing of changed rows
+# -----------------------------
 
-def safe_str(val):
-    return str(val) if val is not None else ""
 
+@shared_task(bind=True, max_retries=3)
+def reindex_vector_changes_task(self, company_user_id):
+    """
+    Re-embed only the rows recorded as changed since the last build
+    (webhooks, syncs, uploads) and remove vectors of deleted rows.
+    """
+    try:
+        counts = reindex_changes(company_user_id, settings.VECTOR_TRAINING_CHUNK_SIZE)
+        logger.info(
+            f"✅ Incremental re-index for company_user_id={company_user_id}: {counts}")
+        return counts
+    except Exception as exc:
+        logger.error(
+            f"❌ Incremental re-index failed for company_user_id={company_user_id}: {exc}", exc_info=True)
+        self.retry(exc=exc, countdown=60)
 
-def safe_bool(val):
-    return bool(val) if val is not None else False
+
+@shared_task
+def schedule_vector_reindexing():
+    """
+    Periodic task: queue an incremental re-index for each tenant with at
+    least VECTOR_REINDEX_THRESHOLD pending changes, or whose oldest pending
+    change is older than VECTOR_REINDEX_MAX_AGE_MINUTES.
+    """
+    due = tenants_due(settings.VECTOR_REINDEX_THRESHOLD, settings.VECTOR_REINDEX_MAX_AGE_MINUTES)
+    for company_user_id in due:
+        mark_queued(company_user_id)
+        reindex_vector_changes_task.delay(company_user_id)
+    if due:
+        logger.info(f"📅 Queued incremental re-index for tenants {due}")
 
 # -----------------------------
-# Celery Task
+# Celery Task: Vector index compaction
 # -----------------------------
 
 
-@shared_task(bind=True, max_retries=3)
-def train_vector_db_task(self, previous_result,company_user_id):
-    logger.info(
-        f"🚀 Starting Vector DB training for company_user_id={company_user_id}")
-
+@shared_task
+def compact_vector_index_task(company_user_id):
+    """
+    Remove vectors whose DB rows no longer exist (deleted products,
+    collections, ...) and report how much the tenant index shrank.
+    """
     try:
-        # Fetch tenant-specific data
-        orders = list(Order.objects.filter(company_id=company_user_id))
-        order_items = list(OrderLineItem.objects.filter(
-            company_id=company_user_id))
-        customers = list(Customer.objects.filter(company_id=company_user_id))
-        collections = list(Collection.objects.filter(
-            company_id=company_user_id))
-        collection_items = list(CollectionItem.objects.filter(
-            collection__company_id=company_user_id))
-        products = list(Product.objects.filter(company_id=company_user_id))
-        variants = list(ProductVariant.objects.filter(
-            company_id=company_user_id))
-        promotions = list(PromotionalData.objects.filter(
-            user_id=company_user_id))
-
-        logger.info(f"📦 Data counts — Orders: {len(orders)}, OrderItems: {len(order_items)}, Customers: {len(customers)}, Collections: {len(collections)}, CollectionItems: {len(collection_items)}, Products: {len(products)}, Variants: {len(variants)}, Promotions: {len(promotions)}")
-
-        # Initialize ChromaDB
-        client = chromadb.PersistentClient(
-            path=f"D:/TROOBA_PRODUCTION/chroma_db/tenant_{company_user_id}")
-        collection_name = f"tenant_{company_user_id}"
-        vector_collection = client.get_or_create_collection(
-            name=collection_name)
-
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        batch_size = 500
-
-        # -----------------------------
-        # Helper for batch processing
-        # -----------------------------
-        def process_batch(items, get_text_fn, get_metadata_fn, id_prefix):
-            for i in range(0, len(items), batch_size):
-                batch = items[i:i+batch_size]
-                texts = [get_text_fn(obj) for obj in batch]
-                embeddings = model.encode(texts, convert_to_tensor=False)
-                ids = [f"{id_prefix}_{safe_int(obj.id)}" for obj in batch]
-                metadatas = [get_metadata_fn(obj) for obj in batch]
-                vector_collection.add(
-                    documents=texts, ids=ids, embeddings=embeddings, metadatas=metadatas)
-                logger.info(
-                    f"✅ Batch {i//batch_size + 1}/{(len(items)-1)//batch_size + 1} for {id_prefix} persisted successfully.")
-
-        # -----------------------------
-        # Metadata & Text functions
-        # -----------------------------
-        def order_text(order):
-            return (
-                f"Order ID: {safe_int(order.id)}, Shopify ID: {safe_int(order.shopify_id)}, Company ID: {safe_int(order.company_id)}, "
-                f"Customer ID: {safe_int(order.customer_id)}, Order Number: {safe_str(order.order_number)}, Order Date: {safe_str(order.order_date)}, "
-                f"Fulfillment Status: {safe_str(order.fulfillment_status)}, Financial Status: {safe_str(order.financial_status)}, Currency: {safe_str(order.currency)}, "
-                f"Total Price: {safe_float(order.total_price)}, Subtotal Price: {safe_float(order.subtotal_price)}, Total Tax: {safe_float(order.total_tax)}, Total Discount: {safe_float(order.total_discount)}, "
-                f"Created At: {safe_str(order.created_at)}, Updated At: {safe_str(order.updated_at)}, Region: {safe_str(order.region)}"
-            )
+        return compact_tenant_index(company_user_id)
+    except Exception as exc:
+        logger.error(
+            f"❌ Vector index compaction failed for company_user_id={company_user_id}: {exc}", exc_info=True)
 
-        def order_metadata(order):
-            return {
-                "id": safe_int(order.id),
-                "shopify_id": safe_int(order.shopify_id),
-                "company_id": safe_int(order.company_id),
-                "customer_id": safe_int(order.customer_id),
-                "total_price": safe_float(order.total_price),
-                "subtotal_price": safe_float(order.subtotal_price),
-                "total_tax": safe_float(order.total_tax),
-                "total_discount": safe_float(order.total_discount)
-            }
-
-        def order_item_text(item):
-            return (
-                f"Line Item ID: {safe_int(item.id)}, Shopify Line Item ID: {safe_int(item.shopify_line_item_id)}, Company ID: {safe_int(item.company_id)}, "
-                f"Order ID: {safe_int(item.order_id)}, Product ID: {safe_int(item.product_id)}, Variant ID: {safe_int(item.variant_id)}, "
-                f"Quantity: {safe_int(item.quantity)}, Price: {safe_float(item.price)}, Discount Allocated: {safe_float(item.discount_allocated)}, Total: {safe_float(item.total)}"
-            )
 
-        def order_item_metadata(item):
-            return {
-                "id": safe_int(item.id),
-                "order_id": safe_int(item.order_id),
-                "product_id": safe_int(item.product_id),
-                "variant_id": safe_int(item.variant_id),
-                "quantity": safe_int(item.quantity),
-                "price": safe_float(item.price)
-            }
-
-        def customer_text(customer):
-            return (
-                f"Customer ID: {safe_int(customer.id)}, Shopify ID: {safe_int(customer.shopify_id)}, Company ID: {safe_int(customer.company_id)}, "
-                f"Email: {safe_str(customer.email)}, First Name: {safe_str(customer.first_name)}, Last Name: {safe_str(customer.last_name)}, "
-                f"Phone: {safe_str(customer.phone)}, Created At: {safe_str(customer.created_at)}, Updated At: {safe_str(customer.updated_at)}, "
-                f"City: {safe_str(customer.city)}, Region: {safe_str(customer.region)}, Country: {safe_str(customer.country)}, Total Spent: {safe_float(customer.total_spent)}"
-            )
+@shared_task
+def compact_all_vector_indexes():
+    """Periodic task: queue compaction for every tenant."""
+    for company_user_id in CompanyUser.objects.values_list("id", flat=True):
+        compact_vector_index_task.delay(company_user_id)
 
-        def customer_metadata(customer):
-            return {
-                "id": safe_int(customer.id),
-                "company_id": safe_int(customer.company_id),
-                "total_spent": safe_float(customer.total_spent)
-            }
-
-        def collection_text(coll):
-            return f"Collection ID: {safe_int(coll.id)}, Company ID: {safe_int(coll.company_id)}, Shopify ID: {safe_int(coll.shopify_id)}, Title: {safe_str(coll.title)}, Handle: {safe_str(coll.handle)}, Updated At: {safe_str(coll.updated_at)}"
-
-        def collection_metadata(coll):
-            return {
-                "id": safe_int(coll.id),
-                "company_id": safe_int(coll.company_id)
-            }
-
-        def collection_item_text(ci):
-            return f"CollectionItem ID: {safe_int(ci.id)}, Collection ID: {safe_int(ci.collection_id)}, Product ID: {safe_int(ci.product_id)}, Image Src: {safe_str(ci.image_src)}"
-
-        def collection_item_metadata(ci):
-            return {
-                "id": safe_int(ci.id),
-                "collection_id": safe_int(ci.collection_id),
-                "product_id": safe_int(ci.product_id)
-            }
-
-        def product_text(product):
-            return f"Product ID: {safe_int(product.id)}, Shopify ID: {safe_int(product.shopify_id)}, Company ID: {safe_int(product.company_id)}, Title: {safe_str(product.title)}, Vendor: {safe_str(product.vendor)}, Product Type: {safe_str(product.product_type)}, Tags: {safe_str(product.tags)}"
-
-        def product_metadata(product):
-            return {
-                "id": safe_int(product.id),
-                "company_id": safe_int(product.company_id)
-            }
-
-        def variant_text(variant):
-            return f"Variant ID: {safe_int(variant.id)}, Shopify ID: {safe_int(variant.shopify_id)}, Company ID: {safe_int(variant.company_id)}, Product ID: {safe_int(variant.product_id)}, Title: {safe_str(variant.title)}, SKU: {safe_str(variant.sku)}, Price: {safe_float(variant.price)}, Compare At Price: {safe_float(variant.compare_at_price)}, Cost: {safe_float(variant.cost)}, Inventory Quantity: {safe_int(variant.inventory_quantity)}"
-
-        def variant_metadata(variant):
-            return {
-                "id": safe_int(variant.id),
-                "company_id": safe_int(variant.company_id),
-                "product_id": safe_int(variant.product_id),
-                "price": safe_float(variant.price),
-                "compare_at_price": safe_float(variant.compare_at_price),
-                "cost": safe_float(variant.cost),
-                "inventory_quantity": safe_int(variant.inventory_quantity)
-            }
-
-        def promo_text(promo):
-            return f"Promo: {safe_str(promo.campaign_name)}, Clicks: {safe_int(promo.clicks)}, Impressions: {safe_int(promo.impressions)}, Cost: {safe_float(promo.cost)}"
-
-        def promo_metadata(promo):
-            return {
-                "clicks": safe_int(promo.clicks),
-                "impressions": safe_int(promo.impressions),
-                "cost": safe_float(promo.cost),
-                "conversions": safe_int(promo.conversions)
-            }
-
-        # -----------------------------
-        # Process all batches
-        # -----------------------------
-        process_batch(orders, order_text, order_metadata, "order")
-        process_batch(order_items, order_item_text,
-                      order_item_metadata, "orderitem")
-        process_batch(customers, customer_text, customer_metadata, "customer")
-        process_batch(collections, collection_text,
-                      collection_metadata, "collection")
-        process_batch(collection_items, collection_item_text,
-                      collection_item_metadata, "collectionitem")
-        process_batch(products, product_text, product_metadata, "product")
-        process_batch(variants, variant_text, variant_metadata, "variant")
-        process_batch(promotions, promo_text, promo_metadata, "promo")
+# -----------------------------
+# Celery Task: Similar-product neighbours
+# -----------------------------
 
-        logger.info(
-            f"✅ Vector DB training completed for company_user_id={company_user_id}")
 
+@shared_task
+def compute_product_neighbours_task(company_user_id):
+    """Recompute the tenant's top-k similar products from the product vectors."""
+    try:
+        count = compute_product_neighbours(company_user_id, settings.PRODUCT_NEIGHBOURS_K)
+        logger.info(
+            f"✅ Product neighbours computed for {count} products of company_user_id={company_user_id}")
+        return count
     except Exception as exc:
         logger.error(
-            f"❌ Vector DB training failed for company_user_id={company_user_id}: {exc}", exc_info=True)
-        self.retry(exc=exc, countdown=60)
+            f"❌ Product neighbours failed for company_user_id={company_user_id}: {exc}", exc_info=True)
+
+
+@shared_task
+def compute_all_product_neighbours():
+    """Periodic task: queue neighbour computation for every tenant."""
+    for company_user_id in CompanyUser.objects.values_list("id", flat=True):
+        compute_product_neighbours_task.delay(company_user_id)
 
 # -----------------------------
 # API View
@@ -1170,74 +1091,30 @@ class VectorDBSearchView(APIView):
         if not query_text:
             return Response({"error": "Query text is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            types = parse_types(request.data.get("types"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             company_user_id = user.id
-            folder_path = f"D:/TROOBA_PRODUCTION/chroma_db/tenant_{company_user_id}"
-            client = chromadb.PersistentClient(path=folder_path)
-            collection_name = f"tenant_{company_user_id}"
-            vector_collection = client.get_or_create_collection(
-                name=collection_name)
-
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            query_embedding = model.encode(
-                [query_text], convert_to_tensor=False)
-
-            numeric_id_filter = {
-                "$or": [
-                    {"id": int(query_text)}, {"shopify_id": int(query_text)}, {
-                        "customer_id": int(query_text)},
-                    {"order_id": int(query_text)}, {"product_id": int(query_text)}, {
-                        "variant_id": int(query_text)},
-                    {"collection_id": int(query_text)}, {
-                        "user_id": int(query_text)}
-                ]
-            }
-
-            results = vector_collection.query(
-                query_embeddings=query_embedding,
-                n_results=10000,
-                where=numeric_id_filter,
-                include=["documents", "distances", "metadatas"]
-            )
+            # IDs/SKUs -> indexed ORM lookups, free text -> vector index
+            plan, results = search_vectors(
+                company_user_id, query_text, k=request.data.get("k"), types=types)
+
+            matches = [
+                {
+                    "text": result["text"],
+                    "distance": result["distance"],
+                    "metadata": result["metadata"],
+                    "source": result["source"],
+                }
+                for result in results
+            ]
+            # Order for each match's metadata order_id, resolved in one query
+            attach_orders(company_user_id, matches)
 
-            matches = []
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i]
-                order_data = None
-
-                # If order_id exists, look up Order by shopify_id
-                order_id = metadata.get("order_id")
-                if order_id:
-                    try:
-                        order = Order.objects.get(
-                            shopify_id=order_id, company_id=company_user_id)
-                        order_data = {
-                            "id": order.id,
-                            "shopify_id": order.shopify_id,
-                            "order_number": order.order_number,
-                            "order_date": str(order.order_date),
-                            "fulfillment_status": order.fulfillment_status,
-                            "financial_status": order.financial_status,
-                            "currency": order.currency,
-                            "total_price": float(order.total_price),
-                            "subtotal_price": float(order.subtotal_price),
-                            "total_tax": float(order.total_tax),
-                            "total_discount": float(order.total_discount),
-                            "region": order.region,
-                            "created_at": str(order.created_at),
-                            "updated_at": str(order.updated_at)
-                        }
-                    except Order.DoesNotExist:
-                        order_data = None
-
-                matches.append({
-                    "text": doc,
-                    "distance": results['distances'][0][i],
-                    "metadata": metadata,
-                    "order": order_data
-                })
-
-            return Response({"matches": matches}, status=status.HTTP_200_OK)
+            return Response({"matches": matches, "plan": plan}, status=status.HTTP_200_OK)
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
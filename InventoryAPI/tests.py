@@ -1,3 +1,41 @@
+from datetime import date
+
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from CoreApplication.models import CompanyUser, Product, ProductVariant
+from Testingproject.models import SKUForecastHistory
+from vectordb.models import ProductNeighbour
+
+
+class RiskAlertSubstituteTests(TestCase):
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        for shopify_id, stock in ((11, 1), (12, 0), (13, 4), (14, 9)):
+            Product.objects.create(company=self.company, shopify_id=shopify_id, title=f"P{shopify_id}")
+            ProductVariant.objects.create(company=self.company, shopify_id=shopify_id * 10, product_id=shopify_id,
+                                          sku=f"SKU-{shopify_id}", price=10, inventory_quantity=stock)
+        # Only SKU-11 sells faster than its stock
+        for sku, forecast, stock in (("SKU-11", 20, 1), ("SKU-14", 2, 9)):
+            SKUForecastHistory.objects.create(company=self.company, sku=sku, month=date(2025, 6, 1),
+                                              predicted_sales_30=forecast, predicted_sales_60=2 * forecast,
+                                              predicted_sales_90=3 * forecast, live_inventory=stock)
+        for rank, neighbour_id in enumerate((12, 13, 14), start=1):
+            ProductNeighbour.objects.create(company=self.company, product_id=11, neighbour_id=neighbour_id,
+                                            rank=rank, score=1 - rank / 10)
+
+    def get_alerts(self, **params):
+        response = self.client.get(reverse("inventory_risk_alerts"), params,
+                                   HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.company)}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["risk_alerts"]
+
+    def test_substitutes_only_when_asked_for(self):
+        alerts = self.get_alerts()
+        self.assertEqual([a["SKU"] for a in alerts], ["SKU-11"])
+        self.assertNotIn("Substitutes", alerts[0])
 
-# Create your tests here.
+    def test_substitutes_are_in_stock_neighbours(self):
+        alerts = self.get_alerts(include_substitutes="true")
+        self.assertEqual([(s["product_id"], s["inventory"]) for s in alerts[0]["Substitutes"]], [(13, 4), (14, 9)])
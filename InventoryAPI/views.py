@@ -22,6 +22,7 @@ from Testingproject.models import (
     SKUForecastMetrics,
 )
 from CoreApplication.views import get_user_from_token
+from vectordb.neighbours import neighbours_for
 
 
 # ---------------- Helper: SKU Normalizer ---------------- #
@@ -439,12 +440,14 @@ def get_risk_alerts(request):
     - Auth via JWT token
     - Includes SKU, Product info, live inventory, on-order, forecast_30, forecast_60
     - Adds 'reason' and purchase order details
+    - ?include_substitutes=true adds in-stock similar products per alert
     """
     user, error = get_user_from_token(request)
     if error:
         return error
     company = user
     today = date.today()
+    include_substitutes = request.GET.get("include_substitutes") in ("true", "1")
 
     # ---------------- Latest Forecasts ---------------- #
     latest_month = (
@@ -459,6 +462,7 @@ def get_risk_alerts(request):
 
     # ---------------- Build Risk Alerts ---------------- #
     risk_alerts = []
+    alert_product_ids = []
 
     for f in latest_forecasts:
         sku = f.sku
@@ -505,11 +509,13 @@ def get_risk_alerts(request):
             ).first()
             category = product.product_type if product else None
             product_title = product.title if product else ""
+            product_id = variant.product_id
         except ProductVariant.DoesNotExist:
             price = 0.0
             variant_title = ""
             category = None
             product_title = ""
+            product_id = None
 
         risk_alerts.append({
             "SKU": sku,
@@ -525,6 +531,14 @@ def get_risk_alerts(request):
             "Reason": reason,
             "PurchaseOrders": purchase_order_details
         })
+        alert_product_ids.append(product_id)
+
+    # ---------------- Substitutes (precomputed neighbours) ---------------- #
+    if include_substitutes:
+        substitutes = neighbours_for(
+            company.id, {pid for pid in alert_product_ids if pid}, limit=5, in_stock_only=True)
+        for alert, product_id in zip(risk_alerts, alert_product_ids):
+            alert["Substitutes"] = substitutes.get(product_id, [])
 
     stockout_count = len(risk_alerts)
 
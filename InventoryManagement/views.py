@@ -19,12 +19,14 @@ from CoreApplication.models import (
 )
 from InventoryManagement.models import InventoryPrediction
 from CoreApplication.views import get_user_from_token
+from Testingproject.llm_cache import get_cached_response, store_response
 
 import tiktoken
 
 # Gemini AI setup
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
 
 
 def get_shopify_credentials(company):
@@ -192,19 +194,31 @@ Always return forecast, even if 0 or 1.
     return data_to_send, prompt_text
 
 
-def call_gemini_forecast(sku_data, prompt_text):
+def call_gemini_forecast(sku_data, prompt_text, use_cache=True):
     print(f"[INFO] Calling Gemini AI for SKU={sku_data['SKU']}")
     try:
-        payload = {"contents": [{"parts": [{"text": prompt_text + "\n" + json.dumps(sku_data)}]}]}
-        headers = {"Content-Type": "application/json", "X-goog-api-key": GEMINI_API_KEY}
-        response = requests.post(GEMINI_URL, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            text_output = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+        full_text = prompt_text + "\n" + json.dumps(sku_data)
+        text_output = get_cached_response("gemini", GEMINI_MODEL, 0, full_text) if use_cache else None
+        fresh = text_output is None
+        if not fresh:
+            print(f"[INFO] Gemini AI response served from cache for SKU={sku_data['SKU']}")
+        else:
+            # Temperature 0 so identical inputs give (and may reuse) the same forecast
+            payload = {"contents": [{"parts": [{"text": full_text}]}], "generationConfig": {"temperature": 0}}
+            headers = {"Content-Type": "application/json", "X-goog-api-key": GEMINI_API_KEY}
+            response = requests.post(GEMINI_URL, headers=headers, json=payload, timeout=30)
+            if response.status_code == 200:
+                data = response.json()
+                text_output = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+        if text_output is not None:
+            raw_output = text_output
             first = text_output.find("{")
             last = text_output.rfind("}")
             text_output = text_output[first:last+1] if first != -1 and last != -1 else "{}"
             forecast = json.loads(text_output)
+            # Only answers that parsed are worth serving again
+            if fresh and forecast:
+                store_response("gemini", GEMINI_MODEL, 0, full_text, raw_output)
             print(f"[INFO] Gemini AI forecast received for SKU={sku_data['SKU']}: {forecast}")
         else:
             print(f"[WARN] Gemini AI returned status={response.status_code} for SKU={sku_data['SKU']}")
@@ -0,0 +1,83 @@
+import json
+
+import openai
+from django.conf import settings
+
+# -----------------------------
+# OpenAI Batch API client
+# -----------------------------
+# Requests are written as JSONL (one chat completion per line, tagged with a
+# custom_id), uploaded as a file and run by the provider within 24 hours at
+# a lower price and outside the synchronous rate limits. The same client
+# talks to the local stand-in (manage.py run_batch_api_standin) when
+# OPENAI_BATCH_BASE_URL points at it.
+
+CHAT_COMPLETIONS = "/v1/chat/completions"
+FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchAPIError(Exception):
+    pass
+
+
+def request_line(custom_id, prompt_text, model):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS,
+        "body": {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt_text}],
+            "temperature": 0,
+        },
+    }
+
+
+class BatchAPIClient:
+    def __init__(self, base_url=None, api_key=None):
+        self.client = openai.OpenAI(api_key=api_key or "not-needed", base_url=base_url or None)
+
+    def submit(self, lines, metadata=None):
+        """Upload the request lines and start a batch; returns (batch id, input file id)."""
+        payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        try:
+            uploaded = self.client.files.create(file=("forecast_requests.jsonl", payload), purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint=CHAT_COMPLETIONS,
+                completion_window="24h",
+                metadata={key: str(value) for key, value in (metadata or {}).items()},
+            )
+        except openai.OpenAIError as e:
+            raise BatchAPIError(f"Batch submission failed: {e}")
+        return batch.id, uploaded.id
+
+    def retrieve(self, batch_id):
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+        except openai.OpenAIError as e:
+            raise BatchAPIError(f"Could not fetch batch {batch_id}: {e}")
+        return {"status": batch.status, "output_file_id": batch.output_file_id}
+
+    def results(self, output_file_id):
+        """{custom_id: response text} of the successful lines of an output file."""
+        try:
+            content = self.client.files.content(output_file_id).text
+        except openai.OpenAIError as e:
+            raise BatchAPIError(f"Could not download {output_file_id}: {e}")
+        results = {}
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code") != 200:
+                continue
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices:
+                results[row["custom_id"]] = choices[0].get("message", {}).get("content") or ""
+        return results
+
+
+def get_batch_client():
+    return BatchAPIClient(settings.OPENAI_BATCH_BASE_URL, openai.api_key)
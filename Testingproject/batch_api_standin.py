@@ -0,0 +1,175 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Batch API stand-in ----------------
+# A local imitation of the OpenAI Files/Batches endpoints the forecast job
+# uses, for tests and local runs without an API key:
+#
+#   POST /v1/files                 multipart upload (purpose=batch)
+#   GET  /v1/files/{id}/content    file bytes
+#   POST /v1/batches               start a batch over an uploaded JSONL file
+#   GET  /v1/batches/{id}          status; completes `delay` seconds after creation
+#
+# Each request line is answered by `responder(body) -> content`; the default
+# one answers forecast prompts with the mean of each SKU's last six months.
+
+
+def sales_average_responder(body):
+    prompt_text = body["messages"][0]["content"]
+    forecasts = []
+    for line in prompt_text.splitlines():
+        if not line.startswith('{"id"'):
+            continue
+        payload = json.loads(line)
+        monthly = list(payload.get("monthly_sales_last_6_months", {}).values()) or [0]
+        average = round(sum(monthly) / len(monthly))
+        forecasts.append({
+            "id": payload["id"],
+            "predicted_sales_30": average,
+            "predicted_sales_60": average * 2,
+            "predicted_sales_90": average * 3,
+            "reason_30": "stand-in: 6-month average",
+            "reason_60": "stand-in: 6-month average",
+            "reason_90": "stand-in: 6-month average",
+        })
+    return json.dumps(forecasts)
+
+
+class BatchStandIn:
+    def __init__(self, responder=sales_average_responder, delay=0.0):
+        self.responder = responder
+        self.delay = delay
+        self.files = {}    # id -> (filename, bytes)
+        self.batches = {}  # id -> batch dict
+        self._lock = threading.Lock()
+
+    def add_file(self, filename, content, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.files[file_id] = (filename, content)
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def create_batch(self, input_file_id, endpoint, completion_window, metadata):
+        if input_file_id not in self.files:
+            raise KeyError(input_file_id)
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}", "object": "batch", "endpoint": endpoint,
+            "input_file_id": input_file_id, "completion_window": completion_window, "status": "in_progress",
+            "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "metadata": metadata, "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "_ready_at": time.time() + self.delay,
+        }
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        return self._public(batch)
+
+    def get_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and time.time() >= batch["_ready_at"]:
+            self._complete(batch)
+        return self._public(batch)
+
+    def _complete(self, batch):
+        lines = self.files[batch["input_file_id"]][1].decode("utf-8").splitlines()
+        output, completed, failed = [], 0, 0
+        for line in filter(None, lines):
+            request = json.loads(line)
+            try:
+                content = self.responder(request["body"])
+                body = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+                    "model": request["body"].get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                }
+                output.append({"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                               "response": {"status_code": 200, "body": body}, "error": None})
+                completed += 1
+            except Exception as e:
+                output.append({"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                               "response": None, "error": {"message": str(e)}})
+                failed += 1
+        content = "\n".join(json.dumps(row) for row in output).encode("utf-8")
+        batch["output_file_id"] = self.add_file("batch_output.jsonl", content, "batch_output")["id"]
+        batch["request_counts"] = {"total": completed + failed, "completed": completed, "failed": failed}
+        batch["status"] = "completed"
+
+    @staticmethod
+    def _public(batch):
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+
+def make_handler(standin):
+    class BatchRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            try:
+                if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    return self._send_json(200, standin.get_batch(parts[2]))
+                if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+                    return self._send_bytes(standin.files[parts[2]][1])
+            except KeyError:
+                return self._send_json(404, {"error": {"message": "No such object"}})
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = self.path.split("?")[0].rstrip("/")
+            try:
+                if path == "/v1/files":
+                    fields = self._multipart(body)
+                    filename, content = fields["file"]
+                    return self._send_json(200, standin.add_file(filename, content, fields["purpose"][1].decode()))
+                if path == "/v1/batches":
+                    data = json.loads(body)
+                    return self._send_json(200, standin.create_batch(
+                        data["input_file_id"], data["endpoint"], data["completion_window"], data.get("metadata")))
+            except (KeyError, ValueError) as e:
+                return self._send_json(400, {"error": {"message": f"Invalid request: {e}"}})
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+        def _multipart(self, body):
+            header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode()
+            message = BytesParser(policy=default_policy).parsebytes(header + body)
+            return {
+                part.get_param("name", header="content-disposition"):
+                    (part.get_filename(), part.get_payload(decode=True))
+                for part in message.iter_parts()
+            }
+
+        def _send_bytes(self, payload, content_type="application/octet-stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_json(self, code, data):
+            payload = json.dumps(data).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug("batch stand-in: " + format % args)
+
+    return BatchRequestHandler
+
+
+def make_server(host, port, standin):
+    server = ThreadingHTTPServer((host, port), make_handler(standin))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,164 @@
+import json
+import math
+
+from django.conf import settings
+
+from Testingproject.prompt_templates import sku_segment
+
+# -----------------------------
+# Batched forecast requests
+# -----------------------------
+# Up to FORECAST_BATCH_SIZE SKU-months go into one request: the segment
+# instructions of the SKUs (see prompt_templates.py; SKUs are batched in
+# segment order, so usually one set), then one compact JSON payload per SKU
+# (promotions summarised, the segment spelled out), answered with a JSON
+# array holding one forecast per SKU id. Every element is validated on its own; the SKUs that are missing
+# or malformed are batched again (up to FORECAST_BATCH_RETRIES times) and
+# whatever is still unanswered is left to the caller's fallback.
+
+SEGMENT_FIELDS = ("category", "velocity", "demand", "trend", "promotion", "past_errors")
+PREDICTION_FIELDS = ("predicted_sales_30", "predicted_sales_60", "predicted_sales_90")
+REASON_FIELDS = ("reason_30", "reason_60", "reason_90")
+
+
+def _sum(rows, field):
+    return round(sum(row.get(field) or 0 for row in rows), 2)
+
+
+def compact_payload(item_id, data):
+    """The batch entry of one SKU-month, from its data_for_prompt."""
+    product = data.get("product") or {}
+    promos = data.get("promotional_data_last_3_months") or []
+    return {
+        "id": item_id,
+        "sku": data["sku"],
+        "title": data.get("variant_title"),
+        "price": data.get("price"),
+        "compare_at_price": data.get("compare_at_price"),
+        "cost": data.get("cost"),
+        "created_at": data.get("created_at"),
+        "product": {key: product.get(key) for key in ("title", "vendor", "product_type", "tags")},
+        "monthly_sales_last_6_months": data["monthly_sales_last_6_months"],
+        "daily_sales_last_2_months": data["daily_sales_last_2_months"],
+        "previous_errors": [
+            {"month": e["month"], "predicted_sales_30": e["predicted_sales_30"], "actual_sales": e["actual_sales"]}
+            for e in data.get("previous_errors") or []
+        ],
+        "promotions_last_3_months": {
+            "days": len(promos),
+            "clicks": _sum(promos, "clicks"),
+            "impressions": _sum(promos, "impressions"),
+            "cost": _sum(promos, "cost"),
+            "conversions": _sum(promos, "conversions"),
+            "conversion_value": _sum(promos, "conversion_value"),
+        } if promos else None,
+        "marketing_campaign_flag": data.get("marketing_campaign_flag", False),
+        "segment": dict(zip(SEGMENT_FIELDS, sku_segment(data))),
+    }
+
+
+def batch_prompt(base_prompt, payloads, instructions=None):
+    """
+    One request for several SKUs. `instructions` (parallel to `payloads`)
+    are the SKUs' segment instructions; they replace the base prompt, each
+    distinct text appearing once and the SKUs naming the one they follow.
+    """
+    if instructions:
+        labels = {}
+        for text in instructions:
+            labels.setdefault(text, chr(ord("A") + len(labels)))
+        payloads = [dict(payload, instructions=labels[text]) for payload, text in zip(payloads, instructions)]
+        header = "\n\n".join(f"Instructions {label}:\n{text}" for text, label in labels.items())
+        task = ("Forecast each of the SKUs below separately, applying to each one the instructions it names "
+                "(its \"instructions\" letter).")
+    else:
+        header = base_prompt
+        task = ("Forecast each of the SKUs below separately, applying the instructions above to each one and "
+                "taking its \"segment\" into account.")
+    lines = "\n".join(json.dumps(payload, separators=(",", ":")) for payload in payloads)
+    return f"""{header}
+
+{task}
+
+SKUs (one JSON object per line):
+{lines}
+
+Return **only** a JSON array with exactly one object per SKU:
+[{{"id": <id from the input>, "predicted_sales_30": <integer >= 0>, "predicted_sales_60": <integer >= 0>, "predicted_sales_90": <integer >= 0>, "reason_30": "<text>", "reason_60": "<text>", "reason_90": "<text>"}}]
+"""
+
+
+def batch_prompts(base_prompt, items, batch_size, instructions=None):
+    """
+    [(item ids, prompt text)] for {item_id: data_for_prompt}. SKUs are
+    ordered by segment so a batch mostly shares one set of instructions;
+    `instructions(segment)` returns a segment's tailored instructions.
+    """
+    segments = {item_id: sku_segment(data) for item_id, data in items.items()}
+    ids = sorted(items, key=lambda item_id: segments[item_id])
+    prompts = []
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        texts = [instructions(segments[i]) for i in chunk] if instructions else None
+        prompts.append((chunk, batch_prompt(base_prompt, [compact_payload(i, items[i]) for i in chunk], texts)))
+    return prompts
+
+
+def _valid_count(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+
+def parse_batch_response(response_text, expected_ids):
+    """{id: forecast} of the well-formed array elements for the expected ids."""
+    if not response_text:
+        return {}
+    first, last = response_text.find("["), response_text.rfind("]")
+    if first == -1 or last < first:
+        return {}
+    try:
+        elements = json.loads(response_text[first:last + 1])
+    except ValueError:
+        return {}
+    if not isinstance(elements, list):
+        return {}
+
+    forecasts = {}
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        try:
+            item_id = int(element.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if item_id not in expected_ids or item_id in forecasts:
+            continue
+        if not all(_valid_count(element.get(field)) for field in PREDICTION_FIELDS):
+            continue
+        forecast = {field: int(round(element[field])) for field in PREDICTION_FIELDS}
+        forecast.update({field: str(element.get(field) or "") for field in REASON_FIELDS})
+        forecasts[item_id] = forecast
+    return forecasts
+
+
+def forecast_batch(base_prompt, items, call, batch_size=None, retries=None, instructions=None):
+    """
+    Forecast {item_id: data_for_prompt} in batched requests through
+    `call(prompt_text, use_cache=...)`; returns {item_id: forecast} for the
+    items that got a valid answer.
+    """
+    batch_size = max(1, batch_size or settings.FORECAST_BATCH_SIZE)
+    retries = settings.FORECAST_BATCH_RETRIES if retries is None else retries
+    answers = {}
+    pending = dict(items)
+    for attempt in range(retries + 1):
+        failed = []
+        for chunk, prompt_text in batch_prompts(base_prompt, pending, batch_size, instructions):
+            # Retries must not be served the cached answer that failed
+            parsed = parse_batch_response(call(prompt_text, use_cache=attempt == 0), set(chunk))
+            answers.update(parsed)
+            failed.extend(i for i in chunk if i not in parsed)
+        if not failed:
+            break
+        print(f"Batch forecast attempt {attempt + 1}: {len(failed)} of {len(pending)} SKUs without a valid answer")
+        pending = {i: items[i] for i in failed}
+    return answers
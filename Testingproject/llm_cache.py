@@ -0,0 +1,91 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from Testingproject.models import LLMCacheStat, LLMResponse
+
+# -----------------------------
+# LLM response cache
+# -----------------------------
+# Responses stored under sha256(provider, model, temperature, prompt), so a
+# byte-identical request (a re-run of manual_forecast, a task retried after
+# a crash) is answered from the DB instead of the API. Only deterministic
+# (temperature 0) requests are cached; entries expire after
+# LLM_CACHE_TTL_SECONDS. Callers bypass the lookup with use_cache=False,
+# which also refreshes the stored entry with the new response.
+
+
+def cache_key(provider, model, temperature, prompt):
+    payload = json.dumps([provider, model, float(temperature), prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cacheable(temperature):
+    return settings.LLM_CACHE_ENABLED and temperature == 0
+
+
+def _count(provider, model, field):
+    updated = LLMCacheStat.objects.filter(provider=provider, model=model).update(**{field: F(field) + 1})
+    if not updated:
+        try:
+            LLMCacheStat.objects.create(provider=provider, model=model, **{field: 1})
+        except IntegrityError:
+            LLMCacheStat.objects.filter(provider=provider, model=model).update(**{field: F(field) + 1})
+
+
+def get_cached_response(provider, model, temperature, prompt):
+    """The stored response text for this exact request, or None."""
+    if not _cacheable(temperature):
+        return None
+    key = cache_key(provider, model, temperature, prompt)
+    entry = LLMResponse.objects.filter(key=key, expires_at__gt=timezone.now()).only("response").first()
+    if entry is None:
+        _count(provider, model, "misses")
+        return None
+    LLMResponse.objects.filter(key=key).update(hits=F("hits") + 1)
+    _count(provider, model, "hits")
+    return entry.response
+
+
+def store_response(provider, model, temperature, prompt, response):
+    # Empty answers are failures, not results
+    if not _cacheable(temperature) or not response:
+        return
+    LLMResponse.objects.update_or_create(
+        key=cache_key(provider, model, temperature, prompt),
+        defaults={
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "response": response,
+            "hits": 0,
+            "expires_at": timezone.now() + timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS),
+        },
+    )
+
+
+def purge_expired():
+    deleted, _ = LLMResponse.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def cache_stats():
+    """Hit/miss counters and hit rate per provider and model."""
+    stats = []
+    for stat in LLMCacheStat.objects.order_by("provider", "model"):
+        lookups = stat.hits + stat.misses
+        stats.append({
+            "provider": stat.provider,
+            "model": stat.model,
+            "hits": stat.hits,
+            "misses": stat.misses,
+            "hit_rate": round(stat.hits / lookups, 4) if lookups else None,
+            "entries": LLMResponse.objects.filter(provider=stat.provider, model=stat.model,
+                                                  expires_at__gt=timezone.now()).count(),
+        })
+    return stats
@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from Testingproject.llm_cache import cache_stats, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Show LLM response cache hit rates per provider and model, optionally purging expired entries first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge-expired", action="store_true", help="Delete expired responses first")
+
+    def handle(self, *args, **options):
+        if options["purge_expired"]:
+            self.stdout.write(f"Purged {purge_expired()} expired responses")
+        self.stdout.write(json.dumps(cache_stats(), indent=2))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from Testingproject.batch_api_standin import BatchStandIn, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the OpenAI Files/Batches endpoints used by the batch forecast mode. "
+        "Point OPENAI_BATCH_BASE_URL at http://<host>:<port>/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8766)
+        parser.add_argument("--delay", type=float, default=5, help="Seconds before a submitted batch completes")
+
+    def handle(self, *args, **options):
+        server = make_server(options["host"], options["port"], BatchStandIn(delay=options["delay"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"Batch API stand-in on http://{options['host']}:{options['port']}/v1"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
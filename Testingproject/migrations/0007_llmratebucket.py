@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Testingproject', '0006_skuforecastmetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMRateBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-19 04:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoreApplication', '0017_add_lookup_indexes'),
+        ('Testingproject', '0008_llmresponse_llmcachestat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastBatchRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant_starts', models.JSONField(default=dict)),
+                ('cube_path', models.CharField(max_length=500)),
+                ('current_month', models.DateField()),
+                ('end_month', models.DateField()),
+                ('status', models.CharField(default='running', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_batch_runs', to='CoreApplication.companyuser')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ForecastBatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('attempt', models.PositiveSmallIntegerField(default=0)),
+                ('provider_batch_id', models.CharField(db_index=True, max_length=100)),
+                ('input_file_id', models.CharField(max_length=100)),
+                ('output_file_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('requests', models.JSONField(default=dict)),
+                ('skus', models.JSONField(default=dict)),
+                ('status', models.CharField(db_index=True, default='submitted', max_length=20)),
+                ('provider_status', models.CharField(blank=True, max_length=30, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='Testingproject.forecastbatchrun')),
+            ],
+        ),
+    ]
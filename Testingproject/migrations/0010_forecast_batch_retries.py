@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Testingproject', '0009_forecastbatchrun_forecastbatchjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastbatchjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastbatchjob',
+            name='submit_errors',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='forecastbatchrun',
+            name='live_inventory',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='forecastbatchjob',
+            name='input_file_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='forecastbatchjob',
+            name='provider_batch_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
@@ -60,3 +60,76 @@ class SKUForecastMetrics(models.Model):
 
     class Meta:
         unique_together = ('company', 'sku', 'month')
+
+
+# Shared token buckets for the OpenAI request/token quotas (see rate_limit.py)
+class LLMRateBucket(models.Model):
+    name = models.CharField(max_length=64, unique=True)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.FloatField(default=0)  # unix time of the last refill
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.0f}"
+
+
+# Content-addressed LLM responses (see llm_cache.py)
+class LLMResponse(models.Model):
+    key = models.CharField(max_length=64, unique=True)  # sha256 of provider/model/temperature/prompt
+    provider = models.CharField(max_length=32)
+    model = models.CharField(max_length=64)
+    temperature = models.FloatField(default=0)
+    response = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.provider}/{self.model} {self.key[:12]}"
+
+
+class LLMCacheStat(models.Model):
+    provider = models.CharField(max_length=32)
+    model = models.CharField(max_length=64)
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('provider', 'model')
+
+
+# Monthly forecast run executed through the OpenAI Batch API, one month
+# ("wave") at a time, since each month's forecast feeds the next one's errors
+class ForecastBatchRun(models.Model):
+    company = models.ForeignKey(CompanyUser, on_delete=models.CASCADE, related_name="forecast_batch_runs")
+    variant_starts = models.JSONField(default=dict)  # {variant shopify id: first month to forecast}
+    live_inventory = models.JSONField(default=dict)  # {variant shopify id: Shopify inventory at run start}
+    cube_path = models.CharField(max_length=500)
+    current_month = models.DateField()
+    end_month = models.DateField()
+    status = models.CharField(max_length=20, default="running")  # running / completed
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast batch run {self.id} ({self.company_id}, {self.current_month:%Y-%m}, {self.status})"
+
+
+class ForecastBatchJob(models.Model):
+    run = models.ForeignKey(ForecastBatchRun, on_delete=models.CASCADE, related_name="jobs")
+    month = models.DateField()
+    attempt = models.PositiveSmallIntegerField(default=0)
+    provider_batch_id = models.CharField(max_length=100, blank=True, db_index=True)  # empty until submitted
+    input_file_id = models.CharField(max_length=100, blank=True)
+    output_file_id = models.CharField(max_length=100, null=True, blank=True)
+    requests = models.JSONField(default=dict)  # {custom_id: [variant shopify ids]}
+    skus = models.JSONField(default=dict)      # {variant shopify id: [sku, live inventory]}
+    # unsubmitted / submitting / submitted / applying / applied
+    status = models.CharField(max_length=20, default="submitted", db_index=True)
+    provider_status = models.CharField(max_length=30, null=True, blank=True)
+    submit_errors = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # when a poll started submitting/applying it
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.provider_batch_id} ({self.month:%Y-%m}, {self.status})"
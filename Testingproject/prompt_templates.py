@@ -0,0 +1,125 @@
+import hashlib
+import threading
+
+from django.conf import settings
+
+# -----------------------------
+# Segment prompt templates
+# -----------------------------
+# The forecast instructions used to be written by the LLM for every
+# SKU-month from the base prompt plus the full SKU JSON, so each forecast
+# cost two calls and sent the data twice. Instead SKUs are grouped into
+# segments (category, sales velocity, demand pattern, trend, promotion,
+# past error direction) and the tailored instructions are generated once
+# per segment from a description of it, with no SKU data. Templates are
+# memoised per process and, being temperature-0 calls, shared across
+# workers and runs through the LLM response cache. If generation fails the
+# instructions are rendered locally from the same segment notes.
+
+VELOCITY_BANDS = ((0, "none"), (5, "slow"), (50, "medium"))  # upper bound of average units per month
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _velocity_band(average):
+    for upper, band in VELOCITY_BANDS:
+        if average <= upper:
+            return band
+    return "fast"
+
+
+def _trend(monthly):
+    earlier, recent = sum(monthly[:3]), sum(monthly[3:])
+    if recent > earlier * 1.2 and recent - earlier >= 3:
+        return "rising"
+    if recent < earlier * 0.8 and earlier - recent >= 3:
+        return "falling"
+    return "flat"
+
+
+def _error_direction(previous_errors):
+    signs = [
+        (e["predicted_sales_30"] or 0) - e["actual_sales"]
+        for e in previous_errors if e.get("actual_sales") is not None
+    ]
+    if not signs:
+        return "none"
+    over = sum(1 for s in signs if s > 0)
+    under = sum(1 for s in signs if s < 0)
+    if over > under:
+        return "over-forecast"
+    if under > over:
+        return "under-forecast"
+    return "mixed"
+
+
+def sku_segment(data_for_prompt):
+    """Segment of the SKU described by a forecast's data_for_prompt."""
+    monthly = list(data_for_prompt["monthly_sales_last_6_months"].values())
+    average = sum(monthly) / len(monthly) if monthly else 0
+    return (
+        (data_for_prompt.get("product") or {}).get("product_type") or "uncategorised",
+        _velocity_band(average),
+        "intermittent" if sum(1 for q in monthly if not q) >= len(monthly) / 2 else "regular",
+        _trend(monthly),
+        "promotion" if data_for_prompt.get("marketing_campaign_flag") else "no promotion",
+        _error_direction(data_for_prompt.get("previous_errors") or []),
+    )
+
+
+def describe_segment(segment):
+    category, velocity, pattern, trend, promotion, errors = segment
+    return "\n".join([
+        f"- category: {category}",
+        f"- sales velocity: {velocity} (average units per month; none = 0, slow <= 5, medium <= 50)",
+        f"- demand pattern: {pattern}",
+        f"- trend over the last 6 months: {trend}",
+        f"- marketing campaign running: {'yes' if promotion == 'promotion' else 'no'}",
+        f"- previous forecasts were mostly: {errors}",
+    ])
+
+
+def render_local_template(base_prompt, segment):
+    """Deterministic instructions: the base prompt plus the segment notes."""
+    return f"{base_prompt}\n\nThis SKU belongs to the following segment; weigh the data accordingly:\n" \
+           f"{describe_segment(segment)}"
+
+
+def segment_generation_prompt(base_prompt, segment):
+    return f"""
+You are a prompt generator. Using this base prompt from DB (do NOT change instructions, only tailor to the SKU segment):
+
+{base_prompt}
+
+The prompt will be used for every SKU of this segment:
+
+{describe_segment(segment)}
+
+Generate a tailored prompt that:
+- Adjusts weightages for SKUs of this segment based on monthly/daily sales, trends, tags, and promotions
+- Corrects for the segment's previous prediction errors
+- Always results in strict JSON forecast for 30, 60, 90 days
+Return only the text of the new prompt.
+"""
+
+
+def tailored_instructions(base_prompt, segment, generate):
+    """
+    Forecast instructions for a segment. `generate(prompt_text)` is the LLM
+    call (call_openai); it runs at most once per base prompt and segment.
+    """
+    key = (hashlib.sha1(base_prompt.encode("utf-8")).hexdigest(), segment)
+    template = _templates.get(key)
+    if template is not None:
+        return template
+    if settings.FORECAST_PROMPT_TEMPLATES == "local":
+        template = render_local_template(base_prompt, segment)
+    else:
+        template = generate(segment_generation_prompt(base_prompt, segment)) or ""
+        if not template.strip():
+            # Not memoised, so the next SKU of the segment tries the LLM again
+            return render_local_template(base_prompt, segment)
+    with _templates_lock:
+        _templates[key] = template
+    return template
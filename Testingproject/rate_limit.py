@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from Testingproject.models import LLMRateBucket
+
+# -----------------------------
+# Shared LLM rate limiter
+# -----------------------------
+# Token buckets kept in the DB so every Celery worker draws from the same
+# quota: one bucket for requests per minute and one for tokens per minute.
+# A call takes one request and its estimated tokens from both buckets at
+# once (rows locked in name order), waiting until both have enough; the
+# estimate is corrected with the real usage once the response arrives.
+
+MAX_SLEEP_SECONDS = 5
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt_text, max_output_tokens=None):
+    if max_output_tokens is None:
+        max_output_tokens = settings.OPENAI_OUTPUT_TOKENS_ESTIMATE
+    return len(prompt_text or "") // CHARS_PER_TOKEN + max_output_tokens
+
+
+class TokenBucketLimiter:
+    def __init__(self, prefix, requests_per_minute, tokens_per_minute):
+        # bucket name -> capacity per minute
+        self.capacities = {
+            f"{prefix}:requests": float(requests_per_minute),
+            f"{prefix}:tokens": float(tokens_per_minute),
+        }
+        self.tokens_bucket = f"{prefix}:tokens"
+
+    def _try_take(self, amounts):
+        """Take `amounts` ({bucket: n}) if every bucket has enough; else seconds to wait."""
+        now = time.time()
+        with transaction.atomic():
+            for name, capacity in self.capacities.items():
+                LLMRateBucket.objects.get_or_create(name=name, defaults={"tokens": capacity, "refilled_at": now})
+            buckets = list(LLMRateBucket.objects.select_for_update()
+                           .filter(name__in=list(self.capacities)).order_by("name"))
+            wait = 0.0
+            for bucket in buckets:
+                capacity = self.capacities[bucket.name]
+                rate = capacity / 60
+                bucket.tokens = min(capacity, bucket.tokens + max(0.0, now - bucket.refilled_at) * rate)
+                bucket.refilled_at = now
+                # A single call larger than the whole bucket only waits for a full bucket
+                needed = min(amounts[bucket.name], capacity)
+                if bucket.tokens < needed:
+                    wait = max(wait, (needed - bucket.tokens) / rate)
+            if not wait:
+                for bucket in buckets:
+                    bucket.tokens -= amounts[bucket.name]
+            for bucket in buckets:
+                bucket.save(update_fields=["tokens", "refilled_at"])
+        return wait
+
+    def acquire(self, tokens):
+        """Block until one request and `tokens` tokens are available."""
+        amounts = {name: (tokens if name == self.tokens_bucket else 1) for name in self.capacities}
+        waited = 0.0
+        while True:
+            wait = self._try_take(amounts)
+            if not wait:
+                return waited
+            wait = min(wait, MAX_SLEEP_SECONDS)
+            time.sleep(wait)
+            waited += wait
+
+    def settle(self, estimated_tokens, used_tokens):
+        """Give back (or take) the difference between the estimate and the real usage."""
+        if used_tokens is None or used_tokens == estimated_tokens:
+            return
+        LLMRateBucket.objects.filter(name=self.tokens_bucket).update(
+            tokens=F("tokens") + (estimated_tokens - used_tokens))
+
+
+openai_limiter = TokenBucketLimiter("openai", settings.OPENAI_RPM_LIMIT, settings.OPENAI_TPM_LIMIT)
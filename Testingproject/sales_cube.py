@@ -0,0 +1,139 @@
+import os
+import threading
+from datetime import date, datetime, time as dt_time
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from CoreApplication.models import Order, OrderLineItem
+from Testingproject.stat_forecast import StatForecasts
+
+# -----------------------------
+# Sales cube
+# -----------------------------
+# Units sold per variant per day, for every SKU of a forecast run, from two
+# queries: the day of each order in the window (in the site time zone, the
+# zone of the window bounds too) and the units of the run's variants per
+# order. Row i of `daily` is variant_ids[i], column j is start + j days;
+# `monthly` holds the same sales summed per calendar month. The cube is
+# saved as .npz so the per-SKU tasks of a run load it instead of re-reading
+# the orders.
+
+HISTORY_YEARS = 3
+
+
+class SalesCube:
+    def __init__(self, start, variant_ids, daily):
+        self.start = start
+        self.variant_ids = np.asarray(variant_ids, dtype=np.int64)
+        self.daily = daily
+        self.rows = {int(vid): i for i, vid in enumerate(self.variant_ids)}
+        self.days = daily.shape[1]
+        end = start + relativedelta(days=self.days)
+        self.month_starts = []
+        month = start.replace(day=1)
+        while month < end:
+            self.month_starts.append(month)
+            month += relativedelta(months=1)
+        offsets = [max(0, (m - start).days) for m in self.month_starts]
+        self.monthly = (np.add.reduceat(daily, offsets, axis=1) if self.days
+                        else np.zeros((len(self.variant_ids), 0), dtype=daily.dtype))
+        self._stat_forecasts = {}  # origin -> StatForecasts over all rows
+
+    def __contains__(self, variant_id):
+        return variant_id in self.rows
+
+    def _row(self, variant_id, matrix):
+        i = self.rows.get(variant_id)
+        return matrix[i] if i is not None else np.zeros(matrix.shape[1], dtype=matrix.dtype)
+
+    def day_offset(self, day):
+        return (day - self.start).days
+
+    def monthly_sales_map(self, variant_id):
+        """{"YYYY-MM": units} for every month of the cube."""
+        row = self._row(variant_id, self.monthly)
+        return {m.strftime("%Y-%m"): int(q) for m, q in zip(self.month_starts, row)}
+
+    def daily_sales_map(self, variant_id, since=None, until=None):
+        """{"YYYY-MM-DD": units} for the days with sales in [since, until)."""
+        row = self._row(variant_id, self.daily)
+        lo = max(0, self.day_offset(since)) if since else 0
+        hi = min(self.days, self.day_offset(until)) if until else self.days
+        return {(self.start + relativedelta(days=int(j))).strftime("%Y-%m-%d"): int(row[j])
+                for j in np.flatnonzero(row[lo:hi]) + lo} if hi > lo else {}
+
+    def statistical_forecast(self, variant_id, origin):
+        """Statistical 30/60/90-day forecast of a variant from the sales before `origin`."""
+        forecasts = self._stat_forecasts.get(origin)
+        if forecasts is None:
+            forecasts = self._stat_forecasts[origin] = StatForecasts(self.daily, self.day_offset(origin))
+        i = self.rows.get(variant_id)
+        return forecasts.for_row(i) if i is not None else None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.partial.npz"
+        np.savez(tmp_path, start=np.array(self.start.toordinal()), variant_ids=self.variant_ids, daily=self.daily)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(date.fromordinal(int(data["start"])), data["variant_ids"], data["daily"])
+
+
+def build_sales_cube(company, variant_ids, end=None, years=HISTORY_YEARS):
+    """Daily units of `variant_ids` over the `years` before `end` (default today)."""
+    end = end or date.today()
+    start = end - relativedelta(years=years)
+    variant_ids = [int(v) for v in dict.fromkeys(variant_ids) if v is not None]
+    daily = np.zeros((len(variant_ids), (end - start).days), dtype=np.int32)
+    if not variant_ids:
+        return SalesCube(start, variant_ids, daily)
+
+    tz = timezone.get_current_timezone()
+    orders = Order.objects.filter(
+        company=company,
+        order_date__gte=timezone.make_aware(datetime.combine(start, dt_time.min), tz),
+        order_date__lt=timezone.make_aware(datetime.combine(end, dt_time.min), tz),
+    )
+    order_days = dict(
+        orders.annotate(day=TruncDate("order_date", tzinfo=tz)).values_list("shopify_id", "day").order_by())
+    rows = (
+        OrderLineItem.objects.filter(company=company, variant_id__in=variant_ids,
+                                     order_id__in=orders.values("shopify_id"))
+        .values_list("variant_id", "order_id")
+        .annotate(units=Sum("quantity"))
+        .order_by()
+    )
+    index = {vid: i for i, vid in enumerate(variant_ids)}
+    for variant_id, order_id, units in rows:
+        day = order_days.get(order_id)
+        j = (day - start).days if day else -1
+        if 0 <= j < daily.shape[1]:
+            daily[index[variant_id], j] += int(units or 0)
+    return SalesCube(start, variant_ids, daily)
+
+
+def sales_cube_path(company_id, run_id):
+    return os.path.join(settings.SALES_CUBE_DIR, f"company_{company_id}_{run_id}.npz")
+
+
+# Last cube loaded by this worker process; every SKU task of a run reads the same file
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_sales_cube(path):
+    with _loaded_lock:
+        cube = _loaded.get(path)
+        if cube is None:
+            cube = SalesCube.load(path)
+            _loaded.clear()
+            _loaded[path] = cube
+        return cube
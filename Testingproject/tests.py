@@ -1,3 +1,390 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from CoreApplication.models import CompanyUser, Order, OrderLineItem, ProductVariant, Prompt
+from Testingproject import views
+from Testingproject.batch_api import BatchAPIClient, BatchAPIError
+from Testingproject.batch_api_standin import BatchStandIn, make_server, sales_average_responder
+from Testingproject.batch_forecast import batch_prompts, forecast_batch, parse_batch_response
+from Testingproject.models import ForecastBatchJob, ForecastBatchRun, SKUForecastHistory
+from Testingproject.sales_cube import build_sales_cube
+from Testingproject.stat_forecast import (
+    HORIZON, PERIOD_DAYS, SEASON, StatForecasts, croston_sba, holt_winters, moving_average, period_totals,
+)
+
+
+class SalesCubeTests(TestCase):
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+
+    def add_sale(self, shopify_id, order_date, variant_id=501, quantity=1):
+        Order.objects.create(company=self.company, shopify_id=shopify_id, order_date=order_date)
+        OrderLineItem.objects.create(company=self.company, shopify_line_item_id=shopify_id, order_id=shopify_id,
+                                     variant_id=variant_id, quantity=quantity)
+
+    def test_days_are_bucketed_in_the_site_time_zone(self):
+        # 00:30 on 1 March in Asia/Kolkata is still 28 February in UTC
+        self.add_sale(1, timezone.make_aware(datetime(2025, 3, 1, 0, 30)), quantity=2)
+        self.add_sale(2, timezone.make_aware(datetime(2025, 2, 28, 23, 30)), quantity=3)
+        self.add_sale(3, timezone.make_aware(datetime(2025, 3, 31, 23, 59)), variant_id=999)
+
+        cube = build_sales_cube(self.company, [501, 502], end=date(2025, 4, 1), years=1)
+        self.assertEqual(cube.daily_sales_map(501), {"2025-02-28": 3, "2025-03-01": 2})
+        self.assertEqual(cube.monthly_sales_map(501)["2025-03"], 2)
+        self.assertEqual(cube.monthly_sales_map(502)["2025-03"], 0)
+
+    def test_window_bounds_are_local_midnights(self):
+        self.add_sale(1, timezone.make_aware(datetime(2025, 3, 31, 23, 59)))
+        self.add_sale(2, timezone.make_aware(datetime(2025, 4, 1, 0, 1)))
+        cube = build_sales_cube(self.company, [501], end=date(2025, 4, 1), years=1)
+        self.assertEqual(cube.daily_sales_map(501), {"2025-03-31": 1})
+
+
+class StatisticalModelTests(SimpleTestCase):
+    def test_period_totals_align_to_the_end(self):
+        daily = np.arange(70)[None, :]
+        periods = period_totals(daily, 70)
+        self.assertEqual(periods.shape, (1, 2))
+        self.assertEqual(periods[0, 1], sum(range(40, 70)))
+
+    def test_moving_average_of_last_three_periods(self):
+        forecast = moving_average(np.array([[100.0, 3, 6, 9], [0, 0, 0, 0]]))
+        np.testing.assert_allclose(forecast, [[6, 6, 6], [0, 0, 0]])
+        self.assertEqual(moving_average(np.zeros((2, 0))).shape, (2, HORIZON))
+
+    def test_croston_sba_on_intermittent_demand(self):
+        daily = np.zeros((2, 300))
+        daily[0, 4::5] = 10  # 10 units every 5th day
+        forecast = croston_sba(daily, 300)
+        # SBA-corrected rate: (1 - alpha / 2) * size / interval
+        np.testing.assert_allclose(forecast[0], [0.95 * 2 * PERIOD_DAYS] * HORIZON)
+        np.testing.assert_allclose(forecast[1], 0)
+
+    def test_holt_winters_short_history_falls_back_to_moving_average(self):
+        periods = np.array([[12.0]])
+        np.testing.assert_allclose(holt_winters(periods), moving_average(periods))
+
+    def test_holt_winters_flat_series(self):
+        np.testing.assert_allclose(holt_winters(np.full((1, 10), 50.0)), 50)
+
+    def test_holt_winters_follows_the_season(self):
+        pattern = np.array([10, 10, 10, 40, 80, 40, 10, 10, 10, 10, 10, 10], dtype=float)
+        periods = np.tile(pattern, 3)[None, :]
+        forecast = holt_winters(periods)[0]
+        np.testing.assert_allclose(forecast, pattern[:HORIZON], atol=5)
+        peak = holt_winters(periods[:, :2 * SEASON + 3])[0]  # next periods are the 40/80/40 peak
+        np.testing.assert_allclose(peak, [40, 80, 40], atol=10)
+        self.assertTrue((holt_winters(np.tile([0.0, 100.0], 13)[None, :]) >= 0).all())
+
+    def test_all_zero_history_forecasts_zero(self):
+        forecasts = StatForecasts(np.zeros((1, 400), dtype=np.int32), 400)
+        row = forecasts.for_row(0)
+        self.assertEqual(row["model"], "zero_sales")
+        self.assertTrue(row["trivial"])
+        self.assertEqual((row["predicted_sales_30"], row["predicted_sales_90"]), (0, 0))
+
+    def test_short_history_has_no_backtest(self):
+        daily = np.ones((1, 60), dtype=np.int32)
+        row = StatForecasts(daily, 60).for_row(0)
+        self.assertIsNone(row["backtest_wape"])
+        self.assertFalse(row["trivial"])
+        self.assertEqual(row["predicted_sales_30"], 30)
+
+    def test_steady_sales_are_trivial(self):
+        daily = np.full((1, 400), 2, dtype=np.int32)
+        row = StatForecasts(daily, 400).for_row(0)
+        self.assertTrue(row["trivial"])
+        self.assertEqual((row["predicted_sales_30"], row["predicted_sales_60"], row["predicted_sales_90"]),
+                         (60, 120, 180))
+
+
+@override_settings(STAT_FORECAST_SKIP_LLM=False, LLM_CACHE_ENABLED=False)
+class LLMFallbackTests(TestCase):
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        Prompt.objects.create(id=2, prompt="Forecast the SKU.")
+        self.variant = ProductVariant.objects.create(company=self.company, shopify_id=501, product_id=1, sku="RING-1")
+        today = timezone.localtime()
+        for n in range(1, 240):
+            Order.objects.create(company=self.company, shopify_id=n, order_date=today - timedelta(days=3 * n))
+            OrderLineItem.objects.create(company=self.company, shopify_line_item_id=n, order_id=n, variant_id=501,
+                                         quantity=2)
+        self.this_month = date.today().replace(day=1)
+        SKUForecastHistory.objects.create(company=self.company, sku="RING-1",
+                                          month=self.this_month - relativedelta(months=1), predicted_sales_30=0,
+                                          predicted_sales_60=0, predicted_sales_90=0)
+
+    def test_unusable_llm_answers_fall_back_to_the_statistical_forecast(self):
+        cube = build_sales_cube(self.company, [501])
+        with mock.patch.object(views, "call_openai", return_value="I cannot help with that") as llm:
+            results = views.forecast_single_sku_for_variant(self.company, self.variant, cube)
+
+        self.assertEqual([r["month"] for r in results],
+                         [f"{self.this_month - relativedelta(months=1):%Y-%m}", f"{self.this_month:%Y-%m}"])
+        stat = cube.statistical_forecast(501, self.this_month)
+        saved = SKUForecastHistory.objects.get(company=self.company, sku="RING-1", month=self.this_month)
+        self.assertEqual(saved.predicted_sales_30, stat["predicted_sales_30"])
+        self.assertEqual(saved.predicted_sales_90, stat["predicted_sales_90"])
+        self.assertIn("statistical", saved.reason)
+        # Each month is asked twice (the retry skips the response cache)
+        retries = [c for c in llm.call_args_list if c.kwargs.get("use_cache") is False]
+        self.assertEqual(len(retries), 2)
+
+
+def sku_data(sku, monthly, product_type="Rings"):
+    return {
+        "sku": sku,
+        "product": {"product_type": product_type},
+        "monthly_sales_last_6_months": {f"2025-{m:02d}": q for m, q in enumerate(monthly, start=1)},
+        "daily_sales_last_2_months": {},
+        "previous_errors": [],
+    }
+
+
+def forecast_element(item_id, units=10):
+    return {"id": item_id, "predicted_sales_30": units, "predicted_sales_60": 2 * units,
+            "predicted_sales_90": 3 * units, "reason_30": "steady"}
+
+
+class BatchResponseParserTests(SimpleTestCase):
+    def test_parses_fenced_array(self):
+        text = "```json\n" + json.dumps([forecast_element(1), forecast_element(2, 4.6)]) + "\n```"
+        forecasts = parse_batch_response(text, {1, 2})
+        self.assertEqual(forecasts[1]["predicted_sales_90"], 30)
+        self.assertEqual(forecasts[2]["predicted_sales_30"], 5)
+        self.assertEqual(forecasts[2]["reason_60"], "")
+
+    def test_skips_malformed_unexpected_and_duplicate_elements(self):
+        elements = [
+            forecast_element(1),
+            dict(forecast_element(2), predicted_sales_30="lots"),
+            dict(forecast_element(3), predicted_sales_60=-1),
+            dict(forecast_element(4), predicted_sales_90=True),
+            forecast_element(99),
+            dict(forecast_element(1), predicted_sales_30=500),
+            "not an object",
+            {"id": "x"},
+        ]
+        forecasts = parse_batch_response(json.dumps(elements), {1, 2, 3, 4})
+        self.assertEqual(set(forecasts), {1})
+        self.assertEqual(forecasts[1]["predicted_sales_30"], 10)
+
+    def test_unusable_responses(self):
+        for text in ("", None, "no json here", "[1, 2", '{"id": 1}', "[{]"):
+            self.assertEqual(parse_batch_response(text, {1}), {})
+
+
+class BatchPromptTests(SimpleTestCase):
+    def setUp(self):
+        self.items = {
+            1: sku_data("A", [5, 5, 5, 5, 5, 5]),
+            2: sku_data("B", [0, 0, 0, 0, 0, 1], "Necklaces"),
+            3: sku_data("C", [4, 5, 5, 5, 5, 6]),
+        }
+
+    def test_skus_carry_their_segment_instructions(self):
+        prompts = batch_prompts("BASE", self.items, 3, instructions=lambda segment: f"Rules for {segment[0]}")
+        self.assertEqual(len(prompts), 1)
+        chunk, text = prompts[0]
+        self.assertNotIn("BASE", text)
+        # One section per distinct segment, SKUs of a segment next to each other
+        self.assertEqual(text.count("Instructions A:\nRules for Necklaces"), 1)
+        self.assertEqual(text.count("Instructions B:\nRules for Rings"), 1)
+        self.assertEqual(chunk, [2, 1, 3])
+        payloads = [json.loads(line) for line in text.splitlines() if line.startswith('{"id"')]
+        self.assertEqual([(p["id"], p["instructions"]) for p in payloads], [(2, "A"), (1, "B"), (3, "B")])
+
+    def test_without_instructions_the_base_prompt_is_used(self):
+        prompts = batch_prompts("BASE", self.items, 2)
+        self.assertEqual([chunk for chunk, _ in prompts], [[2, 1], [3]])
+        self.assertTrue(all(text.startswith("BASE") for _, text in prompts))
+
+    def test_missing_answers_are_asked_again_without_the_cache(self):
+        calls = []
+
+        def call(prompt_text, use_cache=True):
+            ids = [json.loads(line)["id"] for line in prompt_text.splitlines() if line.startswith('{"id"')]
+            calls.append((ids, use_cache))
+            return json.dumps([forecast_element(i) for i in ids if use_cache is False or i != 3])
+
+        answers = forecast_batch("BASE", self.items, call, batch_size=3, retries=1)
+        self.assertEqual(set(answers), {1, 2, 3})
+        self.assertEqual(calls, [([2, 1, 3], True), ([3], False)])
+
+
+@override_settings(STAT_FORECAST_SKIP_LLM=False, FORECAST_PROMPT_TEMPLATES="local", FORECAST_BATCH_SIZE=2,
+                   FORECAST_BATCH_RETRIES=1, FORECAST_BATCH_SUBMIT_RETRIES=1)
+class ForecastBatchRunTests(TestCase):
+    """submit -> poll -> apply against the Batch API stand-in."""
+
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        Prompt.objects.create(id=2, prompt="Forecast the SKU.")
+        self.this_month = date.today().replace(day=1)
+        today = timezone.localtime()
+        for n, variant_id in enumerate((501, 502, 503), start=1):
+            sku = f"RING-{n}"
+            ProductVariant.objects.create(company=self.company, shopify_id=variant_id, product_id=1, sku=sku)
+            SKUForecastHistory.objects.create(company=self.company, sku=sku,
+                                              month=self.this_month - relativedelta(months=1),
+                                              predicted_sales_30=0, predicted_sales_60=0, predicted_sales_90=0)
+            for day in range(1, 120):
+                order_id = variant_id * 1000 + day
+                Order.objects.create(company=self.company, shopify_id=order_id,
+                                     order_date=today - timedelta(days=day))
+                OrderLineItem.objects.create(company=self.company, shopify_line_item_id=order_id,
+                                             order_id=order_id, variant_id=variant_id, quantity=n)
+
+        self.responder = sales_average_responder
+        self.standin = BatchStandIn(lambda body: self.responder(body))
+        server = make_server("127.0.0.1", 0, self.standin)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        cube_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cube_dir, True)
+        settings = self.settings(OPENAI_BATCH_BASE_URL=f"http://127.0.0.1:{server.server_port}/v1",
+                                 SALES_CUBE_DIR=cube_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        for name, value in (("top_selling_variant_ids", [501, 502, 503]), ("fetch_live_inventory", 7),
+                            ("get_inventory_value_for_company", None)):
+            patcher = mock.patch.object(views, name, return_value=value)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def run_to_completion(self, run_id=None, polls=10):
+        run_id = run_id or views.start_forecast_batch_run(self.company.id)
+        for _ in range(polls):
+            if ForecastBatchRun.objects.get(id=run_id).status != "running":
+                break
+            views.poll_forecast_batches()
+        return ForecastBatchRun.objects.get(id=run_id)
+
+    def reasons(self, sku):
+        return [row.reason for row in SKUForecastHistory.objects.filter(company=self.company, sku=sku)]
+
+    def assertForecastsFrom(self, source, skus=("RING-1", "RING-2", "RING-3")):
+        for sku in skus:
+            reasons = self.reasons(sku)
+            self.assertEqual(len(reasons), 2)
+            self.assertTrue(all(source in reason for reason in reasons), reasons)
+
+    def test_run_is_submitted_polled_and_applied(self):
+        run = self.run_to_completion()
+
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(run.live_inventory, {"501": 7, "502": 7, "503": 7})
+        # Shopify is asked once per SKU for the whole run, not once per wave
+        self.assertEqual(self.fetch_live_inventory.call_count, 3)
+        self.assertEqual(list(run.jobs.values_list("month", "attempt", "status")),
+                         [(self.this_month - relativedelta(months=1), 0, "applied"),
+                          (self.this_month, 0, "applied")])
+        self.assertForecastsFrom("stand-in")
+        self.assertEqual(set(SKUForecastHistory.objects.values_list("live_inventory", flat=True)), {7})
+
+    def test_missing_and_malformed_answers_are_resubmitted(self):
+        seen = set()
+
+        def responder(body):
+            answers = []
+            for element in json.loads(sales_average_responder(body)):
+                first_time = element["id"] not in seen
+                seen.add(element["id"])
+                if element["id"] == 503:
+                    continue  # never answered
+                if element["id"] == 502 and first_time:
+                    element["predicted_sales_30"] = "lots"
+                answers.append(element)
+            return json.dumps(answers)
+
+        self.responder = responder
+        run = self.run_to_completion()
+
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(list(run.jobs.values_list("month", "attempt")),
+                         [(self.this_month - relativedelta(months=1), 0),
+                          (self.this_month - relativedelta(months=1), 1),
+                          (self.this_month, 0), (self.this_month, 1)])
+        self.assertForecastsFrom("stand-in", skus=("RING-1", "RING-2"))
+        self.assertForecastsFrom("statistical", skus=("RING-3",))
+
+    def test_failed_batch_falls_back_to_the_statistical_forecast(self):
+        def responder(body):
+            raise RuntimeError("model overloaded")
+
+        self.responder = responder
+        run = self.run_to_completion()
+
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(run.jobs.count(), 4)
+        self.assertForecastsFrom("statistical")
+
+    def test_rejected_submission_is_retried_by_the_next_poll(self):
+        with mock.patch.object(BatchAPIClient, "submit", side_effect=BatchAPIError("provider down")):
+            run_id = views.start_forecast_batch_run(self.company.id)
+        job = ForecastBatchJob.objects.get(run_id=run_id)
+        self.assertEqual((job.status, job.submit_errors, job.provider_batch_id), ("unsubmitted", 1, ""))
+        self.assertEqual(sorted(job.skus), ["501", "502", "503"])
+
+        self.standin.delay = 3600
+        views.poll_forecast_batches()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.submit_errors), ("submitted", 1))
+        self.assertIn(job.provider_batch_id, self.standin.batches)
+
+        self.standin.batches[job.provider_batch_id]["_ready_at"] = 0
+        self.standin.delay = 0
+        run = self.run_to_completion(run_id)
+        self.assertEqual(run.status, "completed")
+        self.assertForecastsFrom("stand-in")
+
+    def test_submissions_rejected_too_often_use_the_statistical_forecast(self):
+        with mock.patch.object(BatchAPIClient, "submit", side_effect=BatchAPIError("provider down")):
+            run = self.run_to_completion()
+
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(list(run.jobs.values_list("status", "submit_errors")), [("applied", 2), ("applied", 2)])
+        self.assertForecastsFrom("statistical")
+
+    def test_interrupted_apply_is_picked_up_again(self):
+        run_id = views.start_forecast_batch_run(self.company.id)
+        with mock.patch.object(views, "save_month_forecasts_bulk", side_effect=RuntimeError("database gone")):
+            views.poll_forecast_batches()
+        job = ForecastBatchJob.objects.get(run_id=run_id)
+        self.assertEqual(job.status, "submitted")
+
+        # A worker that died while applying leaves the job claimed
+        ForecastBatchJob.objects.filter(id=job.id).update(
+            status="applying", claimed_at=timezone.now() - timedelta(hours=2))
+        views.poll_forecast_batches()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "applied")
+
+    def test_run_stopped_between_waves_is_resumed(self):
+        run_id = views.start_forecast_batch_run(self.company.id)
+        with mock.patch.object(views, "advance_forecast_run"):
+            views.poll_forecast_batches()
+        # Every job applied, but the next wave was never submitted
+        ForecastBatchRun.objects.filter(id=run_id).update(updated_at=timezone.now() - timedelta(hours=2))
+        self.standin.delay = 3600
+        views.poll_forecast_batches()
+        run = ForecastBatchRun.objects.get(id=run_id)
+        self.assertEqual(run.current_month, self.this_month - relativedelta(months=1))
+        self.assertEqual(list(run.jobs.values_list("status", flat=True)), ["applied", "submitted"])
+
+        # A run that is only waiting for its batch is left alone
+        ForecastBatchRun.objects.filter(id=run_id).update(updated_at=timezone.now() - timedelta(hours=2))
+        views.poll_forecast_batches()
+        self.assertEqual(run.jobs.count(), 2)
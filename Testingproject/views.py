@@ -1,7 +1,8 @@
 import os
 import json
+import time
 import openai
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from django.http import JsonResponse
 from collections import defaultdict
@@ -9,24 +10,52 @@ from django.views.decorators.csrf import csrf_exempt
 from CoreApplication.models import (
     ProductVariant, Product, OrderLineItem, Order, CompanyUser, Prompt, PromotionalData
 )
-from Testingproject.models import SKUForecastHistory
-from django.db.models import Sum
+from Testingproject.models import ForecastBatchJob, ForecastBatchRun, SKUForecastHistory
+from Testingproject.llm_cache import get_cached_response, purge_expired, store_response
+from Testingproject.prompt_templates import sku_segment, tailored_instructions
+from Testingproject.batch_forecast import batch_prompts, forecast_batch, parse_batch_response
+from Testingproject.batch_api import BatchAPIError, FINISHED_STATUSES, get_batch_client, request_line
+from Testingproject.rate_limit import estimate_tokens, openai_limiter
+from Testingproject.sales_cube import build_sales_cube, load_sales_cube, sales_cube_path
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
 from celery import shared_task
 
 # ---------------- OpenAI Setup ----------------
 openai.api_key = os.getenv("OPENAI_API_KEY")
-
-def call_openai(prompt_text):
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt_text}],
-            temperature=0
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print("OpenAI API call failed:", e)
-        return ""
+OPENAI_MODEL = "gpt-4o-mini"
+OPENAI_RATE_LIMIT_RETRIES = 3
+
+def call_openai(prompt_text, use_cache=True):
+    # Identical prompts are answered from the LLM response cache, without using quota
+    if use_cache:
+        cached = get_cached_response("openai", OPENAI_MODEL, 0, prompt_text)
+        if cached is not None:
+            return cached
+    estimated_tokens = estimate_tokens(prompt_text)
+    for attempt in range(OPENAI_RATE_LIMIT_RETRIES + 1):
+        try:
+            openai_limiter.acquire(estimated_tokens)
+            response = openai.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt_text}],
+                temperature=0
+            )
+            usage = getattr(response, "usage", None)
+            openai_limiter.settle(estimated_tokens, usage.total_tokens if usage else None)
+            content = response.choices[0].message.content
+            store_response("openai", OPENAI_MODEL, 0, prompt_text, content)
+            return content
+        except openai.RateLimitError as e:
+            # Quota shared with other clients of the key; back off and retry
+            print(f"OpenAI rate limited (attempt {attempt + 1}):", e)
+            time.sleep(2 ** attempt)
+        except Exception as e:
+            print("OpenAI API call failed:", e)
+            return ""
+    return ""
 
 def clean_openai_json(response_text):
     if not response_text or not response_text.strip():
@@ -56,29 +85,24 @@ def analyze_error(predicted, actual):
 # ---------------- Core Forecast Function ----------------
 
 
-def forecast_single_sku_for_variant(company, variant):
-    """
-    Forecast a single SKU for a given company and variant using AI-tailored prompts.
-    Returns results list for that SKU.
-    """
-    sku = variant.sku
-
-    # Fetch base prompt
+def get_base_prompt():
+    """The forecasting base prompt (Prompt id=2), or None when missing or empty."""
     try:
-        base_prompt_obj = Prompt.objects.get(id=2)
-        base_prompt = base_prompt_obj.prompt
+        base_prompt = Prompt.objects.get(id=2).prompt
         if not base_prompt:
             print(f"Prompt ID 2 is empty")
-            return []
+            return None
+        return base_prompt
     except Prompt.DoesNotExist:
         print(f"Prompt ID 2 not found")
-        return []
+        return None
 
-    # Fetch live Shopify inventory
+
+def fetch_live_inventory(company, variant):
+    """The variant's inventory quantity from Shopify (0 when it can't be fetched)."""
     live_inventory = 0
     try:
         from cryptography.fernet import Fernet
-        from django.conf import settings
         import requests
 
         fernet = Fernet(settings.ENCRYPTION_KEY)
@@ -93,37 +117,28 @@ def forecast_single_sku_for_variant(company, variant):
         if "variant" in data:
             live_inventory = int(data["variant"].get("inventory_quantity", 0))
     except Exception as e:
-        print(f"Failed to fetch Shopify inventory for SKU {sku}: {e}")
+        print(f"Failed to fetch Shopify inventory for SKU {variant.sku}: {e}")
+    return live_inventory
+
+
+def load_sku_context(company, variant, cube=None, live_inventory=None):
+    """
+    Everything about a SKU that stays the same across its forecast months.
+    `live_inventory` skips the Shopify request when the caller already has it.
+    """
+    sku = variant.sku
+    if live_inventory is None:
+        live_inventory = fetch_live_inventory(company, variant)
 
     # Last forecasted month
     last_forecast = SKUForecastHistory.objects.filter(company=company, sku=sku).order_by("-month").first()
     start_month = last_forecast.month if last_forecast else date(2025, 1, 1)
-    end_month = date.today().replace(day=1)
 
-    # Fetch orders and line items
-    all_orders = Order.objects.filter(
-        company=company,
-        order_date__gte=date.today() - relativedelta(years=3),
-        order_date__lt=date.today()
-    ).only("shopify_id", "order_date")
-    order_map = {o.shopify_id: o for o in all_orders}
-
-    all_lineitems = OrderLineItem.objects.filter(
-        company=company,
-        variant_id=variant.shopify_id,
-        order_id__in=order_map.keys()
-    ).only("variant_id", "order_id", "quantity")
-
-    monthly_sales_map = defaultdict(int)
-    daily_sales_map = defaultdict(int)
-    for li in all_lineitems:
-        order_obj = order_map.get(li.order_id)
-        if not order_obj:
-            continue
-        month_key = order_obj.order_date.strftime("%Y-%m")
-        day_key = order_obj.order_date.strftime("%Y-%m-%d")
-        monthly_sales_map[month_key] += li.quantity or 0
-        daily_sales_map[day_key] += li.quantity or 0
+    # Sales history from the run's sales cube (one query per company), or a
+    # cube of this variant alone when called outside a forecast run
+    if cube is None or variant.shopify_id not in cube:
+        cube = build_sales_cube(company, [variant.shopify_id])
+    monthly_sales_map = cube.monthly_sales_map(variant.shopify_id)
 
     # Product info
     try:
@@ -167,58 +182,212 @@ def forecast_single_sku_for_variant(company, variant):
         "error_reason": f.error_reason
     } for f in past_forecasts]
 
-    results_all = []
-    current_month = start_month
+    return {
+        "variant": variant,
+        "sku": sku,
+        "cube": cube,
+        "live_inventory": live_inventory,
+        "start_month": start_month,
+        "monthly_sales_map": monthly_sales_map,
+        "product_data": product_data,
+        "promo_data_list": promo_data_list,
+        "marketing_campaign_flag": marketing_campaign_flag,
+        "past_errors": past_errors,
+    }
 
-    while current_month <= end_month:
-        # Last 6 months monthly sales
-        monthly_totals = {
-            (current_month - relativedelta(months=5-i)).strftime("%Y-%m"): monthly_sales_map.get(
-                (current_month - relativedelta(months=5-i)).strftime("%Y-%m"), 0
-            ) for i in range(6)
-        }
 
-        # Last 2 months daily sales
-        daily_totals = {
-            day_str: qty for day_str, qty in daily_sales_map.items()
-            if current_month - relativedelta(months=2) <= datetime.strptime(day_str, "%Y-%m-%d").date() < current_month
-        }
+def sku_month_data(ctx, current_month):
+    """The SKU data sent to the LLM for one forecast month."""
+    variant = ctx["variant"]
+    monthly_sales_map = ctx["monthly_sales_map"]
 
-        # ---------------- Tailored AI Prompt ----------------
-        data_for_prompt = {
-            "sku": sku,
-            "variant_title": variant.title,
-            "price": float(variant.price) if variant.price else None,
-            "compare_at_price": float(variant.compare_at_price) if variant.compare_at_price else None,
-            "cost": float(variant.cost) if variant.cost else None,
-            "created_at": str(variant.created_at.date()) if variant.created_at else None,
-            "product": product_data,
-            "monthly_sales_last_6_months": monthly_totals,
-            "daily_sales_last_2_months": daily_totals,
-            "previous_errors": past_errors[-5:],
-            "promotional_data_last_3_months": promo_data_list,
-            "marketing_campaign_flag": marketing_campaign_flag
-        }
+    # Last 6 months monthly sales
+    monthly_totals = {
+        (current_month - relativedelta(months=5-i)).strftime("%Y-%m"): monthly_sales_map.get(
+            (current_month - relativedelta(months=5-i)).strftime("%Y-%m"), 0
+        ) for i in range(6)
+    }
 
-        prompt_for_generation = f"""
-You are a prompt generator. Using this base prompt from DB (do NOT change instructions, only tailor to SKU):
+    # Last 2 months daily sales
+    daily_totals = ctx["cube"].daily_sales_map(variant.shopify_id, current_month - relativedelta(months=2), current_month)
 
-{base_prompt}
+    return {
+        "sku": ctx["sku"],
+        "variant_title": variant.title,
+        "price": float(variant.price) if variant.price else None,
+        "compare_at_price": float(variant.compare_at_price) if variant.compare_at_price else None,
+        "cost": float(variant.cost) if variant.cost else None,
+        "created_at": str(variant.created_at.date()) if variant.created_at else None,
+        "product": ctx["product_data"],
+        "monthly_sales_last_6_months": monthly_totals,
+        "daily_sales_last_2_months": daily_totals,
+        "previous_errors": ctx["past_errors"][-5:],
+        "promotional_data_last_3_months": ctx["promo_data_list"],
+        "marketing_campaign_flag": ctx["marketing_campaign_flag"]
+    }
 
-And this SKU data:
 
-{json.dumps(data_for_prompt, indent=2)}
+def build_month_forecast(ctx, current_month, parsed_response):
+    """
+    (SKUForecastHistory fields, result row, whether metrics apply) of one
+    month's forecast; also records it in the SKU's past errors.
+    """
+    live_inventory = ctx["live_inventory"]
 
-Generate a tailored prompt that:
-- Adjusts weightages for this SKU based on monthly/daily sales, trends, tags, and promotions
-- Incorporates previous prediction errors
-- Always results in strict JSON forecast for 30, 60, 90 days
-Return only the text of the new prompt.
-"""
-        generated_prompt_text = call_openai(prompt_for_generation)
+    predicted_sales_30 = parsed_response.get("predicted_sales_30", 0)
+    predicted_sales_60 = parsed_response.get("predicted_sales_60", 0)
+    predicted_sales_90 = parsed_response.get("predicted_sales_90", 0)
+    reason_30 = parsed_response.get("reason_30", "")
+    reason_60 = parsed_response.get("reason_60", "")
+    reason_90 = parsed_response.get("reason_90", "")
 
-        # Forecast using the generated prompt
-        forecast_input = f"""
+    combined_reason = f"30d: {reason_30}; 60d: {reason_60}; 90d: {reason_90}"
+
+    # --- Update actual_sales: None for current month, otherwise fetch from monthly_sales_map ---
+    if current_month >= date.today().replace(day=1):
+        actual_sales_30 = None
+    else:
+        actual_sales_30 = ctx["monthly_sales_map"].get(current_month.strftime("%Y-%m"), 0)
+
+    # --- Calculate errors and metrics only if actual sales exist ---
+    if actual_sales_30 is not None:
+        error_reason, error_value = analyze_error(predicted_sales_30, actual_sales_30)
+        calculate_metrics = True
+    else:
+        error_reason, error_value = None, None
+        calculate_metrics = False
+
+    defaults = {
+        "predicted_sales_30": predicted_sales_30,
+        "predicted_sales_60": predicted_sales_60,
+        "predicted_sales_90": predicted_sales_90,
+        "actual_sales_30": actual_sales_30 ,
+        "reason": combined_reason,
+        "live_inventory": live_inventory,
+        "error": error_value,
+        "error_reason": error_reason
+    }
+
+    ctx["past_errors"].append({
+        "month": current_month.strftime("%Y-%m"),
+        "predicted_sales_30": predicted_sales_30,
+        "predicted_sales_60": predicted_sales_60,
+        "predicted_sales_90": predicted_sales_90,
+        "actual_sales": actual_sales_30,
+        "reason_30": reason_30,
+        "reason_60": reason_60,
+        "reason_90": reason_90,
+        "error_reason": error_reason,
+        "error_value": error_value,
+        "live_inventory": live_inventory
+    })
+
+    result = {
+        "month": current_month.strftime("%Y-%m"),
+        "predicted_sales_30": predicted_sales_30,
+        "predicted_sales_60": predicted_sales_60,
+        "predicted_sales_90": predicted_sales_90,
+        "actual_sales": actual_sales_30,
+        "error": error_value,
+        "error_reason": error_reason,
+        "live_inventory": live_inventory
+    }
+    return defaults, result, calculate_metrics
+
+
+def save_sku_month_forecast(company, ctx, current_month, parsed_response):
+    """Store one month's forecast (and its error/metrics once actuals exist); returns the result row."""
+    defaults, result, calculate_metrics = build_month_forecast(ctx, current_month, parsed_response)
+    SKUForecastHistory.objects.update_or_create(
+        company=company,
+        sku=ctx["sku"],
+        month=current_month,
+        defaults=defaults
+    )
+    if calculate_metrics:
+        calculate_metrics_for_sku(company, ctx["sku"], current_month)
+    return result
+
+
+def save_month_forecasts_bulk(company, current_month, entries):
+    """
+    Store the forecasts of many SKUs for one month, [(ctx, parsed_response)],
+    with one read, one bulk update and one bulk insert.
+    """
+    built = {}
+    for ctx, parsed_response in entries:
+        built[ctx["sku"]] = build_month_forecast(ctx, current_month, parsed_response)
+    if not built:
+        return
+    existing = {}
+    for row in SKUForecastHistory.objects.filter(company=company, month=current_month, sku__in=list(built)):
+        existing.setdefault(row.sku, row)
+
+    to_update, to_create = [], []
+    for sku, (defaults, _, _) in built.items():
+        row = existing.get(sku)
+        if row is None:
+            to_create.append(SKUForecastHistory(company=company, sku=sku, month=current_month, **defaults))
+            continue
+        for field, value in defaults.items():
+            setattr(row, field, value)
+        to_update.append(row)
+    with transaction.atomic():
+        SKUForecastHistory.objects.bulk_update(to_update, fields=list(SKU_FORECAST_FIELDS), batch_size=500)
+        SKUForecastHistory.objects.bulk_create(to_create, batch_size=500)
+
+    for sku, (_, _, calculate_metrics) in built.items():
+        if calculate_metrics:
+            calculate_metrics_for_sku(company, sku, current_month)
+
+
+SKU_FORECAST_FIELDS = (
+    "predicted_sales_30", "predicted_sales_60", "predicted_sales_90", "actual_sales_30",
+    "reason", "live_inventory", "error", "error_reason",
+)
+
+
+def trivial_stat_forecast(ctx, current_month):
+    """
+    Statistical baseline for the month, and whether it replaces the LLM:
+    trivially predictable SKUs (no recent sales, or a model that backtests
+    within tolerance) skip the call. It also stands in when the LLM gives no
+    usable answer.
+    """
+    stat_forecast = ctx["cube"].statistical_forecast(ctx["variant"].shopify_id, current_month)
+    return stat_forecast, settings.STAT_FORECAST_SKIP_LLM and stat_forecast["trivial"]
+
+
+def forecast_single_sku_for_variant(company, variant, cube=None):
+    """
+    Forecast a single SKU for a given company and variant using AI-tailored prompts.
+    `cube` is the run's SalesCube, when the caller built one.
+    Returns results list for that SKU.
+    """
+    base_prompt = get_base_prompt()
+    if not base_prompt:
+        return []
+
+    ctx = load_sku_context(company, variant, cube)
+    sku = ctx["sku"]
+    end_month = date.today().replace(day=1)
+
+    results_all = []
+    current_month = ctx["start_month"]
+
+    while current_month <= end_month:
+        # ---------------- Tailored AI Prompt ----------------
+        data_for_prompt = sku_month_data(ctx, current_month)
+
+        stat_forecast, skip_llm = trivial_stat_forecast(ctx, current_month)
+        if skip_llm:
+            parsed_response = stat_forecast
+        else:
+            # Tailored instructions per SKU segment (generated once per segment, not per SKU-month)
+            generated_prompt_text = tailored_instructions(base_prompt, sku_segment(data_for_prompt), call_openai)
+
+            # Forecast using the generated prompt
+            forecast_input = f"""
 {generated_prompt_text}
 
 Here is the current month data:
@@ -227,140 +396,445 @@ Here is the current month data:
 
 Return **only valid JSON** with keys: predicted_sales_30, predicted_sales_60, predicted_sales_90, reason_30, reason_60, reason_90.
 """
-        openai_response = call_openai(forecast_input)
-        parsed_response = clean_openai_json(openai_response)
-        if not parsed_response:
             openai_response = call_openai(forecast_input)
             parsed_response = clean_openai_json(openai_response)
+            if not parsed_response:
+                # Ask again rather than reuse the cached unusable answer
+                openai_response = call_openai(forecast_input, use_cache=False)
+                parsed_response = clean_openai_json(openai_response)
+            if not parsed_response:
+                print(f"No usable LLM forecast for SKU {sku} ({current_month:%Y-%m}); "
+                      f"using the statistical forecast")
+                parsed_response = stat_forecast
+
+        results_all.append(save_sku_month_forecast(company, ctx, current_month, parsed_response))
+        current_month += relativedelta(months=1)
 
-        predicted_sales_30 = parsed_response.get("predicted_sales_30", 0)
-        predicted_sales_60 = parsed_response.get("predicted_sales_60", 0)
-        predicted_sales_90 = parsed_response.get("predicted_sales_90", 0)
-        reason_30 = parsed_response.get("reason_30", "")
-        reason_60 = parsed_response.get("reason_60", "")
-        reason_90 = parsed_response.get("reason_90", "")
-
-        combined_reason = f"30d: {reason_30}; 60d: {reason_60}; 90d: {reason_90}"
-
-        # --- Update actual_sales: None for current month, otherwise fetch from monthly_sales_map ---
-        if current_month >= date.today().replace(day=1):
-            actual_sales_30 = None
-        else:
-            actual_sales_30 = monthly_sales_map.get(current_month.strftime("%Y-%m"), 0)
-
-        # --- Calculate errors and metrics only if actual sales exist ---
-        if actual_sales_30 is not None:
-            error_reason, error_value = analyze_error(predicted_sales_30, actual_sales_30)
-            calculate_metrics = True
-        else:
-            error_reason, error_value = None, None
-            calculate_metrics = False
+    return results_all
 
-        forecast, _ = SKUForecastHistory.objects.update_or_create(
-            company=company,
-            sku=sku,
-            month=current_month,
-            defaults={
-                "predicted_sales_30": predicted_sales_30,
-                "predicted_sales_60": predicted_sales_60,
-                "predicted_sales_90": predicted_sales_90,
-                "actual_sales_30": actual_sales_30 ,
-                "reason": combined_reason,
-                "live_inventory": live_inventory,
-                "error": error_value,
-                "error_reason": error_reason
-            }
-        )
 
-        if calculate_metrics:
-            calculate_metrics_for_sku(company, sku, current_month)
+def forecast_variants_batched(company, variants, cube=None):
+    """
+    Forecast several SKUs month by month with one LLM request per batch of
+    SKU-months (see batch_forecast.py); SKUs the batch answers leave out or
+    get wrong are asked again, then fall back to the statistical forecast.
+    Returns {variant shopify_id: results list}.
+    """
+    base_prompt = get_base_prompt()
+    if not base_prompt:
+        return {}
 
-        past_errors.append({
-            "month": current_month.strftime("%Y-%m"),
-            "predicted_sales_30": predicted_sales_30,
-            "predicted_sales_60": predicted_sales_60,
-            "predicted_sales_90": predicted_sales_90,
-            "actual_sales": actual_sales_30,
-            "reason_30": reason_30,
-            "reason_60": reason_60,
-            "reason_90": reason_90,
-            "error_reason": error_reason,
-            "error_value": error_value,
-            "live_inventory": live_inventory
-        })
+    contexts = {variant.shopify_id: load_sku_context(company, variant, cube) for variant in variants}
+    results = {variant_id: [] for variant_id in contexts}
+    if not contexts:
+        return results
+    end_month = date.today().replace(day=1)
+    current_month = min(ctx["start_month"] for ctx in contexts.values())
 
-        results_all.append({
-            "month": current_month.strftime("%Y-%m"),
-            "predicted_sales_30": predicted_sales_30,
-            "predicted_sales_60": predicted_sales_60,
-            "predicted_sales_90": predicted_sales_90,
-            "actual_sales": actual_sales_30,
-            "error": error_value,
-            "error_reason": error_reason,
-            "live_inventory": live_inventory
-        })
+    def instructions(segment):
+        # Tailored per SKU segment, as for single SKUs
+        return tailored_instructions(base_prompt, segment, call_openai)
 
+    while current_month <= end_month:
+        pending, fallbacks = {}, {}
+        for variant_id, ctx in contexts.items():
+            if ctx["start_month"] > current_month:
+                continue
+            data_for_prompt = sku_month_data(ctx, current_month)
+            stat_forecast, skip_llm = trivial_stat_forecast(ctx, current_month)
+            fallbacks[variant_id] = stat_forecast
+            if not skip_llm:
+                pending[variant_id] = data_for_prompt
+
+        answers = forecast_batch(base_prompt, pending, call_openai, instructions=instructions) if pending else {}
+        for variant_id, stat_forecast in fallbacks.items():
+            if variant_id in pending and variant_id not in answers:
+                print(f"No usable LLM forecast for SKU {contexts[variant_id]['sku']} ({current_month:%Y-%m}); "
+                      f"using the statistical forecast")
+            parsed_response = answers.get(variant_id, stat_forecast)
+            results[variant_id].append(save_sku_month_forecast(company, contexts[variant_id], current_month, parsed_response))
         current_month += relativedelta(months=1)
 
-    return results_all
+    return results
 
 
-# ---------------- Celery Task ----------------
+# ---------------- Celery Tasks ----------------
+# run_monthly_forecast fans out one chord per company: a task per SKU (the
+# SKUs run in parallel across workers, their OpenAI calls paced by the shared
+# limiter in rate_limit.py), then finish_company_forecast once every SKU of
+# the company is done. The company's sales history is read once into a
+# sales cube file that all of its SKU tasks load. With FORECAST_BATCH_SIZE
+# above 1, each task takes a group of that many SKUs and forecasts them with
+# one batched LLM request per month.
 
-from celery import shared_task
+from celery import chord, shared_task
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from django.db.models import Sum
 from CoreApplication.models import CompanyUser, OrderLineItem, ProductVariant
 from .models import InventoryValuation
 
+
+def top_selling_variant_ids(company, limit):
+    """Shopify variant IDs of the company's best sellers over the last 2 months."""
+    two_months_ago = date.today() - relativedelta(months=2)
+    recent_orders = Order.objects.filter(company=company, order_date__gte=two_months_ago).values("shopify_id")
+    sku_sales = (
+        OrderLineItem.objects.filter(company=company, order_id__in=recent_orders, variant_id__isnull=False)
+        .values("variant_id")
+        .annotate(total_qty=Sum("quantity"))
+        .order_by("-total_qty")[:limit]
+    )
+    return [row["variant_id"] for row in sku_sales]
+
+
 @shared_task
 def run_monthly_forecast():
     print("Starting monthly forecast task for all companies...")
+    batch_api = settings.FORECAST_EXECUTION == "batch_api"
+    for company_id in CompanyUser.objects.values_list("id", flat=True):
+        if batch_api:
+            start_forecast_batch_run.delay(company_id)
+        else:
+            forecast_company_task.delay(company_id)
+
+
+@shared_task(bind=True)
+def forecast_company_task(self, company_id):
+    company = CompanyUser.objects.get(id=company_id)
+    variant_ids = top_selling_variant_ids(company, settings.MONTHLY_FORECAST_MAX_SKUS)
+    print(f"Processing company {company_id}: {len(variant_ids)} SKUs")
+    if not variant_ids:
+        finish_company_forecast.delay([], company_id)
+        return 0
+    cube_path = sales_cube_path(company_id, self.request.id or date.today().isoformat())
+    build_sales_cube(company, variant_ids).save(cube_path)
+    batch_size = settings.FORECAST_BATCH_SIZE
+    if batch_size > 1:
+        header = [forecast_sku_batch_task.s(company_id, variant_ids[i:i + batch_size], cube_path)
+                  for i in range(0, len(variant_ids), batch_size)]
+    else:
+        header = [forecast_sku_task.s(company_id, variant_id, cube_path) for variant_id in variant_ids]
+    # A header task killed by a hard time limit fails the chord and skips the
+    # callback; the errback then cleans up and saves the valuation instead
+    callback = finish_company_forecast.s(company_id, cube_path)
+    callback.on_error(company_forecast_failed.s(company_id, cube_path))
+    chord(header)(callback)
+    return len(variant_ids)
 
-    companies = CompanyUser.objects.all()
-    for company in companies:
-        print(f"Processing company {company.id}...")
 
-        two_months_ago = date.today() - relativedelta(months=2)
+@shared_task
+def forecast_sku_task(company_id, variant_id, cube_path=None):
+    # Failures are returned, not raised, so one bad SKU cannot hold back the chord
+    try:
+        company = CompanyUser.objects.get(id=company_id)
+        variant = ProductVariant.objects.filter(company=company, shopify_id=variant_id).first()
+        if variant is None:
+            print(f"Variant {variant_id} not found for company {company_id}")
+            return {"variant_id": variant_id, "status": "missing"}
+        # Workers that cannot see the cube file build this variant's history themselves
+        cube = load_sales_cube(cube_path) if cube_path and os.path.exists(cube_path) else None
+        results = forecast_single_sku_for_variant(company, variant, cube)
+        return {"variant_id": variant_id, "status": "ok", "months": len(results)}
+    except Exception as e:
+        print(f"Forecast failed for variant {variant_id} of company {company_id}: {e}")
+        return {"variant_id": variant_id, "status": "failed", "error": str(e)}
 
-        # Fetch top 500 SKUs in last 2 months
-        sku_sales = (
-            OrderLineItem.objects.filter(
-                company=company,
-                order__order_date__gte=two_months_ago
-            )
-            .values("variant_id")
-            .annotate(total_qty=Sum("quantity"))
-            .order_by("-total_qty")[:500]
+
+@shared_task
+def forecast_sku_batch_task(company_id, variant_ids, cube_path=None):
+    # Returns one status per SKU, like forecast_sku_task
+    try:
+        company = CompanyUser.objects.get(id=company_id)
+        variants = list(ProductVariant.objects.filter(company=company, shopify_id__in=variant_ids))
+        found = {variant.shopify_id for variant in variants}
+        cube = load_sales_cube(cube_path) if cube_path and os.path.exists(cube_path) else None
+        results = forecast_variants_batched(company, variants, cube)
+        return [
+            {"variant_id": variant_id, "status": "ok", "months": len(results.get(variant_id, []))}
+            if variant_id in found else {"variant_id": variant_id, "status": "missing"}
+            for variant_id in variant_ids
+        ]
+    except Exception as e:
+        print(f"Batch forecast failed for company {company_id}: {e}")
+        return [{"variant_id": variant_id, "status": "failed", "error": str(e)} for variant_id in variant_ids]
+
+
+@shared_task
+def finish_company_forecast(sku_results, company_id, cube_path=None):
+    if cube_path and os.path.exists(cube_path):
+        os.remove(cube_path)
+    # Batch tasks return a list of SKU statuses each
+    sku_results = [r for result in sku_results for r in (result if isinstance(result, list) else [result])]
+    company = CompanyUser.objects.get(id=company_id)
+    failed = [r["variant_id"] for r in sku_results if r.get("status") == "failed"]
+    print(f"Company {company_id}: forecast {len(sku_results) - len(failed)} SKUs, {len(failed)} failed")
+
+    # ---------------- Inventory Valuation ---------------- #
+    total_value = get_inventory_value_for_company(company)
+    order = Order.objects.filter(company=company).first()
+    currency = order.currency if order else "INR"
+    if total_value is not None:
+        InventoryValuation.objects.update_or_create(
+            company=company,
+            month=date.today().replace(day=1),
+            defaults={
+                "inventory_value": total_value,
+                      "currency": currency
+                      }
         )
+        print(f"Saved inventory value for company {company.id}: {total_value}")
+    else:
+        print(f"Inventory calculation failed for company {company.id}")
 
-        for sku_data in sku_sales:
-            variant_id = sku_data["variant_id"]
-            try:
-                variant = ProductVariant.objects.get(company=company, shopify_id=variant_id)
-                forecast_single_sku_for_variant(company, variant)
-            except ProductVariant.DoesNotExist:
-                print(f"Variant {variant_id} not found for company {company.id}")
+    return {"company_id": company_id, "skus": len(sku_results), "failed": failed}
 
-        # ---------------- Inventory Valuation ---------------- #
-        total_value = get_inventory_value_for_company(company)
-        order = Order.objects.filter(company=company).first()
-        currency = order.currency if order else "INR"
-        if total_value is not None:
-            InventoryValuation.objects.update_or_create(
-                company=company,
-                month=date.today().replace(day=1),
-                defaults={
-                    "inventory_value": total_value,
-                          "currency": currency
-                          }
-            )
-            print(f"Saved inventory value for company {company.id}: {total_value}")
+
+@shared_task
+def company_forecast_failed(request, exc, traceback, company_id, cube_path=None):
+    # Errback of the company chord. SKU forecasts are saved as each task
+    # finishes, so only the callback's own work is left to do here.
+    print(f"Forecast chord of company {company_id} failed ({exc}); finishing without SKU statuses")
+    return finish_company_forecast([], company_id, cube_path)
+
+
+
+# ---------------- Batch API Execution ----------------
+# FORECAST_EXECUTION=batch_api: instead of synchronous chat completions, a
+# company's forecast requests (batched prompts, as in forecast_sku_batch_task)
+# are written to a JSONL file and submitted to the provider's Batch API, one
+# month at a time. poll_forecast_batches applies finished batches in bulk,
+# re-submits the SKUs without a valid answer (up to FORECAST_BATCH_RETRIES
+# times, then the statistical forecast is used) and moves the run on to the
+# next month; after the last one it runs finish_company_forecast.
+#
+# Live Shopify inventory is read once, when the run starts. A submission the
+# provider rejects is kept as an "unsubmitted" job and retried by the next
+# polls (FORECAST_BATCH_SUBMIT_RETRIES times), and jobs or runs left half-way
+# by a dead worker are picked up again after FORECAST_BATCH_CLAIM_TIMEOUT.
+
+
+@shared_task
+def start_forecast_batch_run(company_id):
+    company = CompanyUser.objects.get(id=company_id)
+    variant_ids = top_selling_variant_ids(company, settings.MONTHLY_FORECAST_MAX_SKUS)
+    if not variant_ids:
+        finish_company_forecast([], company_id)
+        return None
+    cube_path = sales_cube_path(company_id, f"batch_{timezone.now():%Y%m%d%H%M%S}")
+    build_sales_cube(company, variant_ids).save(cube_path)
+
+    variant_starts, live_inventory = {}, {}
+    for variant_id in variant_ids:
+        variant = ProductVariant.objects.filter(company=company, shopify_id=variant_id).first()
+        if variant is None:
+            continue
+        last_forecast = SKUForecastHistory.objects.filter(company=company, sku=variant.sku).order_by("-month").first()
+        variant_starts[str(variant_id)] = (last_forecast.month if last_forecast else date(2025, 1, 1)).isoformat()
+        live_inventory[str(variant_id)] = fetch_live_inventory(company, variant)
+    if not variant_starts:
+        finish_company_forecast([], company_id, cube_path)
+        return None
+
+    run = ForecastBatchRun.objects.create(
+        company=company,
+        variant_starts=variant_starts,
+        live_inventory=live_inventory,
+        cube_path=cube_path,
+        current_month=min(date.fromisoformat(start) for start in variant_starts.values()),
+        end_month=date.today().replace(day=1),
+    )
+    submit_forecast_wave(run)
+    return run.id
+
+
+def submit_forecast_wave(run, variant_ids=None, attempt=0, job=None):
+    """
+    Submit the forecast requests of the run's current month, for `variant_ids`
+    (default: every SKU due that month). Trivial SKUs are stored right away.
+    If the provider can't be reached, the SKUs are kept on an unsubmitted job
+    (`job` when re-submitting one) for poll_forecast_batches to retry.
+    """
+    company = run.company
+    month = run.current_month
+    # Keeps poll_forecast_batches from resuming the run while this wave is built
+    ForecastBatchRun.objects.filter(id=run.id).update(updated_at=timezone.now())
+    cube = load_sales_cube(run.cube_path)
+    base_prompt = get_base_prompt()
+    due = [int(v) for v, start in run.variant_starts.items()
+           if date.fromisoformat(start) <= month and (variant_ids is None or int(v) in variant_ids)]
+
+    items, skus, trivial = {}, {}, []
+    for variant in ProductVariant.objects.filter(company=company, shopify_id__in=due):
+        ctx = load_sku_context(company, variant, cube,
+                               live_inventory=run.live_inventory.get(str(variant.shopify_id), 0))
+        stat_forecast, skip_llm = trivial_stat_forecast(ctx, month)
+        if skip_llm or not base_prompt:
+            trivial.append((ctx, stat_forecast))
         else:
-            print(f"Inventory calculation failed for company {company.id}")
+            items[variant.shopify_id] = sku_month_data(ctx, month)
+            skus[str(variant.shopify_id)] = [ctx["sku"], ctx["live_inventory"]]
+    save_month_forecasts_bulk(company, month, trivial)
+
+    if not items:
+        if job is not None:
+            job.status = "applied"
+            job.completed_at = timezone.now()
+            job.save(update_fields=["status", "completed_at"])
+        if not run.jobs.filter(month=month).exclude(status="applied").exists():
+            advance_forecast_run(run)
+        return None
+
+    requests_by_id, lines = {}, []
+    prompts = batch_prompts(base_prompt, items, max(1, settings.FORECAST_BATCH_SIZE),
+                            instructions=lambda segment: tailored_instructions(base_prompt, segment, call_openai))
+    for n, (chunk, prompt_text) in enumerate(prompts):
+        custom_id = f"{month:%Y-%m}-{attempt}-{n}"
+        requests_by_id[custom_id] = chunk
+        lines.append(request_line(custom_id, prompt_text, OPENAI_MODEL))
+
+    job = job or ForecastBatchJob(run=run, month=month, attempt=attempt)
+    job.skus = skus
+    job.claimed_at = None
+    try:
+        batch_id, input_file_id = get_batch_client().submit(
+            lines, metadata={"company_id": company.id, "run_id": run.id, "month": f"{month:%Y-%m}"})
+    except BatchAPIError as e:
+        job.submit_errors += 1
+        job.requests = {}
+        if job.submit_errors > settings.FORECAST_BATCH_SUBMIT_RETRIES:
+            print(f"Giving up on forecast batch of run {run.id} ({month:%Y-%m}) after "
+                  f"{job.submit_errors} failed submissions: {e}")
+            job.status = "applying"
+            job.save()
+            apply_forecast_batch_job(job, {})
+            return None
+        print(f"Could not submit forecast batch of run {run.id} ({month:%Y-%m}), retrying on the next poll: {e}")
+        job.status = "unsubmitted"
+        job.save()
+        return job
+    job.provider_batch_id = batch_id
+    job.input_file_id = input_file_id
+    job.requests = requests_by_id
+    job.status = "submitted"
+    job.save()
+    print(f"Submitted forecast batch {batch_id} for company {company.id} ({month:%Y-%m}): "
+          f"{len(items)} SKUs in {len(lines)} requests")
+    return job
+
+
+def apply_forecast_batch_job(job, responses):
+    """Store a finished batch's forecasts ({custom_id: response text}) in bulk."""
+    run = job.run
+    cube = load_sales_cube(run.cube_path)
+    answers = {}
+    for custom_id, variant_ids in job.requests.items():
+        answers.update(parse_batch_response(responses.get(custom_id), set(variant_ids)))
+    failed = [v for variant_ids in job.requests.values() for v in variant_ids if v not in answers]
+    retry = bool(failed) and job.attempt < settings.FORECAST_BATCH_RETRIES
+
+    entries = []
+    for variant_id_str, (sku, live_inventory) in job.skus.items():
+        variant_id = int(variant_id_str)
+        if variant_id not in answers and retry:
+            continue
+        ctx = {
+            "sku": sku,
+            "live_inventory": live_inventory,
+            "monthly_sales_map": cube.monthly_sales_map(variant_id),
+            "past_errors": [],
+        }
+        entries.append((ctx, answers.get(variant_id) or cube.statistical_forecast(variant_id, job.month)))
+    save_month_forecasts_bulk(run.company, job.month, entries)
+    job.status = "applied"
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "completed_at"])
+    print(f"Applied forecast batch {job.provider_batch_id or job.id}: {len(answers)} answered, {len(failed)} "
+          f"without a valid answer ({'re-submitting' if retry else 'statistical forecast used'})")
+
+    if retry:
+        submit_forecast_wave(run, variant_ids=set(failed), attempt=job.attempt + 1)
+    elif not run.jobs.filter(month=job.month).exclude(status="applied").exists():
+        advance_forecast_run(run)
+
+
+def advance_forecast_run(run):
+    run.current_month += relativedelta(months=1)
+    if run.current_month > run.end_month:
+        run.status = "completed"
+        run.save(update_fields=["current_month", "status", "updated_at"])
+        finish_company_forecast([{"variant_id": int(v), "status": "ok"} for v in run.variant_starts],
+                                run.company_id, run.cube_path)
+        return
+    run.save(update_fields=["current_month", "updated_at"])
+    submit_forecast_wave(run)
+
+
+def release_stale_forecast_batch_jobs(stale_before):
+    """Hand jobs claimed by a poll that died half-way back to the next poll."""
+    stale = Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale_before)
+    ForecastBatchJob.objects.filter(stale, status="submitting").update(status="unsubmitted", claimed_at=None)
+    ForecastBatchJob.objects.filter(stale, status="applying").update(status="submitted", claimed_at=None)
+
+
+@shared_task
+def poll_forecast_batches():
+    client = get_batch_client()
+    stale_before = timezone.now() - timedelta(minutes=settings.FORECAST_BATCH_CLAIM_TIMEOUT)
+    release_stale_forecast_batch_jobs(stale_before)
+
+    # Submissions the provider rejected earlier
+    for job in ForecastBatchJob.objects.filter(status="unsubmitted").select_related("run"):
+        if not ForecastBatchJob.objects.filter(id=job.id, status="unsubmitted").update(
+                status="submitting", claimed_at=timezone.now()):
+            continue
+        try:
+            submit_forecast_wave(job.run, variant_ids={int(v) for v in job.skus}, attempt=job.attempt, job=job)
+        except Exception as e:
+            print(f"Re-submitting forecast batch job {job.id} failed, retrying on the next poll: {e}")
+            ForecastBatchJob.objects.filter(id=job.id, status="submitting").update(
+                status="unsubmitted", claimed_at=None)
+
+    # Runs that stopped between two waves: every job applied, next one never submitted
+    waiting = ("unsubmitted", "submitting", "submitted", "applying")
+    for run in ForecastBatchRun.objects.filter(status="running", updated_at__lt=stale_before).exclude(
+            jobs__status__in=waiting).select_related("company"):
+        if not ForecastBatchRun.objects.filter(id=run.id, updated_at=run.updated_at).update(
+                updated_at=timezone.now()):
+            continue
+        print(f"Resuming forecast batch run {run.id} at {run.current_month:%Y-%m}")
+        try:
+            submit_forecast_wave(run)
+        except Exception as e:
+            print(f"Resuming forecast batch run {run.id} failed: {e}")
+
+    for job in ForecastBatchJob.objects.filter(status="submitted").select_related("run"):
+        try:
+            info = client.retrieve(job.provider_batch_id)
+        except BatchAPIError as e:
+            print(e)
+            continue
+        if info["status"] not in FINISHED_STATUSES:
+            continue
+        # Claim the job so overlapping polls apply it once
+        if not ForecastBatchJob.objects.filter(id=job.id, status="submitted").update(
+                status="applying", provider_status=info["status"], output_file_id=info["output_file_id"],
+                claimed_at=timezone.now()):
+            continue
+        try:
+            responses = client.results(info["output_file_id"]) if info["output_file_id"] else {}
+            apply_forecast_batch_job(job, responses)
+        except Exception as e:
+            # Forecasts are stored as upserts, so applying the batch again is safe
+            print(f"Applying forecast batch {job.provider_batch_id} failed, retrying on the next poll: {e}")
+            ForecastBatchJob.objects.filter(id=job.id, status="applying").update(status="submitted", claimed_at=None)
+
 
-    print("Monthly forecast task completed.")
+@shared_task
+def purge_llm_response_cache():
+    deleted = purge_expired()
+    print(f"Purged {deleted} expired LLM responses")
+    return deleted
 
 
 
@@ -381,7 +855,6 @@ def get_inventory_value_for_company(company):
     """
     from cryptography.fernet import Fernet
     import requests
-    from django.conf import settings
 
     if not company.shopify_access_token or not company.shopify_store_url:
         return None
@@ -453,13 +926,14 @@ def manual_forecast(request):
             .annotate(total_qty=Sum("quantity"))
             .order_by("-total_qty")[:50]
         )
+        cube = build_sales_cube(company, [sku_data["variant_id"] for sku_data in sku_sales])
 
         for sku_data in sku_sales:
             variant_id = sku_data["variant_id"]
             try:
                 variant = ProductVariant.objects.get(company=company, shopify_id=variant_id)
                 # Forecast single SKU
-                res = forecast_single_sku_for_variant(company, variant)
+                res = forecast_single_sku_for_variant(company, variant, cube)
                 results.extend(res)
             except ProductVariant.DoesNotExist:
                 print(f"Variant {variant_id} not found for company {company.id}")
@@ -554,18 +1028,6 @@ from Testingproject.models import SKUForecastHistory
 # Set your OpenAI key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def call_openai(prompt_text):
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt_text}],
-            temperature=0
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        print("OpenAI API call failed:", e)
-        return ""
-
 def clean_openai_json(response_text):
     if not response_text or not response_text.strip():
         return {}
@@ -624,7 +1086,6 @@ def forecast_single_sku(request):
     live_inventory = 0
     try:
         from cryptography.fernet import Fernet
-        from django.conf import settings
         import requests
 
         fernet = Fernet(settings.ENCRYPTION_KEY)
@@ -773,7 +1234,7 @@ Return **only valid JSON** with keys: predicted_sales_30, predicted_sales_60, pr
         # Retry if empty
         if not parsed_response:
             print("Retrying OpenAI forecast call...")
-            openai_response = call_openai(forecast_input)
+            openai_response = call_openai(forecast_input, use_cache=False)
             parsed_response = clean_openai_json(openai_response)
 
         # Extract predictions & reasons
@@ -853,7 +1314,6 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from CoreApplication.views import get_user_from_token
 from cryptography.fernet import Fernet
-from django.conf import settings
 from CoreApplication.models import Order
 
 @csrf_exempt
@@ -23,8 +23,43 @@ app.conf.beat_schedule = {
 
     # New monthly SKU forecast task for 28th
     "monthly-sku-forecast-28th": {
-        "task": "CoreApplication.views.run_monthly_forecast",  # string path to your view function
+        "task": "Testingproject.views.run_monthly_forecast",  # fans out per company and SKU
         "schedule": crontab(hour=2, minute=0, day_of_month=28),
         "args": (),  # no args; the function handles looping through companies
+    },
+
+    # Drop vectors of deleted rows from every tenant index, Sunday night
+    "vector-index-compaction-weekly": {
+        "task": "CoreApplication.views.compact_all_vector_indexes",
+        "schedule": crontab(hour=3, minute=0, day_of_week=0),
+        "args": (),
+    },
+
+    # Re-embed changed rows of tenants past the change threshold/age
+    "vector-incremental-reindex": {
+        "task": "CoreApplication.views.schedule_vector_reindexing",
+        "schedule": crontab(minute="*/10"),
+        "args": (),
+    },
+
+    # Nightly top-k similar products per tenant (substitutes, recommendations)
+    "product-neighbours-nightly": {
+        "task": "CoreApplication.views.compute_all_product_neighbours",
+        "schedule": crontab(hour=1, minute=30),
+        "args": (),
+    },
+
+    # Apply finished Batch API forecast jobs (FORECAST_EXECUTION=batch_api)
+    "forecast-batch-poll": {
+        "task": "Testingproject.views.poll_forecast_batches",
+        "schedule": crontab(minute="*/5"),
+        "args": (),
+    },
+
+    # Drop expired LLM responses from the response cache
+    "llm-response-cache-purge-daily": {
+        "task": "Testingproject.views.purge_llm_response_cache",
+        "schedule": crontab(hour=4, minute=0),
+        "args": (),
     }
 }
@@ -185,13 +185,50 @@ CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = "django-db"
 
 # Celery will import tasks from your views module
-CELERY_IMPORTS = ("CoreApplication.views",)   # e.g. "context_api.views"
+CELERY_IMPORTS = ("CoreApplication.views", "Testingproject.views")   # e.g. "context_api.views"
 
 # (Optional) small safety tweaks
 CELERY_TASK_TIME_LIMIT = 60 * 30        # 30 min hard time limit
 CELERY_TASK_SOFT_TIME_LIMIT = 60 * 25   # 25 min soft limit
 CELERY_WORKER_CONCURRENCY = 2           # adjust for your VPS
 
+# ---- Monthly forecast / OpenAI quotas ----
+# Best-selling SKUs forecast per company
+MONTHLY_FORECAST_MAX_SKUS = int(os.getenv("MONTHLY_FORECAST_MAX_SKUS", "500"))
+# SKUs per batched forecast request (1 = one request and one task per SKU);
+# SKUs without a valid answer are batched again up to FORECAST_BATCH_RETRIES times
+FORECAST_BATCH_SIZE = int(os.getenv("FORECAST_BATCH_SIZE", "1"))
+FORECAST_BATCH_RETRIES = int(os.getenv("FORECAST_BATCH_RETRIES", "2"))
+# "sync" (chat completions from Celery tasks) or "batch_api" (requests
+# submitted through the OpenAI Batch API and applied by poll_forecast_batches)
+FORECAST_EXECUTION = os.getenv("FORECAST_EXECUTION", "sync")
+# Empty = api.openai.com; "http://127.0.0.1:8766/v1" for manage.py run_batch_api_standin
+OPENAI_BATCH_BASE_URL = os.getenv("OPENAI_BATCH_BASE_URL", "")
+# Polls (every 5 minutes) that retry a rejected batch submission before the
+# statistical forecast is used for its SKUs
+FORECAST_BATCH_SUBMIT_RETRIES = int(os.getenv("FORECAST_BATCH_SUBMIT_RETRIES", "12"))
+# Minutes after which a job or run a poll was working on is taken over by the
+# next poll (longer than CELERY_TASK_TIME_LIMIT)
+FORECAST_BATCH_CLAIM_TIMEOUT = int(os.getenv("FORECAST_BATCH_CLAIM_TIMEOUT", "60"))
+# Shared across all workers; set a little below the account's OpenAI limits
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "450"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "180000"))
+# Completion tokens reserved per call until the real usage is known
+OPENAI_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("OPENAI_OUTPUT_TOKENS_ESTIMATE", "600"))
+# Per-run sales cubes handed from the company task to its SKU tasks; use a
+# shared directory when workers run on several hosts
+SALES_CUBE_DIR = os.getenv("SALES_CUBE_DIR", "D:/TROOBA_PRODUCTION/sales_cubes")
+# Statistical forecasts (stat_forecast.py) replace the LLM for SKUs with no
+# recent sales or whose best model's 90-day backtest WAPE is within this
+STAT_FORECAST_SKIP_LLM = os.getenv("STAT_FORECAST_SKIP_LLM", "true").lower() == "true"
+STAT_FORECAST_TRIVIAL_WAPE = float(os.getenv("STAT_FORECAST_TRIVIAL_WAPE", "0.15"))
+# Temperature-0 OpenAI/Gemini responses are reused for identical prompts
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Forecast instructions per SKU segment: "llm" (generated once per segment
+# from the base prompt) or "local" (base prompt plus segment notes, no call)
+FORECAST_PROMPT_TEMPLATES = os.getenv("FORECAST_PROMPT_TEMPLATES", "llm")
+
 
 load_dotenv()  # This loads the variables from the .env file
 
@@ -199,16 +236,78 @@ load_dotenv()  # This loads the variables from the .env file
 WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")
 
 
+# ---- Vector DB ----
+VECTOR_DB_ROOT = os.getenv("VECTOR_DB_ROOT", "D:/TROOBA_PRODUCTION/chroma_db")
+# Rows read, embedded and written per step of train_vector_db_task
+VECTOR_TRAINING_CHUNK_SIZE = int(os.getenv("VECTOR_TRAINING_CHUNK_SIZE", "500"))
+# Nearest neighbours returned for free-text search ("k" in the request body)
+VECTOR_SEARCH_DEFAULT_K = int(os.getenv("VECTOR_SEARCH_DEFAULT_K", "10"))
+VECTOR_SEARCH_MAX_K = int(os.getenv("VECTOR_SEARCH_MAX_K", "50"))
+# In-memory LRU sizes (entries per process) for repeated search queries.
+# Result entries are invalidated by the tenant's index version on every write.
+VECTOR_QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("VECTOR_QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+VECTOR_SEARCH_RESULT_CACHE_SIZE = int(os.getenv("VECTOR_SEARCH_RESULT_CACHE_SIZE", "512"))
+# "chroma" (persistent HNSW store) or "numpy" (memory-mapped .npy + metadata
+# sidecar: exact search for small collections, IVF past the threshold)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_NUMPY_DTYPE = os.getenv("VECTOR_NUMPY_DTYPE", "float32")  # or "float16"
+VECTOR_NUMPY_IVF_THRESHOLD = int(os.getenv("VECTOR_NUMPY_IVF_THRESHOLD", "100000"))
+VECTOR_NUMPY_IVF_NPROBE = int(os.getenv("VECTOR_NUMPY_IVF_NPROBE", "16"))
+# numpy backend: reduce vectors to this many PCA dimensions (0 = keep all
+# 384), fitted per collection once it has VECTOR_NUMPY_PCA_MIN_ROWS vectors
+VECTOR_NUMPY_PCA_DIM = int(os.getenv("VECTOR_NUMPY_PCA_DIM", "0"))
+VECTOR_NUMPY_PCA_MIN_ROWS = int(os.getenv("VECTOR_NUMPY_PCA_MIN_ROWS", "2000"))
+# false = keep only vectors + metadata in the index and render document
+# texts from the DB rows for search results
+VECTOR_STORE_DOCUMENTS = os.getenv("VECTOR_STORE_DOCUMENTS", "true").lower() == "true"
+# Where export_vector_snapshot writes tenant index archives by default
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "D:/TROOBA_PRODUCTION/vector_snapshots")
+# Per-process budget for open tenant indexes; least recently used tenants
+# idle for at least VECTOR_INDEX_EVICT_MIN_IDLE seconds are closed past it
+VECTOR_INDEX_MEMORY_BUDGET_MB = int(os.getenv("VECTOR_INDEX_MEMORY_BUDGET_MB", "1024"))
+VECTOR_INDEX_EVICT_MIN_IDLE = int(os.getenv("VECTOR_INDEX_EVICT_MIN_IDLE", "30"))
+# Product search keeps each tenant's product/variant vectors as an in-memory
+# matrix (tenants per process), refreshed after index writes at most this often
+VECTOR_CATALOGUE_CACHE_SIZE = int(os.getenv("VECTOR_CATALOGUE_CACHE_SIZE", "4"))
+VECTOR_CATALOGUE_REFRESH_SECONDS = int(os.getenv("VECTOR_CATALOGUE_REFRESH_SECONDS", "60"))
+# Similar products stored per product by the nightly neighbours job
+PRODUCT_NEIGHBOURS_K = int(os.getenv("PRODUCT_NEIGHBOURS_K", "10"))
+# Incremental re-indexing: a tenant's changed rows are re-embedded once it has
+# this many pending changes, or once its oldest change is this old
+VECTOR_REINDEX_THRESHOLD = int(os.getenv("VECTOR_REINDEX_THRESHOLD", "200"))
+VECTOR_REINDEX_MAX_AGE_MINUTES = int(os.getenv("VECTOR_REINDEX_MAX_AGE_MINUTES", "60"))
+
+# ---- Vector DB embeddings ----
+# Embeddings are cached on disk by (model, text hash) so retraining/re-indexing
+# a tenant only encodes texts that changed.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "D:/TROOBA_PRODUCTION/embedding_cache")
+
+# "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, optionally int8-quantized)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() == "true"
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "D:/TROOBA_PRODUCTION/onnx_models")
+# Batches of at least EMBEDDING_POOL_MIN_BATCH texts are sharded across
+# EMBEDDING_WORKERS processes (1 = encode in-process)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+EMBEDDING_POOL_MIN_BATCH = int(os.getenv("EMBEDDING_POOL_MIN_BATCH", "256"))
+# Shared per-host embedding service (manage.py run_embedding_service), e.g.
+# "http://127.0.0.1:8765". Empty = every process loads its own model.
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "")
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "10"))
+EMBEDDING_SERVICE_RETRY_SECONDS = int(os.getenv("EMBEDDING_SERVICE_RETRY_SECONDS", "30"))
+# How long the service waits to merge concurrent requests into one batch
+EMBEDDING_SERVICE_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVICE_MAX_WAIT_MS", "5"))
+EMBEDDING_SERVICE_MAX_BATCH = int(os.getenv("EMBEDDING_SERVICE_MAX_BATCH", "256"))
+
+
 CELERY_BEAT_SCHEDULE = {
     "fetch-collections-every-day": {
         "task": "CoreApplication.views.fetch_collections_for_all_users",
         "schedule": crontab(minute=0, hour=0),  # runs every day at midnight
     },
-    "run-monthly-forecast-on-28th": {
-        "task": "CoreApplication.views.run_monthly_forecast",
-        # runs on 28th of each month at 00:00
-        "schedule": crontab(minute=0, hour=0, day_of_month="28"),
-    },
+    # The monthly SKU forecast is scheduled in Trooba2/celery.py
+    # ("monthly-sku-forecast-28th")
 }
 
 
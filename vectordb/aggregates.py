@@ -0,0 +1,165 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DateTimeField, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from CoreApplication.models import Order, OrderLineItem, Product, PromotionalData, ProductVariant
+from Testingproject.models import SKUForecastHistory
+from vectordb.documents import sku_month_metadata, sku_month_text
+
+# -----------------------------
+# SKU x month aggregate documents
+# -----------------------------
+# One document per (variant, month) summarising units, revenue, top regions,
+# promotion results and forecast error, in place of one vector per order line
+# item. Vector ID: "skumonth_{variant shopify id}_{YYYYMM}".
+
+TOP_REGIONS = 3
+VARIANT_CHUNK = 200  # variants aggregated per DB round trip
+
+
+def sku_month_vector_id(variant_id, month):
+    return f"skumonth_{variant_id}_{month:%Y%m}"
+
+
+def _dated_line_items(company_user_id, variant_ids):
+    """Line items of the variants annotated with their order's month and region."""
+    orders = Order.objects.filter(company_id=company_user_id, shopify_id=OuterRef("order_id"))
+    return (
+        OrderLineItem.objects.filter(company_id=company_user_id, variant_id__in=variant_ids)
+        .annotate(order_date=Subquery(orders.values("order_date")[:1], output_field=DateTimeField()),
+                  region=Subquery(orders.values("region")[:1]))
+        .exclude(order_date=None)
+        .annotate(month=TruncMonth("order_date"))
+    )
+
+
+def _line_items_by_month(company_user_id, variant_ids):
+    """Rows of (variant_id, month, region, units, revenue, orders) for the variants."""
+    revenue = Coalesce(
+        F("total"), F("price") * F("quantity"),
+        output_field=DecimalField(max_digits=14, decimal_places=2))
+    return (
+        _dated_line_items(company_user_id, variant_ids)
+        .values("variant_id", "month", "region")
+        .annotate(units=Sum("quantity"), revenue=Sum(revenue), orders=Count("order_id", distinct=True))
+        .order_by()
+    )
+
+
+def _promotions_by_month(company_user_id, variant_ids):
+    rows = (
+        PromotionalData.objects.filter(user_id=company_user_id, variant_id__in=variant_ids)
+        .annotate(month=TruncMonth("date"))
+        .values("variant_id", "month")
+        .annotate(clicks=Sum("clicks"), impressions=Sum("impressions"),
+                  conversions=Sum("conversions"), cost=Sum("cost"))
+        .order_by()
+    )
+    return {(row["variant_id"], _month_key(row["month"])): row for row in rows}
+
+
+def _forecasts_by_month(company_user_id, skus):
+    rows = (
+        SKUForecastHistory.objects.filter(company_id=company_user_id, sku__in=skus)
+        .order_by("created_at")
+        .values("sku", "month", "predicted_sales_30", "actual_sales_30", "error")
+    )
+    # Latest forecast per SKU and month wins
+    return {(row["sku"], _month_key(row["month"])): row for row in rows}
+
+
+def _month_key(value):
+    return (value.year, value.month)
+
+
+def live_sku_month_ids(company_user_id, variant_ids):
+    """
+    Vector IDs the variants' month documents currently have: one per month
+    with sales, for variants that still exist.
+    """
+    variant_ids = ProductVariant.objects.filter(
+        company_id=company_user_id, shopify_id__in=variant_ids).values("shopify_id")
+    rows = _dated_line_items(company_user_id, variant_ids).values_list("variant_id", "month").order_by().distinct()
+    return {sku_month_vector_id(variant_id, month) for variant_id, month in rows}
+
+
+def build_sku_month_documents(company_user_id, variant_ids):
+    """
+    Aggregate and render the (variant, month) documents of a set of variants.
+    Variants deleted from the store get no documents.
+    """
+    variants = {
+        v.shopify_id: v for v in ProductVariant.objects.filter(company_id=company_user_id, shopify_id__in=variant_ids)
+        .only("shopify_id", "product_id", "title", "sku")
+    }
+    variant_ids = list(variants)
+    groups = {}
+    for row in _line_items_by_month(company_user_id, variant_ids):
+        key = (row["variant_id"], _month_key(row["month"]))
+        group = groups.setdefault(key, {
+            "month": row["month"], "units": 0, "revenue": Decimal(0), "orders": 0, "regions": defaultdict(int)})
+        group["units"] += row["units"] or 0
+        group["revenue"] += row["revenue"] or 0
+        # An order has a single region, so per-region order counts add up
+        group["orders"] += row["orders"]
+        group["regions"][row["region"] or "unknown"] += row["units"] or 0
+    if not groups:
+        return [], [], []
+
+    products = dict(
+        Product.objects.filter(company_id=company_user_id, shopify_id__in={v.product_id for v in variants.values()})
+        .values_list("shopify_id", "title"))
+    promotions = _promotions_by_month(company_user_id, variant_ids)
+    forecasts = _forecasts_by_month(company_user_id, {v.sku for v in variants.values() if v.sku})
+
+    ids, texts, metadatas = [], [], []
+    for (variant_id, month_key), group in sorted(groups.items()):
+        variant = variants[variant_id]
+        sku = variant.sku
+        promo = promotions.get((variant_id, month_key), {})
+        forecast = forecasts.get((sku, month_key)) if sku else None
+        month = group["month"]
+        doc = {
+            "variant_id": variant_id,
+            "product_id": variant.product_id,
+            "sku": sku,
+            "variant_title": variant.title,
+            "product_title": products.get(variant.product_id),
+            "month": f"{month:%Y-%m}",
+            "month_label": f"{month:%B %Y}",
+            "units": group["units"],
+            "revenue": float(group["revenue"]),
+            "orders": group["orders"],
+            "top_regions": sorted(group["regions"].items(), key=lambda r: -r[1])[:TOP_REGIONS],
+            "clicks": promo.get("clicks") or 0,
+            "impressions": promo.get("impressions") or 0,
+            "conversions": promo.get("conversions") or 0,
+            "ad_cost": float(promo.get("cost") or 0),
+            "predicted": forecast["predicted_sales_30"] if forecast else None,
+            "forecast_error": _forecast_error(forecast, group["units"]),
+        }
+        ids.append(sku_month_vector_id(variant_id, month))
+        texts.append(sku_month_text(doc))
+        metadatas.append(sku_month_metadata(doc))
+    return ids, texts, metadatas
+
+
+def _forecast_error(forecast, units):
+    if not forecast:
+        return None
+    if forecast["error"] is not None:
+        return forecast["error"]
+    return abs(forecast["predicted_sales_30"] - units)
+
+
+def iter_sku_month_batches(company_user_id, chunk_size):
+    """Yield (ids, texts, metadatas) batches of at most chunk_size SKU-month documents."""
+    variant_ids = sorted(
+        OrderLineItem.objects.filter(company_id=company_user_id).exclude(variant_id=None)
+        .values_list("variant_id", flat=True).distinct())
+    for i in range(0, len(variant_ids), VARIANT_CHUNK):
+        ids, texts, metadatas = build_sku_month_documents(company_user_id, variant_ids[i:i + VARIANT_CHUNK])
+        for j in range(0, len(ids), chunk_size):
+            yield ids[j:j + chunk_size], texts[j:j + chunk_size], metadatas[j:j + chunk_size]
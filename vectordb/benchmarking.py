@@ -0,0 +1,165 @@
+import os
+import random
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+
+from vectordb.documents import ENTITY_DOCUMENTS, sku_month_metadata, sku_month_text, vector_id
+from vectordb.embeddings import get_embedder
+
+# -----------------------------
+# Synthetic tenant corpora
+# -----------------------------
+# Fake rows rendered with the same text/metadata templates training uses, so
+# index benchmarks see realistic document lengths and vocabulary without
+# touching a real tenant's data.
+
+# Share of each document type in a synthetic tenant
+TYPE_MIX = {
+    "order": 0.30,
+    "customer": 0.10,
+    "collection": 0.01,
+    "collectionitem": 0.04,
+    "product": 0.05,
+    "variant": 0.15,
+    "promo": 0.10,
+    "skumonth": 0.25,
+}
+
+MATERIALS = ["Gold Plated", "Silver", "Rose Gold", "Oxidised", "Kundan", "Polki", "American Diamond", "Pearl"]
+ITEMS = ["Necklace Set", "Earrings", "Jhumkas", "Bangles", "Ring", "Maang Tikka", "Anklet", "Bracelet", "Choker"]
+VENDORS = ["Trooba", "Aurum Crafts", "Silverline", "Zevar House"]
+REGIONS = ["Maharashtra", "Delhi", "Karnataka", "Tamil Nadu", "Gujarat", "West Bengal", "Telangana", "Kerala"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Ahmedabad", "Kolkata", "Hyderabad", "Kochi"]
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Ananya", "Kabir", "Meera", "Rohan", "Saanvi", "Vivaan", "Priya"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Das"]
+COLLECTIONS = ["Wedding", "Festive", "Everyday Wear", "Bestsellers", "New Arrivals", "Office Wear"]
+
+
+def _synthetic_row(entity_type, pk, rnd):
+    product_title = f"{rnd.choice(MATERIALS)} {rnd.choice(ITEMS)}"
+    price = round(rnd.uniform(199, 9999), 2)
+    common = {"id": pk, "shopify_id": 10 ** 12 + pk, "company_id": 1}
+    if entity_type == "order":
+        return SimpleNamespace(
+            **common, customer_id=10 ** 12 + rnd.randint(1, 10 ** 5), order_number=f"#{1000 + pk}",
+            order_date=f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:00:00+05:30",
+            fulfillment_status=rnd.choice(["fulfilled", "unfulfilled", "partial"]),
+            financial_status=rnd.choice(["paid", "pending", "refunded"]), currency="INR",
+            total_price=price, subtotal_price=price, total_tax=round(price * 0.03, 2),
+            total_discount=round(rnd.choice([0, 0, 0.1]) * price, 2), created_at="", updated_at="",
+            region=rnd.choice(REGIONS))
+    if entity_type == "customer":
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        return SimpleNamespace(
+            **common, email=f"{first.lower()}.{last.lower()}{pk}@example.com", first_name=first, last_name=last,
+            phone="", created_at="", updated_at="", city=rnd.choice(CITIES), region=rnd.choice(REGIONS),
+            country="India", total_spent=round(rnd.uniform(0, 50000), 2))
+    if entity_type == "collection":
+        title = rnd.choice(COLLECTIONS)
+        return SimpleNamespace(**common, title=title, handle=title.lower().replace(" ", "-"), updated_at="")
+    if entity_type == "collectionitem":
+        return SimpleNamespace(id=pk, collection_id=rnd.randint(1, 50), product_id=10 ** 12 + pk, image_src="")
+    if entity_type == "product":
+        return SimpleNamespace(**common, title=product_title, vendor=rnd.choice(VENDORS),
+                               product_type=product_title.split()[-1], tags=rnd.choice(COLLECTIONS))
+    if entity_type == "variant":
+        return SimpleNamespace(**common, product_id=10 ** 12 + rnd.randint(1, 10 ** 4), title="Default Title",
+                               sku=f"TNX{pk:05d}{rnd.choice('ABCDE')}", price=price,
+                               compare_at_price=round(price * 1.4, 2), cost=round(price * 0.4, 2),
+                               inventory_quantity=rnd.randint(0, 200), product_title=product_title,
+                               vendor=rnd.choice(VENDORS), product_type=product_title.split()[-1])
+    if entity_type == "promo":
+        return SimpleNamespace(id=pk, title=f"{product_title} - Google Ads", variant_id=10 ** 12 + pk,
+                               date=date(2025, rnd.randint(1, 12), rnd.randint(1, 28)),
+                               clicks=rnd.randint(0, 500), impressions=rnd.randint(100, 20000),
+                               cost=round(rnd.uniform(0, 5000), 2), conversions=rnd.randint(0, 30))
+    raise ValueError(f"No synthetic rows for {entity_type}")
+
+
+def _synthetic_sku_month(pk, rnd):
+    month = date(2025, rnd.randint(1, 12), 1)
+    units = rnd.randint(1, 300)
+    predicted = rnd.choice([None, max(0, units + rnd.randint(-40, 40))])
+    return {
+        "variant_id": 10 ** 12 + pk, "product_id": 10 ** 12 + rnd.randint(1, 10 ** 4),
+        "sku": f"TNX{pk:05d}{rnd.choice('ABCDE')}", "variant_title": "Default Title",
+        "product_title": f"{rnd.choice(MATERIALS)} {rnd.choice(ITEMS)}",
+        "month": f"{month:%Y-%m}", "month_label": f"{month:%B %Y}",
+        "units": units, "revenue": round(units * rnd.uniform(199, 9999), 2), "orders": max(1, units // 2),
+        "top_regions": [(r, rnd.randint(1, units)) for r in rnd.sample(REGIONS, 3)],
+        "clicks": rnd.randint(0, 500), "impressions": rnd.randint(0, 20000), "conversions": rnd.randint(0, 30),
+        "ad_cost": round(rnd.uniform(0, 5000), 2),
+        "predicted": predicted, "forecast_error": abs(predicted - units) if predicted is not None else None,
+    }
+
+
+def synthetic_documents(n_docs, seed=42):
+    """Return (ids, texts, metadatas) for a synthetic tenant of about n_docs documents."""
+    rnd = random.Random(seed)
+    ids, texts, metadatas = [], [], []
+    for entity_type, share in TYPE_MIX.items():
+        for pk in range(1, max(1, round(n_docs * share)) + 1):
+            if entity_type == "skumonth":
+                doc = _synthetic_sku_month(pk, rnd)
+                ids.append(f"skumonth_{doc['variant_id']}_{doc['month'].replace('-', '')}_{pk}")
+                texts.append(sku_month_text(doc))
+                metadatas.append(sku_month_metadata(doc))
+            else:
+                row = _synthetic_row(entity_type, pk, rnd)
+                spec = ENTITY_DOCUMENTS[entity_type]
+                ids.append(vector_id(entity_type, pk))
+                texts.append(spec["text"](row))
+                metadatas.append(spec["metadata"](row))
+    return ids, texts, metadatas
+
+
+def embed_corpus(texts, mode="model", seed=42, dim=384, batch_size=64):
+    """
+    Embed benchmark texts with the configured backend ("model"), or draw
+    random unit vectors ("random") to measure the index alone.
+    """
+    if mode == "random":
+        vectors = np.random.default_rng(seed).standard_normal((len(texts), dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.asarray(get_embedder().encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+def make_queries(vectors, n_queries, noise=0.3, seed=7):
+    """Perturbed copies of random corpus vectors, normalised."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + noise * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32) \
+        / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def brute_force_topk(vectors, queries, k):
+    """Exact k nearest neighbours by L2 distance (row indices, nearest first)."""
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    k = min(k, len(vectors))
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found_ids, true_ids):
+    """Mean share of the exact top-k that each approximate result list found."""
+    if not true_ids:
+        return 0.0
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found_ids, true_ids) if len(t)]))
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
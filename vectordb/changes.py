@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from vectordb.aggregates import build_sku_month_documents
+from vectordb.documents import ENTITY_DOCUMENTS, INDEXED_TYPES, build_documents, tenant_queryset, vector_id
+from vectordb.embeddings import encode_texts
+from vectordb.models import VectorChange, VectorIndexState
+from vectordb.store import delete_vectors, get_entity_collection, upsert_vectors
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Change tracking for incremental re-indexing
+# -----------------------------
+# Webhooks and syncs record which rows changed; a periodic task re-embeds
+# only those rows once a tenant has enough of them (or they have waited
+# long enough), instead of retraining the whole tenant.
+
+
+def record_changes(company_user_id, entity_type, keys):
+    """Mark rows of one entity type as needing re-indexing."""
+    keys = {int(k) for k in keys if k is not None}
+    if not keys:
+        return
+    now = timezone.now()
+    # MySQL upserts on any unique key and cannot be given the target columns
+    unique_fields = ["company", "entity_type", "object_key"] \
+        if connection.features.supports_update_conflicts_with_target else None
+    VectorChange.objects.bulk_create(
+        [VectorChange(company_id=company_user_id, entity_type=entity_type, object_key=key,
+                      created_at=now, changed_at=now) for key in keys],
+        update_conflicts=True, unique_fields=unique_fields, update_fields=["changed_at"], batch_size=500)
+
+
+def clear_changes(company_user_id, before):
+    """Forget changes covered by an index build that started at `before`."""
+    VectorChange.objects.filter(company_id=company_user_id, changed_at__lte=before).delete()
+
+
+def pending_changes(company_user_id=None):
+    """{company_user_id: {"pending", "oldest"}} for tenants with recorded changes."""
+    changes = VectorChange.objects.all()
+    if company_user_id is not None:
+        changes = changes.filter(company_id=company_user_id)
+    return {
+        row["company_id"]: {"pending": row["pending"], "oldest": row["oldest"]}
+        for row in changes.values("company_id").annotate(pending=Count("id"), oldest=Min("created_at"))
+    }
+
+
+def tenants_due(threshold, max_age_minutes, requeue_after_minutes=60):
+    """
+    Tenants with at least `threshold` pending changes, or with a change older
+    than `max_age_minutes`. A tenant whose re-index is already queued is left
+    alone until it finishes, or until `requeue_after_minutes` have passed in
+    case the task was lost.
+    """
+    now = timezone.now()
+    pending = pending_changes()
+    states = {s.company_id: s for s in VectorIndexState.objects.filter(company_id__in=pending)}
+    due = []
+    for company_user_id, info in pending.items():
+        if info["pending"] < threshold and info["oldest"] > now - timedelta(minutes=max_age_minutes):
+            continue
+        state = states.get(company_user_id)
+        if state and state.reindex_queued_at and \
+                (state.last_incremental_at is None or state.reindex_queued_at > state.last_incremental_at) and \
+                state.reindex_queued_at > now - timedelta(minutes=requeue_after_minutes):
+            continue
+        due.append(company_user_id)
+    return due
+
+
+def mark_queued(company_user_id):
+    VectorIndexState.objects.update_or_create(
+        company_id=company_user_id, defaults={"reindex_queued_at": timezone.now()})
+
+
+def mark_built(company_user_id, full, started):
+    state, _ = VectorIndexState.objects.get_or_create(company_id=company_user_id)
+    if full:
+        state.last_full_build_at = started
+    state.last_incremental_at = started
+    state.save()
+    return state
+
+
+def _reindex_rows(company_user_id, entity_type, keys):
+    """Re-embed changed rows of a row-backed type; drop vectors of deleted rows."""
+    spec = ENTITY_DOCUMENTS[entity_type]
+    rows = list(tenant_queryset(entity_type, company_user_id).filter(pk__in=keys)
+                .values_list(*spec["fields"], named=True))
+    ids, texts, metadatas = build_documents(entity_type, rows)
+    if ids:
+        upsert_vectors(company_user_id, ids, encode_texts(texts), texts, metadatas)
+    gone = set(keys) - {row.id for row in rows}
+    if gone:
+        delete_vectors(company_user_id, [vector_id(entity_type, pk) for pk in gone])
+    return len(ids) + len(gone)
+
+
+def _reindex_sku_months(company_user_id, variant_ids):
+    """
+    Rebuild every month document of the changed variants and drop the ones
+    they no longer have (variant deleted, month without sales any more).
+    """
+    ids, texts, metadatas = build_sku_month_documents(company_user_id, variant_ids)
+    if ids:
+        upsert_vectors(company_user_id, ids, encode_texts(texts), texts, metadatas)
+    indexed = get_entity_collection(company_user_id, "skumonth").get(
+        where={"variant_id": {"$in": list(variant_ids)}}, include=[])["ids"]
+    gone = set(indexed) - set(ids)
+    if gone:
+        delete_vectors(company_user_id, gone)
+    return len(ids) + len(gone)
+
+
+def reindex_changes(company_user_id, chunk_size):
+    """
+    Re-index the rows recorded as changed for a tenant and clear them.
+    Changes recorded while this runs keep a later changed_at and are left
+    for the next run.
+    """
+    started = timezone.now()
+    changes = VectorChange.objects.filter(company_id=company_user_id, changed_at__lte=started)
+    counts = {}
+    for entity_type in INDEXED_TYPES:
+        keys = list(changes.filter(entity_type=entity_type).order_by("object_key")
+                    .values_list("object_key", flat=True))
+        if not keys:
+            continue
+        counts[entity_type] = 0
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            if entity_type == "skumonth":
+                counts[entity_type] += _reindex_sku_months(company_user_id, chunk)
+            else:
+                counts[entity_type] += _reindex_rows(company_user_id, entity_type, chunk)
+    changes.delete()
+    state = mark_built(company_user_id, full=False, started=started)
+    state.rows_reindexed += sum(counts.values())
+    state.save(update_fields=["rows_reindexed"])
+    return counts
@@ -0,0 +1,100 @@
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+
+from vectordb.aggregates import live_sku_month_ids
+from vectordb.documents import ENTITY_DOCUMENTS, INDEXED_TYPES, parse_vector_id, tenant_queryset
+from vectordb.store import (
+    bump_index_version, directory_size, get_entity_collection, rewrite_collection, tenant_index_path, vacuum_chroma,
+)
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 5000
+LOOKUP_CHUNK = 1000
+DELETE_CHUNK = 5000
+
+
+def iter_vector_ids(vector_collection, page_size=PAGE_SIZE):
+    """Yield every vector ID in the collection, one page at a time."""
+    offset = 0
+    while True:
+        page = vector_collection.get(include=[], limit=page_size, offset=offset)
+        ids = page["ids"]
+        if not ids:
+            return
+        yield from ids
+        offset += len(ids)
+
+
+def find_orphan_vector_ids(company_user_id, vector_collection):
+    """
+    Return vector IDs whose backing DB row no longer exists for the tenant.
+    SKU-month vectors are orphans once their variant is deleted or the month
+    no longer has sales. IDs of unknown entity types are left alone.
+    """
+    keys_by_type = defaultdict(dict)
+    sku_months = defaultdict(list)
+    for vid in iter_vector_ids(vector_collection):
+        entity_type, key = parse_vector_id(vid)
+        if entity_type in ENTITY_DOCUMENTS and key.isdigit():
+            keys_by_type[entity_type][int(key)] = vid
+        elif entity_type == "skumonth" and key.partition("_")[0].isdigit():
+            sku_months[int(key.partition("_")[0])].append(vid)
+
+    orphans = []
+    variant_ids = list(sku_months)
+    for i in range(0, len(variant_ids), LOOKUP_CHUNK):
+        chunk = variant_ids[i:i + LOOKUP_CHUNK]
+        live = live_sku_month_ids(company_user_id, chunk)
+        orphans.extend(vid for variant_id in chunk for vid in sku_months[variant_id] if vid not in live)
+
+    for entity_type, by_pk in keys_by_type.items():
+        pks = list(by_pk)
+        for i in range(0, len(pks), LOOKUP_CHUNK):
+            chunk = pks[i:i + LOOKUP_CHUNK]
+            existing = set(
+                tenant_queryset(entity_type, company_user_id).filter(pk__in=chunk).values_list("pk", flat=True))
+            orphans.extend(by_pk[pk] for pk in chunk if pk not in existing)
+    return orphans
+
+
+def compact_tenant_index(company_user_id):
+    """
+    Delete orphaned vectors in bulk, rewrite the collections so the space is
+    given back, and report how much the index shrank.
+    """
+    path = tenant_index_path(company_user_id)
+    collections = [get_entity_collection(company_user_id, t) for t in INDEXED_TYPES]
+    count_before = sum(c.count() for c in collections)
+    bytes_before = directory_size(path)
+
+    orphans = []
+    for entity_type, vector_collection in zip(INDEXED_TYPES, collections):
+        found = find_orphan_vector_ids(company_user_id, vector_collection)
+        for i in range(0, len(found), DELETE_CHUNK):
+            vector_collection.delete(ids=found[i:i + DELETE_CHUNK])
+        orphans.extend(found)
+        # Also reclaims space of rows replaced or deleted since the last compaction
+        rewrite_collection(company_user_id, entity_type)
+    if settings.VECTOR_BACKEND != "numpy":
+        vacuum_chroma(company_user_id)
+    bump_index_version(company_user_id)
+    collections = [get_entity_collection(company_user_id, t) for t in INDEXED_TYPES]
+
+    removed_by_type = defaultdict(int)
+    for vid in orphans:
+        removed_by_type[parse_vector_id(vid)[0]] += 1
+
+    report = {
+        "company_user_id": company_user_id,
+        "vectors_before": count_before,
+        "vectors_after": sum(c.count() for c in collections),
+        "removed": len(orphans),
+        "removed_by_type": dict(removed_by_type),
+        "bytes_before": bytes_before,
+        "bytes_after": directory_size(path),
+    }
+    logger.info(f"🧹 Vector index compaction: {report}")
+    return report
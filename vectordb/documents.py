@@ -0,0 +1,347 @@
+from collections import defaultdict
+
+from django.db.models import OuterRef, Subquery
+
+from CoreApplication.models import (
+    Order, OrderLineItem, Customer, Collection, CollectionItem, Product, ProductVariant, PromotionalData
+)
+
+# -----------------------------
+# Helper functions to sanitize metadata
+# -----------------------------
+
+
+def safe_int(val):
+    return int(val) if val is not None else 0
+
+
+def safe_float(val):
+    return float(val) if val is not None else 0.0
+
+
+def safe_str(val):
+    return str(val) if val is not None else ""
+
+
+def safe_bool(val):
+    return bool(val) if val is not None else False
+
+# -----------------------------
+# Metadata & Text functions
+# -----------------------------
+# Each function takes either a model instance or a named row from
+# values_list(..., named=True) with the same attribute names.
+
+
+def order_text(order):
+    return (
+        f"Order ID: {safe_int(order.id)}, Shopify ID: {safe_int(order.shopify_id)}, Company ID: {safe_int(order.company_id)}, "
+        f"Customer ID: {safe_int(order.customer_id)}, Order Number: {safe_str(order.order_number)}, Order Date: {safe_str(order.order_date)}, "
+        f"Fulfillment Status: {safe_str(order.fulfillment_status)}, Financial Status: {safe_str(order.financial_status)}, Currency: {safe_str(order.currency)}, "
+        f"Total Price: {safe_float(order.total_price)}, Subtotal Price: {safe_float(order.subtotal_price)}, Total Tax: {safe_float(order.total_tax)}, Total Discount: {safe_float(order.total_discount)}, "
+        f"Created At: {safe_str(order.created_at)}, Updated At: {safe_str(order.updated_at)}, Region: {safe_str(order.region)}"
+    )
+
+
+def order_metadata(order):
+    return {
+        "id": safe_int(order.id),
+        "shopify_id": safe_int(order.shopify_id),
+        "company_id": safe_int(order.company_id),
+        "customer_id": safe_int(order.customer_id),
+        "total_price": safe_float(order.total_price),
+        "subtotal_price": safe_float(order.subtotal_price),
+        "total_tax": safe_float(order.total_tax),
+        "total_discount": safe_float(order.total_discount)
+    }
+
+
+def order_item_text(item):
+    return (
+        f"Line Item ID: {safe_int(item.id)}, Shopify Line Item ID: {safe_int(item.shopify_line_item_id)}, Company ID: {safe_int(item.company_id)}, "
+        f"Order ID: {safe_int(item.order_id)}, Product ID: {safe_int(item.product_id)}, Variant ID: {safe_int(item.variant_id)}, "
+        f"Quantity: {safe_int(item.quantity)}, Price: {safe_float(item.price)}, Discount Allocated: {safe_float(item.discount_allocated)}, Total: {safe_float(item.total)}"
+    )
+
+
+def order_item_metadata(item):
+    return {
+        "id": safe_int(item.id),
+        "order_id": safe_int(item.order_id),
+        "product_id": safe_int(item.product_id),
+        "variant_id": safe_int(item.variant_id),
+        "quantity": safe_int(item.quantity),
+        "price": safe_float(item.price)
+    }
+
+
+def customer_text(customer):
+    return (
+        f"Customer ID: {safe_int(customer.id)}, Shopify ID: {safe_int(customer.shopify_id)}, Company ID: {safe_int(customer.company_id)}, "
+        f"Email: {safe_str(customer.email)}, First Name: {safe_str(customer.first_name)}, Last Name: {safe_str(customer.last_name)}, "
+        f"Phone: {safe_str(customer.phone)}, Created At: {safe_str(customer.created_at)}, Updated At: {safe_str(customer.updated_at)}, "
+        f"City: {safe_str(customer.city)}, Region: {safe_str(customer.region)}, Country: {safe_str(customer.country)}, Total Spent: {safe_float(customer.total_spent)}"
+    )
+
+
+def customer_metadata(customer):
+    return {
+        "id": safe_int(customer.id),
+        "company_id": safe_int(customer.company_id),
+        "total_spent": safe_float(customer.total_spent)
+    }
+
+
+def collection_text(coll):
+    return f"Collection ID: {safe_int(coll.id)}, Company ID: {safe_int(coll.company_id)}, Shopify ID: {safe_int(coll.shopify_id)}, Title: {safe_str(coll.title)}, Handle: {safe_str(coll.handle)}, Updated At: {safe_str(coll.updated_at)}"
+
+
+def collection_metadata(coll):
+    return {
+        "id": safe_int(coll.id),
+        "company_id": safe_int(coll.company_id)
+    }
+
+
+def collection_item_text(ci):
+    return f"CollectionItem ID: {safe_int(ci.id)}, Collection ID: {safe_int(ci.collection_id)}, Product ID: {safe_int(ci.product_id)}, Image Src: {safe_str(ci.image_src)}"
+
+
+def collection_item_metadata(ci):
+    return {
+        "id": safe_int(ci.id),
+        "collection_id": safe_int(ci.collection_id),
+        "product_id": safe_int(ci.product_id)
+    }
+
+
+def product_text(product):
+    return f"Product ID: {safe_int(product.id)}, Shopify ID: {safe_int(product.shopify_id)}, Company ID: {safe_int(product.company_id)}, Title: {safe_str(product.title)}, Vendor: {safe_str(product.vendor)}, Product Type: {safe_str(product.product_type)}, Tags: {safe_str(product.tags)}"
+
+
+def product_metadata(product):
+    return {
+        "id": safe_int(product.id),
+        "company_id": safe_int(product.company_id),
+        "shopify_id": safe_int(product.shopify_id),
+        "vendor": safe_str(product.vendor),
+        "product_type": safe_str(product.product_type),
+    }
+
+
+def variant_text(variant):
+    return f"Variant ID: {safe_int(variant.id)}, Shopify ID: {safe_int(variant.shopify_id)}, Company ID: {safe_int(variant.company_id)}, Product ID: {safe_int(variant.product_id)}, Product: {safe_str(variant.product_title)}, Vendor: {safe_str(variant.vendor)}, Product Type: {safe_str(variant.product_type)}, Title: {safe_str(variant.title)}, SKU: {safe_str(variant.sku)}, Price: {safe_float(variant.price)}, Compare At Price: {safe_float(variant.compare_at_price)}, Cost: {safe_float(variant.cost)}, Inventory Quantity: {safe_int(variant.inventory_quantity)}"
+
+
+def variant_metadata(variant):
+    # Product fields are copied in so catalogue search can pre-filter variants
+    return {
+        "id": safe_int(variant.id),
+        "company_id": safe_int(variant.company_id),
+        "product_id": safe_int(variant.product_id),
+        "vendor": safe_str(variant.vendor),
+        "product_type": safe_str(variant.product_type),
+        "price": safe_float(variant.price),
+        "compare_at_price": safe_float(variant.compare_at_price),
+        "cost": safe_float(variant.cost),
+        "inventory_quantity": safe_int(variant.inventory_quantity)
+    }
+
+
+def promo_text(promo):
+    return f"Promo: {safe_str(promo.title)}, Variant ID: {safe_int(promo.variant_id)}, Date: {safe_str(promo.date)}, Clicks: {safe_int(promo.clicks)}, Impressions: {safe_int(promo.impressions)}, Cost: {safe_float(promo.cost)}"
+
+
+def promo_metadata(promo):
+    return {
+        "variant_id": safe_int(promo.variant_id),
+        "clicks": safe_int(promo.clicks),
+        "impressions": safe_int(promo.impressions),
+        "cost": safe_float(promo.cost),
+        "conversions": safe_int(promo.conversions)
+    }
+
+
+def sku_month_text(doc):
+    titles = [t for t in (safe_str(doc["product_title"]), safe_str(doc["variant_title"])) if t and t != "Default Title"]
+    name = f"SKU {safe_str(doc['sku']) or doc['variant_id']}" + (f" ({' - '.join(titles)})" if titles else "")
+    regions = ", ".join(f"{region} ({units} units)" for region, units in doc["top_regions"]) or "unknown"
+    text = (
+        f"{name} sales in {doc['month_label']}: {doc['units']} units sold across {doc['orders']} orders, "
+        f"revenue {doc['revenue']:.2f}. Top regions: {regions}."
+    )
+    if doc["impressions"] or doc["clicks"]:
+        text += (
+            f" Promotions: {doc['impressions']} impressions, {doc['clicks']} clicks, "
+            f"{doc['conversions']} conversions, ad cost {doc['ad_cost']:.2f}."
+        )
+    if doc["predicted"] is not None:
+        text += f" Forecast: predicted {doc['predicted']} units"
+        if doc["forecast_error"] is not None:
+            text += f", forecast error {doc['forecast_error']} units"
+        text += "."
+    return text
+
+
+def sku_month_metadata(doc):
+    metadata = {
+        "variant_id": safe_int(doc["variant_id"]),
+        "product_id": safe_int(doc["product_id"]),
+        "sku": safe_str(doc["sku"]),
+        "month": doc["month"],
+        "units": safe_int(doc["units"]),
+        "revenue": safe_float(doc["revenue"]),
+        "orders": safe_int(doc["orders"]),
+        "clicks": safe_int(doc["clicks"]),
+        "impressions": safe_int(doc["impressions"]),
+        "conversions": safe_int(doc["conversions"]),
+    }
+    if doc["forecast_error"] is not None:
+        metadata["forecast_error"] = safe_int(doc["forecast_error"])
+    return metadata
+
+# -----------------------------
+# Entity registry
+# -----------------------------
+# Keyed by the vector ID prefix ("order_12", "variant_7", ...). "fields" lists
+# the columns the text/metadata functions read, so training can stream plain
+# rows instead of full model instances; "annotations" adds columns from other
+# tables (variants only reference their product by Shopify ID).
+
+
+def _variant_product_field(field):
+    return Subquery(Product.objects.filter(
+        company_id=OuterRef("company_id"), shopify_id=OuterRef("product_id")).values(field)[:1])
+
+
+
+ENTITY_DOCUMENTS = {
+    "order": {
+        "model": Order,
+        "tenant_filter": "company_id",
+        "fields": ("id", "shopify_id", "company_id", "customer_id", "order_number", "order_date",
+                   "fulfillment_status", "financial_status", "currency", "total_price", "subtotal_price",
+                   "total_tax", "total_discount", "created_at", "updated_at", "region"),
+        "text": order_text,
+        "metadata": order_metadata,
+    },
+    "orderitem": {
+        "model": OrderLineItem,
+        "tenant_filter": "company_id",
+        "fields": ("id", "shopify_line_item_id", "company_id", "order_id", "product_id", "variant_id",
+                   "quantity", "price", "discount_allocated", "total"),
+        "text": order_item_text,
+        "metadata": order_item_metadata,
+    },
+    "customer": {
+        "model": Customer,
+        "tenant_filter": "company_id",
+        "fields": ("id", "shopify_id", "company_id", "email", "first_name", "last_name", "phone",
+                   "created_at", "updated_at", "city", "region", "country", "total_spent"),
+        "text": customer_text,
+        "metadata": customer_metadata,
+    },
+    "collection": {
+        "model": Collection,
+        "tenant_filter": "company_id",
+        "fields": ("id", "company_id", "shopify_id", "title", "handle", "updated_at"),
+        "text": collection_text,
+        "metadata": collection_metadata,
+    },
+    "collectionitem": {
+        "model": CollectionItem,
+        "tenant_filter": "collection__company_id",
+        "fields": ("id", "collection_id", "product_id", "image_src"),
+        "text": collection_item_text,
+        "metadata": collection_item_metadata,
+    },
+    "product": {
+        "model": Product,
+        "tenant_filter": "company_id",
+        "fields": ("id", "shopify_id", "company_id", "title", "vendor", "product_type", "tags"),
+        "text": product_text,
+        "metadata": product_metadata,
+    },
+    "variant": {
+        "model": ProductVariant,
+        "tenant_filter": "company_id",
+        "fields": ("id", "shopify_id", "company_id", "product_id", "title", "sku", "price",
+                   "compare_at_price", "cost", "inventory_quantity", "product_title", "vendor", "product_type"),
+        "annotations": lambda: {
+            "product_title": _variant_product_field("title"),
+            "vendor": _variant_product_field("vendor"),
+            "product_type": _variant_product_field("product_type"),
+        },
+        "text": variant_text,
+        "metadata": variant_metadata,
+    },
+    "promo": {
+        "model": PromotionalData,
+        "tenant_filter": "user_id",
+        "fields": ("id", "title", "variant_id", "date", "clicks", "impressions", "cost", "conversions"),
+        "text": promo_text,
+        "metadata": promo_metadata,
+    },
+}
+
+
+# Types that get vectors, each in its own collection. Order line items are
+# not embedded one by one; they are summarised per SKU and month instead
+# ("skumonth", built by vectordb.aggregates).
+INDEXED_TYPES = ("order", "customer", "collection", "collectionitem", "product", "variant", "promo", "skumonth")
+
+
+def tenant_queryset(entity_type, company_user_id):
+    spec = ENTITY_DOCUMENTS[entity_type]
+    queryset = spec["model"].objects.filter(**{spec["tenant_filter"]: company_user_id})
+    if "annotations" in spec:
+        queryset = queryset.annotate(**spec["annotations"]())
+    return queryset
+
+
+def vector_id(entity_type, pk):
+    return f"{entity_type}_{safe_int(pk)}"
+
+
+def parse_vector_id(vid):
+    """Split a vector ID into (entity_type, key), e.g. "order_12" -> ("order", "12")."""
+    entity_type, _, key = vid.partition("_")
+    return entity_type, key
+
+
+def build_documents(entity_type, rows):
+    """Render (ids, texts, metadatas) for a chunk of rows of one entity type."""
+    spec = ENTITY_DOCUMENTS[entity_type]
+    ids = [vector_id(entity_type, row.id) for row in rows]
+    texts = [spec["text"](row) for row in rows]
+    metadatas = [spec["metadata"](row) for row in rows]
+    return ids, texts, metadatas
+
+
+def render_documents(company_user_id, vector_ids):
+    """
+    {vector_id: text} rendered from the current DB rows, for indexes that
+    hold documents by reference (VECTOR_STORE_DOCUMENTS off). IDs whose row
+    no longer exists map to None.
+    """
+    keys_by_type = defaultdict(list)
+    for vid in vector_ids:
+        entity_type, key = parse_vector_id(vid)
+        keys_by_type[entity_type].append(key)
+
+    texts = {}
+    for entity_type, keys in keys_by_type.items():
+        if entity_type == "skumonth":
+            # aggregates imports this module
+            from vectordb.aggregates import build_sku_month_documents
+            variant_ids = {int(key.split("_")[0]) for key in keys}
+            ids, docs, _ = build_sku_month_documents(company_user_id, variant_ids)
+        elif entity_type in ENTITY_DOCUMENTS:
+            rows = tenant_queryset(entity_type, company_user_id).filter(
+                pk__in=[int(key) for key in keys if key.isdigit()]
+            ).values_list(*ENTITY_DOCUMENTS[entity_type]["fields"], named=True)
+            ids, docs, _ = build_documents(entity_type, rows)
+        else:
+            continue
+        texts.update(zip(ids, docs))
+    return {vid: texts.get(vid) for vid in vector_ids}
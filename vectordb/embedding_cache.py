@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+MAX_KEYS_PER_QUERY = 900
+
+
+def text_hash(text):
+    """Stable 20-byte key for a document text."""
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, text hash).
+
+    Backed by a single SQLite file so web and worker processes on the same host
+    can share it. Vectors are stored as raw float32 bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash BLOB NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model_name, hashes):
+        """Return {text_hash: np.ndarray} for the hashes that are cached."""
+        hashes = list(hashes)
+        found = {}
+        conn = self._connection()
+        for i in range(0, len(hashes), MAX_KEYS_PER_QUERY):
+            chunk = hashes[i:i + MAX_KEYS_PER_QUERY]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model_name, *chunk],
+            )
+            for key, blob in rows:
+                found[bytes(key)] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name, items):
+        """Store an iterable of (text_hash, vector) pairs."""
+        rows = [
+            (model_name, key, int(vector.shape[-1]), np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items
+        ]
+        if not rows:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def count(self, model_name=None):
+        conn = self._connection()
+        if model_name:
+            return conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", [model_name]).fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
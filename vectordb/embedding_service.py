@@ -0,0 +1,220 @@
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Embedding service ----------------
+# One process per host loads the model and serves every web/worker process
+# over HTTP. Requests that arrive within a few milliseconds of each other are
+# merged into a single encode() call, so many single-text calls (search
+# queries, incremental re-indexing) cost about as much as one batch.
+#
+#   POST /encode  {"texts": [...]}  -> float32 bytes, shape in X-Embedding-Shape
+#   GET  /health                    -> model key and batching stats
+
+
+class EmbeddingServiceError(Exception):
+    pass
+
+
+class _Pending:
+    __slots__ = ("texts", "done", "vectors", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.vectors = None
+        self.error = None
+
+
+class BatchingEncoder:
+    """
+    Collects concurrent encode requests for up to `max_wait` seconds (or
+    until `max_batch` texts are waiting) and runs them as one batch on a
+    single background thread.
+    """
+
+    def __init__(self, embedder, max_wait=0.005, max_batch=256, batch_size=64):
+        self.embedder = embedder
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.batch_size = batch_size
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.encode_seconds = 0.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts):
+        pending = _Pending(list(texts))
+        if not pending.texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.vectors
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        waiting = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while waiting < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            waiting += len(item.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for item in batch for t in item.texts]
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.embedder.encode(texts, batch_size=self.batch_size), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"❌ Embedding batch of {len(texts)} texts failed: {e}", exc_info=True)
+                for item in batch:
+                    item.error = e
+                    item.done.set()
+                continue
+            elapsed = time.perf_counter() - start
+
+            offset = 0
+            for item in batch:
+                item.vectors = vectors[offset:offset + len(item.texts)]
+                offset += len(item.texts)
+                item.done.set()
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.texts += len(texts)
+                self.encode_seconds += elapsed
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "queued": self._queue.qsize(),
+            }
+
+
+def make_handler(encoder, model_key, max_request_texts):
+    class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send_json(404, {"error": "Not found"})
+            self._send_json(200, {"status": "ok", "model": model_key, **encoder.stats()})
+
+        def do_POST(self):
+            if self.path != "/encode":
+                return self._send_json(404, {"error": "Not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                texts = body["texts"]
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("texts must be a list of strings")
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send_json(400, {"error": f"Invalid request: {e}"})
+            if len(texts) > max_request_texts:
+                return self._send_json(413, {"error": f"At most {max_request_texts} texts per request"})
+
+            try:
+                vectors = encoder.encode(texts)
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+            payload = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("X-Embedding-Shape", f"{vectors.shape[0]},{vectors.shape[1] if vectors.ndim == 2 else 0}")
+            self.send_header("X-Embedding-Model", model_key)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_json(self, code, data):
+            payload = json.dumps(data).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug("embedding service: " + format % args)
+
+    return EmbeddingRequestHandler
+
+
+def make_server(host, port, encoder, model_key, max_request_texts=1024):
+    server = ThreadingHTTPServer((host, port), make_handler(encoder, model_key, max_request_texts))
+    server.daemon_threads = True
+    return server
+
+# ---------------- Client ----------------
+
+
+class EmbeddingServiceClient:
+    """
+    Talks to the embedding service. Large inputs are sent in chunks of
+    `max_texts`; responses from a service running a different model than
+    `model_key` are rejected so vectors from different models never mix.
+    """
+
+    def __init__(self, url, model_key, timeout=10, max_texts=1024):
+        self.url = url.rstrip("/")
+        self.model_key = model_key
+        self.timeout = timeout
+        self.max_texts = max_texts
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests.Session is not safe to share between threads
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def encode(self, texts):
+        texts = list(texts)
+        chunks = [self._encode_chunk(texts[i:i + self.max_texts]) for i in range(0, len(texts), self.max_texts)]
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def _encode_chunk(self, texts):
+        response = self.session.post(f"{self.url}/encode", json={"texts": texts}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise EmbeddingServiceError(f"Embedding service returned {response.status_code}: {response.text[:200]}")
+        model = response.headers.get("X-Embedding-Model")
+        if model != self.model_key:
+            raise EmbeddingServiceError(f"Embedding service runs {model}, expected {self.model_key}")
+        rows, dim = (int(n) for n in response.headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(response.content, dtype=np.float32).reshape(rows, dim)
+
+    def health(self):
+        response = self.session.get(f"{self.url}/health", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,216 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import requests
+from django.conf import settings
+
+from vectordb.embedding_cache import EmbeddingCache, text_hash
+from vectordb.embedding_service import EmbeddingServiceClient, EmbeddingServiceError
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+_embedder = None
+_cache = None
+_pool = None
+_service_client = None
+_service_down_until = 0.0
+_lock = threading.Lock()
+
+# ---------------- Backends ----------------
+
+
+class TorchEmbedder:
+    """The original PyTorch SentenceTransformer backend."""
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    def encode(self, texts, batch_size=64):
+        return np.asarray(self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+
+
+def create_embedder(backend=None, quantize=None):
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "torch":
+        return TorchEmbedder()
+    if backend == "onnx":
+        from vectordb.onnx_backend import OnnxEmbedder
+        if quantize is None:
+            quantize = settings.EMBEDDING_ONNX_QUANTIZE
+        return OnnxEmbedder(settings.EMBEDDING_ONNX_DIR, quantize=quantize)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+def embedding_model_key(backend=None, quantize=None):
+    """
+    Identifies the exact model variant producing the vectors. Used as the
+    embedding cache namespace so vectors from different backends never mix.
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "onnx":
+        if quantize is None:
+            quantize = settings.EMBEDDING_ONNX_QUANTIZE
+        return f"{EMBEDDING_MODEL_NAME}:onnx-int8" if quantize else f"{EMBEDDING_MODEL_NAME}:onnx"
+    return EMBEDDING_MODEL_NAME
+
+
+def get_embedder():
+    """Load the configured embedding backend once per process."""
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                _embedder = create_embedder()
+    return _embedder
+
+
+def get_embedding_cache():
+    """Return the shared on-disk embedding cache, or None when disabled."""
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                path = os.path.join(settings.EMBEDDING_CACHE_DIR, "embeddings.sqlite3")
+                _cache = EmbeddingCache(path)
+    return _cache
+
+# ---------------- Multi-process encoding ----------------
+# Each pool worker loads its own copy of the backend once and encodes one
+# shard of a large batch.
+
+_worker_embedder = None
+
+
+def _init_pool_worker(backend, quantize):
+    global _worker_embedder
+    _worker_embedder = create_embedder(backend, quantize)
+
+
+def _encode_in_worker(texts, batch_size):
+    return _worker_embedder.encode(texts, batch_size=batch_size)
+
+
+def get_encoding_pool():
+    """
+    Process pool used for large batches, or None when disabled or when this
+    process cannot fork children (Celery prefork workers are daemonic).
+    """
+    global _pool
+    workers = settings.EMBEDDING_WORKERS
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return None
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_pool_worker,
+                    initargs=(settings.EMBEDDING_BACKEND, settings.EMBEDDING_ONNX_QUANTIZE),
+                )
+    return _pool
+
+
+# ---------------- Embedding service ----------------
+# When EMBEDDING_SERVICE_URL is set, encoding goes to the host's shared
+# embedding service (manage.py run_embedding_service) instead of a model
+# loaded in this process. If the service is unreachable, texts are encoded
+# in-process and the service is retried after EMBEDDING_SERVICE_RETRY_SECONDS.
+
+
+def get_service_client():
+    global _service_client
+    if not settings.EMBEDDING_SERVICE_URL:
+        return None
+    if _service_client is None:
+        with _lock:
+            if _service_client is None:
+                _service_client = EmbeddingServiceClient(
+                    settings.EMBEDDING_SERVICE_URL, embedding_model_key(), timeout=settings.EMBEDDING_SERVICE_TIMEOUT)
+    return _service_client
+
+
+def encode_via_service(texts):
+    """Vectors from the embedding service, or None to encode in-process."""
+    global _service_down_until
+    client = get_service_client()
+    if client is None or time.monotonic() < _service_down_until:
+        return None
+    try:
+        return client.encode(texts)
+    except (requests.RequestException, EmbeddingServiceError) as e:
+        _service_down_until = time.monotonic() + settings.EMBEDDING_SERVICE_RETRY_SECONDS
+        logger.warning(f"⚠️ Embedding service unavailable, encoding in-process: {e}")
+        return None
+
+
+def encode_uncached(texts, batch_size=64):
+    """
+    Encode with the embedding service when configured, else run the
+    configured backend, sharding large batches across the pool.
+    """
+    vectors = encode_via_service(texts)
+    if vectors is not None:
+        return vectors
+
+    pool = get_encoding_pool()
+    if pool is None or len(texts) < settings.EMBEDDING_POOL_MIN_BATCH:
+        return get_embedder().encode(texts, batch_size=batch_size)
+
+    shard_size = -(-len(texts) // settings.EMBEDDING_WORKERS)
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+    results = pool.map(_encode_in_worker, shards, [batch_size] * len(shards))
+    return np.concatenate(list(results)).astype(np.float32)
+
+
+def encode_texts(texts, batch_size=64):
+    """
+    Embed texts, reusing cached vectors for texts seen before.
+    Returns a float32 array with one row per input text.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return encode_uncached(texts, batch_size=batch_size)
+
+    model_key = embedding_model_key()
+    keys = [text_hash(t) for t in texts]
+    vectors = cache.get_many(model_key, set(keys))
+
+    # Encode each distinct uncached text once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = text
+    if missing:
+        encoded = encode_uncached(list(missing.values()), batch_size=batch_size)
+        new_items = list(zip(missing.keys(), encoded))
+        cache.put_many(model_key, new_items)
+        vectors.update(new_items)
+
+    logger.info(f"🧠 Embedded {len(texts)} texts ({len(missing)} newly encoded, rest from cache)")
+    return np.stack([vectors[key] for key in keys])
+
+
+def encode_query(text):
+    """
+    Embed a single search query. Queries are one-off, so they skip the
+    on-disk cache that is meant for indexed documents.
+    """
+    vectors = encode_via_service([text])
+    if vectors is not None:
+        return vectors
+    return get_embedder().encode([text], batch_size=1)
@@ -0,0 +1,126 @@
+from CoreApplication.models import Order, OrderLineItem
+
+# Search results carry only IDs in their metadata. The helpers below resolve
+# the referenced orders/line items for a whole result page with one query per
+# lookup column and join them in memory, instead of one query per match.
+
+
+def order_to_dict(order):
+    return {
+        "id": order.id,
+        "shopify_id": order.shopify_id,
+        "order_number": order.order_number,
+        "order_date": str(order.order_date),
+        "fulfillment_status": order.fulfillment_status,
+        "financial_status": order.financial_status,
+        "currency": order.currency,
+        "total_price": float(order.total_price),
+        "subtotal_price": float(order.subtotal_price),
+        "total_tax": float(order.total_tax),
+        "total_discount": float(order.total_discount),
+        "region": order.region,
+        "created_at": str(order.created_at),
+        "updated_at": str(order.updated_at)
+    }
+
+
+def line_item_to_dict(line_item):
+    return {
+        "id": line_item.id,
+        "order_id": line_item.order_id,
+        "product_id": line_item.product_id,
+        "variant_id": line_item.variant_id,
+        "quantity": line_item.quantity,
+        "price": float(line_item.price),
+        "total": float(line_item.total)
+    }
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def orders_by_shopify_id(company_user_id, shopify_ids):
+    shopify_ids = {i for i in map(_to_int, shopify_ids) if i is not None}
+    if not shopify_ids:
+        return {}
+    return {
+        order.shopify_id: order
+        for order in Order.objects.filter(company_id=company_user_id, shopify_id__in=shopify_ids)
+    }
+
+
+def orders_by_id(company_user_id, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    return Order.objects.filter(company_id=company_user_id).in_bulk(ids)
+
+
+def line_items_by_id(company_user_id, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    return OrderLineItem.objects.filter(company_id=company_user_id).in_bulk(ids)
+
+
+def first_line_items_by_variant(company_user_id, variant_ids):
+    """Lowest-ID line item per variant."""
+    variant_ids = {i for i in map(_to_int, variant_ids) if i is not None}
+    if not variant_ids:
+        return {}
+    found = {}
+    queryset = OrderLineItem.objects.filter(
+        company_id=company_user_id, variant_id__in=variant_ids).order_by("variant_id", "id")
+    for line_item in queryset:
+        found.setdefault(line_item.variant_id, line_item)
+    return found
+
+
+def attach_orders(company_user_id, matches):
+    """
+    Set match["order"] from the Order whose shopify_id is the match's
+    metadata order_id (VectorDBSearchView semantics).
+    """
+    orders = orders_by_shopify_id(
+        company_user_id, [m["metadata"].get("order_id") for m in matches if m["metadata"].get("order_id")])
+    for match in matches:
+        order = orders.get(_to_int(match["metadata"].get("order_id")))
+        match["order"] = order_to_dict(order) if order else None
+    return matches
+
+
+def attach_orders_and_line_items(company_user_id, matches):
+    """
+    Set match["order"] and match["line_item"] (GenericVectorSearchView
+    semantics): integer references are primary keys, anything else is a
+    Shopify order ID / variant ID.
+    """
+    order_refs, item_refs = [], []
+    for match in matches:
+        metadata = match["metadata"]
+        order_refs.append(metadata.get("id") or metadata.get("order_id") or metadata.get("shopify_id"))
+        item_refs.append(metadata.get("id") or metadata.get("line_item_id") or metadata.get("variant_id"))
+
+    orders = orders_by_id(company_user_id, [r for r in order_refs if isinstance(r, int)])
+    orders_shopify = orders_by_shopify_id(company_user_id, [r for r in order_refs if r and not isinstance(r, int)])
+    items = line_items_by_id(company_user_id, [r for r in item_refs if isinstance(r, int)])
+    items_variant = first_line_items_by_variant(
+        company_user_id, [r for r in item_refs if r and not isinstance(r, int)])
+
+    for match, order_ref, item_ref in zip(matches, order_refs, item_refs):
+        if isinstance(order_ref, int):
+            order = orders.get(order_ref)
+        else:
+            order = orders_shopify.get(_to_int(order_ref))
+        if isinstance(item_ref, int):
+            line_item = items.get(item_ref)
+        else:
+            line_item = items_variant.get(_to_int(item_ref))
+
+        match["order"] = order_to_dict(order) if order else None
+        match["line_item"] = line_item_to_dict(line_item) if line_item else None
+    return matches
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import chromadb
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TenantIndexManager:
+    """
+    Keeps track of which tenant indexes this process has open and closes the
+    least recently used ones once their combined size passes the memory
+    budget. Indexes are opened lazily on first use; the on-disk size of a
+    tenant's index directory is used as the estimate of its resident size
+    and refreshed whenever the index version changes.
+
+    Indexes used within the last `min_idle` seconds are never evicted, so
+    the budget can be exceeded briefly while many tenants are active at once.
+
+    The manager holds each tenant's Chroma client, so evicting a tenant
+    closes the only reference to its System (SQLite + loaded HNSW segments).
+    """
+
+    # How often a hot tenant's index version is re-read to refresh its size
+    VERSION_CHECK_INTERVAL = 5
+
+    def __init__(self, budget_bytes, min_idle=30):
+        self.budget_bytes = budget_bytes
+        self.min_idle = min_idle
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # company_user_id -> {"bytes", "version", "last_used", "checked"}
+        self._clients = {}  # company_user_id -> chromadb PersistentClient
+        self._lock = threading.Lock()
+
+    def client(self, company_user_id):
+        """The tenant's Chroma client, opened on first use and closed on eviction."""
+        from vectordb.store import tenant_index_path
+
+        self.touch(company_user_id)
+        with self._lock:
+            client = self._clients.get(company_user_id)
+        if client is not None:
+            return client
+        opened = chromadb.PersistentClient(path=tenant_index_path(company_user_id))
+        with self._lock:
+            client = self._clients.setdefault(company_user_id, opened)
+        if client is not opened:
+            # Another thread opened it first; both share one System, so this
+            # only drops our reference to it
+            opened.close()
+        return client
+
+    def touch(self, company_user_id):
+        """Record a use of the tenant's index, evicting others if over budget."""
+        from vectordb.store import directory_size, get_index_version, tenant_index_path
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(company_user_id)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(company_user_id)
+                entry["last_used"] = now
+                if now - entry["checked"] < self.VERSION_CHECK_INTERVAL:
+                    return
+                entry["checked"] = now
+            else:
+                self.misses += 1
+
+        version = get_index_version(company_user_id)
+        size = None
+        if entry is None or entry["version"] != version:
+            size = directory_size(tenant_index_path(company_user_id))
+        with self._lock:
+            if size is not None:
+                self._entries[company_user_id] = {"bytes": size, "version": version, "last_used": now, "checked": now}
+                self._entries.move_to_end(company_user_id)
+            # Also retried on later checks when every candidate was still busy
+            victims = self._pick_victims(company_user_id)
+        for victim in victims:
+            self._close(victim)
+
+    def _pick_victims(self, current):
+        victims = []
+        total = sum(e["bytes"] for e in self._entries.values())
+        now = time.monotonic()
+        for company_user_id, entry in list(self._entries.items()):
+            if total <= self.budget_bytes:
+                break
+            if company_user_id == current or now - entry["last_used"] < self.min_idle:
+                continue
+            total -= entry["bytes"]
+            del self._entries[company_user_id]
+            victims.append(company_user_id)
+            self.evictions += 1
+        return victims
+
+    def evict(self, company_user_id):
+        """Close a tenant's index now (e.g. before its files are replaced)."""
+        with self._lock:
+            self._entries.pop(company_user_id, None)
+        self._close(company_user_id)
+
+    def _close(self, company_user_id):
+        from vectordb import numpy_index
+        from vectordb.store import numpy_index_path
+
+        with self._lock:
+            client = self._clients.pop(company_user_id, None)
+        if client is not None:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Error closing vector index of tenant {company_user_id}: {e}")
+        numpy_index.forget(numpy_index_path(company_user_id))
+        logger.info(f"♻️ Closed vector index of tenant {company_user_id}")
+
+    def stats(self, company_user_id=None):
+        """
+        Process-wide counters. Per-tenant sizes are only listed for
+        `company_user_id` when given (callers must not see other tenants).
+        """
+        with self._lock:
+            stats = {
+                "open_tenants": len(self._entries),
+                "bytes_in_use": sum(e["bytes"] for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+            if company_user_id is None:
+                stats["tenants"] = {str(k): e["bytes"] for k, e in reversed(self._entries.items())}
+            else:
+                entry = self._entries.get(company_user_id)
+                stats["tenant_bytes"] = entry["bytes"] if entry else None
+            return stats
+
+
+index_manager = TenantIndexManager(
+    budget_bytes=settings.VECTOR_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+    min_idle=settings.VECTOR_INDEX_EVICT_MIN_IDLE,
+)
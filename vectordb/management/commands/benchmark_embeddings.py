@@ -0,0 +1,106 @@
+import json
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vectordb.documents import ENTITY_DOCUMENTS, build_documents, tenant_queryset
+from vectordb.embeddings import create_embedder, _encode_in_worker, _init_pool_worker
+
+DEFAULT_QUERIES = [
+    "orders that are still unfulfilled",
+    "refunded orders with a large discount",
+    "customers from Mumbai who spent the most",
+    "gold plated bridal necklace set",
+    "silver earrings under 1000",
+    "products in the wedding collection",
+    "variants with low inventory",
+    "promotion with the most clicks last month",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare embedding backends (torch, onnx, onnx int8, onnx int8 + process pool) "
+        "on a tenant's documents: throughput and top-k retrieval agreement with torch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company-id", type=int, required=True)
+        parser.add_argument("--limit", type=int, default=5000, help="Documents to embed")
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--workers", type=int, default=settings.EMBEDDING_WORKERS or 1)
+
+    def handle(self, *args, **options):
+        texts = self.load_texts(options["company_id"], options["limit"])
+        if not texts:
+            raise CommandError(f"No documents found for company {options['company_id']}")
+        batch_size, k = options["batch_size"], options["k"]
+
+        baseline = create_embedder("torch")
+        base_docs, base_seconds = self.timed(baseline.encode, texts, batch_size)
+        base_queries = baseline.encode(DEFAULT_QUERIES, batch_size=batch_size)
+        results = [self.row("torch", len(texts), base_seconds, base_docs, base_docs, base_queries, base_queries, k)]
+
+        for name, quantize in (("onnx", False), ("onnx-int8", True)):
+            embedder = create_embedder("onnx", quantize=quantize)
+            docs, seconds = self.timed(embedder.encode, texts, batch_size)
+            queries = embedder.encode(DEFAULT_QUERIES, batch_size=batch_size)
+            results.append(self.row(name, len(texts), seconds, docs, base_docs, queries, base_queries, k))
+
+        if options["workers"] > 1:
+            docs, seconds = self.timed_pool(texts, batch_size, options["workers"])
+            results.append(self.row(f"onnx-int8-pool{options['workers']}", len(texts), seconds,
+                                    docs, base_docs, queries, base_queries, k))
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def load_texts(company_user_id, limit):
+        texts = []
+        for entity_type, spec in ENTITY_DOCUMENTS.items():
+            remaining = limit - len(texts)
+            if remaining <= 0:
+                break
+            rows = list(tenant_queryset(entity_type, company_user_id).values_list(*spec["fields"], named=True)[:remaining])
+            texts.extend(build_documents(entity_type, rows)[1])
+        return texts
+
+    @staticmethod
+    def timed(encode, texts, batch_size):
+        encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        vectors = encode(texts, batch_size=batch_size)
+        return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+    @staticmethod
+    def timed_pool(texts, batch_size, workers):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_pool_worker, initargs=("onnx", True)) as pool:
+            list(pool.map(_encode_in_worker, [texts[:batch_size]] * workers, [batch_size] * workers))  # warm-up
+            shard_size = -(-len(texts) // workers)
+            shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+            start = time.perf_counter()
+            vectors = np.concatenate(list(pool.map(_encode_in_worker, shards, [batch_size] * len(shards))))
+            return vectors.astype(np.float32), time.perf_counter() - start
+
+    @staticmethod
+    def row(name, n_texts, seconds, docs, base_docs, queries, base_queries, k):
+        k = min(k, len(docs))
+        top = np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+        base_top = np.argsort(-(base_queries @ base_docs.T), axis=1)[:, :k]
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(top, base_top)])
+        cosine = np.mean(np.sum(docs * base_docs, axis=1))
+        return {
+            "backend": name,
+            "texts": n_texts,
+            "seconds": round(seconds, 3),
+            "texts_per_second": round(n_texts / seconds, 1),
+            f"top{k}_agreement_with_torch": round(float(overlap), 4),
+            "mean_cosine_to_torch": round(float(cosine), 4),
+        }
@@ -0,0 +1,176 @@
+import itertools
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from vectordb.benchmarking import (
+    brute_force_topk, current_rss, embed_corpus, make_queries, recall_at_k, synthetic_documents
+)
+from vectordb.numpy_index import NumpyCollection
+from vectordb.store import directory_size
+
+
+def int_list(value):
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise CommandError(f"Expected a comma-separated list of integers, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the vector index backends on synthetic tenants built from the training text templates: "
+        "build time, on-disk and loaded size, RSS, p50/p95 query latency and recall@k against brute force, "
+        "for each combination of tenant size, index settings and write batch size. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backends", default="chroma,numpy",
+                            help="Comma-separated: chroma, numpy (float32), numpy-float16, numpy-pca, "
+                                 "numpy-float16-pca")
+        parser.add_argument("--ivf-threshold", type=int, default=100000,
+                            help="numpy backend: collections larger than this use IVF")
+        parser.add_argument("--nprobe", type=int_list, default=[16], help="numpy backend: IVF lists scanned")
+        parser.add_argument("--pca-dims", type=int_list, default=[64, 128], help="*-pca backends: dimensions kept")
+        parser.add_argument("--pca-min-rows", type=int, default=2000,
+                            help="*-pca backends: vectors needed before the projection is fitted")
+        parser.add_argument("--without-documents", action="store_true",
+                            help="Do not store document texts in the index (VECTOR_STORE_DOCUMENTS off)")
+        parser.add_argument("--sizes", type=int_list, default=[1000, 10000], help="Documents per synthetic tenant")
+        parser.add_argument("--m", type=int_list, default=[16], help="hnsw:M values")
+        parser.add_argument("--ef-construction", type=int_list, default=[100], help="hnsw:construction_ef values")
+        parser.add_argument("--ef-search", type=int_list, default=[10, 100], help="hnsw:search_ef values")
+        parser.add_argument("--batch-sizes", type=int_list, default=[500], help="Vectors per upsert call")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--embeddings", choices=["model", "random"], default="model",
+                            help="Embed with the configured backend, or use random vectors to time the index alone")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workdir", help="Where to build the indexes (default: a temporary directory)")
+        parser.add_argument("--keep", action="store_true", help="Keep the built indexes")
+        parser.add_argument("--output", help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        workdir = options["workdir"] or tempfile.mkdtemp(prefix="vector_bench_")
+        os.makedirs(workdir, exist_ok=True)
+        k = options["k"]
+        report = {
+            "environment": {
+                "chromadb": chromadb.__version__,
+                "numpy": np.__version__,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "embeddings": options["embeddings"],
+                "documents_stored": not options["without_documents"],
+            },
+            "results": [],
+        }
+
+        try:
+            for size in options["sizes"]:
+                ids, texts, metadatas = synthetic_documents(size, seed=options["seed"])
+                start = time.perf_counter()
+                vectors = embed_corpus(texts, mode=options["embeddings"], seed=options["seed"])
+                embed_seconds = time.perf_counter() - start
+                queries = make_queries(vectors, options["queries"], seed=options["seed"])
+                truth = [[ids[i] for i in row] for row in brute_force_topk(vectors, queries, k)]
+                self.stderr.write(f"{len(ids)} documents embedded in {embed_seconds:.1f}s")
+
+                for backend, params, batch_size in self.configs(options):
+                    label = "_".join(f"{key}{value}" for key, value in params.items())
+                    path = os.path.join(workdir, f"n{len(ids)}_{backend}_{label}_b{batch_size}")
+                    shutil.rmtree(path, ignore_errors=True)
+                    rss_before = current_rss()
+                    collection = self.open_collection(backend, path, params, options)
+                    result = self.run_config(collection, path, ids, None if options["without_documents"] else texts,
+                                             metadatas, vectors, queries, truth, k, batch_size)
+                    rss_after = current_rss()
+                    result.update({
+                        "backend": backend,
+                        **params,
+                        "batch_size": batch_size,
+                        "rss_bytes": rss_after,
+                        "rss_delta_bytes": rss_after - rss_before if None not in (rss_before, rss_after) else None,
+                        "documents": len(ids),
+                        "embed_seconds": round(embed_seconds, 3),
+                    })
+                    report["results"].append(result)
+                    self.stderr.write(json.dumps(result))
+                    if not options["keep"]:
+                        shutil.rmtree(path, ignore_errors=True)
+        finally:
+            if not options["workdir"] and not options["keep"]:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    @staticmethod
+    def configs(options):
+        """(backend, index parameters, batch size) combinations to run."""
+        backends = [b.strip() for b in options["backends"].split(",") if b.strip()]
+        for backend in backends:
+            if backend == "chroma":
+                grid = itertools.product(options["m"], options["ef_construction"], options["ef_search"])
+                params = [{"hnsw_m": m, "hnsw_construction_ef": efc, "hnsw_search_ef": efs} for m, efc, efs in grid]
+            elif backend in ("numpy", "numpy-float16"):
+                params = [{"nprobe": nprobe} for nprobe in options["nprobe"]]
+            elif backend in ("numpy-pca", "numpy-float16-pca"):
+                grid = itertools.product(options["nprobe"], options["pca_dims"])
+                params = [{"nprobe": nprobe, "pca_dim": dim} for nprobe, dim in grid]
+            else:
+                raise CommandError(f"Unknown backend: {backend}")
+            for p in params:
+                for batch_size in options["batch_sizes"]:
+                    yield backend, p, batch_size
+
+    @staticmethod
+    def open_collection(backend, path, params, options):
+        if backend == "chroma":
+            return chromadb.PersistentClient(path=path).create_collection(name="benchmark", metadata={
+                "hnsw:space": "l2",
+                "hnsw:M": params["hnsw_m"],
+                "hnsw:construction_ef": params["hnsw_construction_ef"],
+                "hnsw:search_ef": params["hnsw_search_ef"],
+            })
+        return NumpyCollection(path, "benchmark", dtype="float16" if "float16" in backend else "float32",
+                               ivf_threshold=options["ivf_threshold"], nprobe=params["nprobe"],
+                               pca_dim=params.get("pca_dim", 0), pca_min_rows=options["pca_min_rows"])
+
+    @staticmethod
+    def run_config(collection, path, ids, texts, metadatas, vectors, queries, truth, k, batch_size):
+        start = time.perf_counter()
+        for i in range(0, len(ids), batch_size):
+            collection.upsert(ids=ids[i:i + batch_size], embeddings=vectors[i:i + batch_size],
+                              documents=texts[i:i + batch_size] if texts is not None else None,
+                              metadatas=metadatas[i:i + batch_size])
+        build_seconds = time.perf_counter() - start
+
+        collection.query(query_embeddings=queries[:1], n_results=k, include=[])  # warm-up
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=query[None, :], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            found.append(result["ids"][0])
+
+        return {
+            "build_seconds": round(build_seconds, 3),
+            "vectors_per_second": round(len(ids) / build_seconds, 1),
+            "disk_bytes": directory_size(path),
+            # Vectors + IVF lists as loaded for search (numpy backends only)
+            "index_bytes": collection.nbytes() if isinstance(collection, NumpyCollection) else None,
+            "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "query_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            f"recall_at_{k}": round(recall_at_k(found, truth), 4),
+        }
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CoreApplication.models import CompanyUser
+from vectordb.snapshots import SnapshotError, default_snapshot_path, export_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Export tenant vector indexes (ids, vectors, metadata, content hashes) to compressed snapshot "
+        "archives that import_vector_snapshot restores without re-embedding."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--company-id", type=int)
+        target.add_argument("--all", action="store_true", help="Export every tenant")
+        parser.add_argument("--output", help="Archive path (single tenant; default: VECTOR_SNAPSHOT_DIR)")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            if options["output"]:
+                raise CommandError("--output only applies to a single --company-id")
+            company_ids = list(CompanyUser.objects.values_list("id", flat=True))
+        else:
+            company_ids = [options["company_id"]]
+
+        for company_id in company_ids:
+            path = options["output"] or default_snapshot_path(company_id)
+            try:
+                manifest = export_snapshot(company_id, path)
+            except SnapshotError as e:
+                raise CommandError(f"Tenant {company_id}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"{path}: {json.dumps(manifest['counts'])}"))
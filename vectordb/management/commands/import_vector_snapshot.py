@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vectordb.snapshots import SnapshotError, import_snapshot
+
+
+class Command(BaseCommand):
+    help = "Restore tenant vector indexes from snapshot archives written by export_vector_snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Snapshot archives")
+        parser.add_argument("--company-id", type=int, help="Restore into this tenant (default: the snapshot's)")
+        parser.add_argument("--merge", action="store_true",
+                            help="Upsert into the existing collections instead of replacing them")
+        parser.add_argument("--no-warm-cache", action="store_true",
+                            help="Do not copy the vectors into the embedding cache")
+        parser.add_argument("--force", action="store_true",
+                            help="Restore even if the tenant or embedding model differs from the snapshot's")
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            try:
+                loaded = import_snapshot(path, company_user_id=options["company_id"], replace=not options["merge"],
+                                         warm_cache=not options["no_warm_cache"], force=options["force"])
+            except (SnapshotError, OSError, KeyError) as e:
+                raise CommandError(f"{path}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"{path}: {json.dumps(loaded)}"))
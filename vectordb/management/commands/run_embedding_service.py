@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vectordb.embedding_service import BatchingEncoder, make_server
+from vectordb.embeddings import embedding_model_key, get_embedder
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the configured embedding model over HTTP for every process on this host, "
+        "merging concurrent requests into batched encode calls. Point EMBEDDING_SERVICE_URL at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_SERVICE_MAX_WAIT_MS,
+                            help="How long to wait for more requests before encoding a batch")
+        parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SERVICE_MAX_BATCH,
+                            help="Encode as soon as this many texts are waiting")
+        parser.add_argument("--batch-size", type=int, default=64, help="Model batch size within one encode call")
+
+    def handle(self, *args, **options):
+        model_key = embedding_model_key()
+        self.stdout.write(f"Loading {model_key} ...")
+        encoder = BatchingEncoder(get_embedder(), max_wait=options["max_wait_ms"] / 1000,
+                                  max_batch=options["max_batch"], batch_size=options["batch_size"])
+        server = make_server(options["host"], options["port"], encoder, model_key)
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding service for {model_key} on http://{options['host']}:{options['port']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
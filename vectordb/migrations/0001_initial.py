@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-19 04:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('CoreApplication', '0017_add_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VectorIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_full_build_at', models.DateTimeField(blank=True, null=True)),
+                ('last_incremental_at', models.DateTimeField(blank=True, null=True)),
+                ('reindex_queued_at', models.DateTimeField(blank=True, null=True)),
+                ('rows_reindexed', models.IntegerField(default=0)),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='vector_index_state', to='CoreApplication.companyuser')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VectorChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=32)),
+                ('object_key', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vector_changes', to='CoreApplication.companyuser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vectorchange',
+            index=models.Index(fields=['company', 'created_at'], name='vectordb_ve_company_6d50ed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vectorchange',
+            unique_together={('company', 'entity_type', 'object_key')},
+        ),
+    ]
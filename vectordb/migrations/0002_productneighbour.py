@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 04:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CoreApplication', '0017_add_lookup_indexes'),
+        ('vectordb', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('neighbour_id', models.BigIntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_neighbours', to='CoreApplication.companyuser')),
+            ],
+            options={
+                'ordering': ['product_id', 'rank'],
+                'unique_together': {('company', 'product_id', 'rank')},
+            },
+        ),
+    ]
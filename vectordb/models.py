@@ -1,3 +1,61 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from CoreApplication.models import CompanyUser
+
+
+class VectorChange(models.Model):
+    """
+    A row whose vector is out of date since the tenant's last index build.
+    One row per (tenant, entity type, key): repeated changes to the same row
+    only move changed_at forward, so the table stays as small as the set of
+    rows that actually need re-embedding.
+
+    The key is the row's primary key, except for "skumonth" documents where
+    it is the Shopify variant ID whose monthly aggregates must be rebuilt.
+    Deletions need no flag: a key whose row is gone has its vector removed.
+    """
+    company = models.ForeignKey(CompanyUser, on_delete=models.CASCADE, related_name="vector_changes")
+    entity_type = models.CharField(max_length=32)
+    object_key = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("company", "entity_type", "object_key")
+        indexes = [models.Index(fields=["company", "created_at"])]
+
+    def __str__(self):
+        return f"{self.entity_type} {self.object_key} (company {self.company_id})"
+
+
+class VectorIndexState(models.Model):
+    """When a tenant's index was last built, fully or incrementally."""
+    company = models.OneToOneField(CompanyUser, on_delete=models.CASCADE, related_name="vector_index_state")
+    last_full_build_at = models.DateTimeField(null=True, blank=True)
+    last_incremental_at = models.DateTimeField(null=True, blank=True)
+    reindex_queued_at = models.DateTimeField(null=True, blank=True)
+    rows_reindexed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Vector index state (company {self.company_id})"
+
+
+class ProductNeighbour(models.Model):
+    """
+    Precomputed nearest products by embedding similarity, rebuilt nightly per
+    tenant. Products are referenced by Shopify ID like everywhere else.
+    """
+    company = models.ForeignKey(CompanyUser, on_delete=models.CASCADE, related_name="product_neighbours")
+    product_id = models.BigIntegerField()
+    neighbour_id = models.BigIntegerField()
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()  # cosine similarity
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("company", "product_id", "rank")
+        ordering = ["product_id", "rank"]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbour_id} (#{self.rank})"
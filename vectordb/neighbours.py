@@ -0,0 +1,106 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from CoreApplication.models import Product, ProductVariant
+from vectordb.models import ProductNeighbour
+from vectordb.product_search import CataloguePart
+from vectordb.store import get_entity_collection
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Similar-product neighbours
+# -----------------------------
+# All-pairs cosine similarity over a tenant's product vectors, computed in
+# row blocks (one matrix product per block) and stored as the top k per
+# product, so substitutes and recommendations are a table lookup.
+
+BLOCK_SIZE = 1024
+
+
+def top_k_neighbours(vectors, k, block_size=BLOCK_SIZE):
+    """
+    (indices, scores) of each row's k most similar other rows, best first.
+    `vectors` must be unit-normalised.
+    """
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        block = vectors[start:start + block_size] @ vectors.T
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf  # never your own neighbour
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(block, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        indices[start:start + len(block)] = top
+        scores[start:start + len(block)] = np.take_along_axis(block, top, axis=1)
+    return indices, scores
+
+
+def compute_product_neighbours(company_user_id, k):
+    """Recompute and store the tenant's product neighbours; returns the product count."""
+    part = CataloguePart("product", get_entity_collection(company_user_id, "product"))
+    # Older vectors without a Shopify ID in their metadata cannot be referenced
+    keep = np.flatnonzero(part.product_ids != 0)
+    vectors, product_ids = part.vectors[keep], part.product_ids[keep]
+    indices, scores = top_k_neighbours(vectors, k)
+
+    now = timezone.now()
+    rows = [
+        ProductNeighbour(company_id=company_user_id, product_id=int(product_ids[i]),
+                         neighbour_id=int(product_ids[j]), rank=rank, score=float(score), computed_at=now)
+        for i in range(len(product_ids))
+        for rank, (j, score) in enumerate(zip(indices[i], scores[i]), start=1)
+    ]
+    with transaction.atomic():
+        ProductNeighbour.objects.filter(company_id=company_user_id).delete()
+        ProductNeighbour.objects.bulk_create(rows, batch_size=2000)
+    return len(product_ids)
+
+
+def neighbours_for(company_user_id, product_ids, limit=10, in_stock_only=False):
+    """
+    {product_id: [{"product_id", "title", "vendor", "product_type", "score",
+    "inventory"}]} from the stored neighbours; three queries in total.
+    """
+    neighbours = ProductNeighbour.objects.filter(company_id=company_user_id, product_id__in=list(product_ids))
+    by_product = {}
+    for n in neighbours.values_list("product_id", "neighbour_id", "score"):
+        by_product.setdefault(n[0], []).append(n[1:])
+    neighbour_ids = {nid for rows in by_product.values() for nid, _ in rows}
+    products = {
+        p.shopify_id: p for p in Product.objects.filter(company_id=company_user_id, shopify_id__in=neighbour_ids)
+        .only("shopify_id", "title", "vendor", "product_type")
+    }
+    inventory = dict(
+        ProductVariant.objects.filter(company_id=company_user_id, product_id__in=neighbour_ids)
+        .values_list("product_id").annotate(total=Sum("inventory_quantity")))
+
+    result = {}
+    for product_id, rows in by_product.items():
+        entries = []
+        for neighbour_id, score in rows:
+            product = products.get(neighbour_id)
+            stock = inventory.get(neighbour_id) or 0
+            if product is None or (in_stock_only and stock <= 0):
+                continue
+            entries.append({
+                "product_id": neighbour_id,
+                "title": product.title,
+                "vendor": product.vendor,
+                "product_type": product.product_type,
+                "score": round(score, 4),
+                "inventory": stock,
+            })
+            if len(entries) == limit:
+                break
+        result[product_id] = entries
+    return result
@@ -0,0 +1,609 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# NumPy vector index
+# -----------------------------
+# A collection is a directory holding one generation of files:
+#   manifest.json          current generation, count, dtype
+#   vectors.{gen}.npy      normalised embeddings, memory-mapped for search
+#   meta.{gen}.json        ids, documents and metadatas (sidecar)
+#   ivf.{gen}.npz          IVF centroids + list assignments (large collections only)
+#   pca.{gen}.npy          projection to pca_dim dimensions (when enabled)
+#   delta.{gen}.{n}.npy/.json  rows upserted/IDs deleted since the generation
+# Writers add a delta segment or build the next generation, then swap the
+# manifest (which lists the live segments), so readers in other processes
+# never see a half-written index and mapped files are never replaced in place
+# (which Windows does not allow).
+#
+# Search is exact dot-product over all rows up to `ivf_threshold` vectors; past
+# that, rows are clustered (k-means) and only the `nprobe` closest lists are
+# scanned. Distances are reported like Chroma's default "l2" space
+# (squared L2 of unit vectors = 2 - 2 * cosine) so results mix with Chroma's.
+#
+# With pca_dim set, a collection is stored at full size until it holds
+# pca_min_rows vectors; then a projection onto its top pca_dim principal
+# directions is fitted on those vectors, every row is reduced, and later
+# vectors and queries are projected with the same basis. The basis is kept
+# for the life of the collection (drop it to refit).
+
+MANIFEST = "manifest.json"
+SCORE_BLOCK = 65536  # rows converted to float32 at a time when scoring
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+LOCK_TIMEOUT = 60
+SEGMENT_MIN_ROWS = 5000  # segment rows + deletions always allowed before a merge
+SEGMENT_MERGE_FRACTION = 0.1  # ... or this share of the generation's rows
+MAX_SEGMENTS = 32
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+class FileLock:
+    """
+    Cross-process lock on a lock file created with O_EXCL. The holder writes
+    a token into it and touches it every `timeout / 4` seconds while it runs,
+    so only the lock of a writer that died (stopped touching it) is taken over,
+    and a writer only ever removes its own lock.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._released = threading.Event()
+        self._heartbeat = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._take_over_stale()
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not lock {self.path}")
+                time.sleep(0.05)
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(self.token)
+            self._released.clear()
+            self._heartbeat = threading.Thread(target=self._touch, daemon=True)
+            self._heartbeat.start()
+            return self
+
+    def __exit__(self, *exc):
+        self._released.set()
+        self._heartbeat.join()
+        if self._owner() == self.token:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _owner(self):
+        try:
+            with open(self.path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _touch(self):
+        while not self._released.wait(self.timeout / 4):
+            if self._owner() != self.token:
+                logger.warning(f"⚠️ Lost {self.path} while holding it")
+                return
+            try:
+                os.utime(self.path)
+            except OSError:
+                pass
+
+    def _take_over_stale(self):
+        # A writer that died leaves its lock behind. It is moved aside under a
+        # name of our own, so of several waiters only one removes it.
+        stale = f"{self.path}.{self.token}"
+        try:
+            if time.time() - os.path.getmtime(self.path) <= self.timeout:
+                return
+            os.rename(self.path, stale)
+        except OSError:
+            return
+        try:
+            # Another waiter took the stale lock over between the check and
+            # the rename: put its fresh lock back
+            if time.time() - os.path.getmtime(stale) <= self.timeout:
+                os.link(stale, self.path)
+        except OSError:
+            pass
+        finally:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+class _Base:
+    """The files of one generation, loaded once per process."""
+
+    def __init__(self, generation, vectors, ids, documents, metadatas, ivf, components=None):
+        self.generation = generation
+        self.vectors = vectors
+        self.components = components
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.centroids = None
+        self.assignments = None
+        self.lists = None
+        self.trained_count = 0
+        if ivf is not None:
+            self.centroids = ivf["centroids"]
+            self.trained_count = ivf["trained_count"]
+            self.assignments = ivf["assignments"]
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+
+class _State:
+    """
+    A generation plus its delta segments. Rows are numbered base rows first,
+    then each segment's rows in order; a row is live unless a later segment
+    replaced or deleted its ID.
+    """
+
+    def __init__(self, base, segments):
+        self.base = base
+        self.generation = base.generation
+        self.segments = [name for name, _, _ in segments]
+        self.components = base.components
+        self.centroids = base.centroids
+        self.assignments = base.assignments
+        self.lists = base.lists
+        self.trained_count = base.trained_count
+        self.blocks = [base.vectors] + [vectors for _, vectors, _ in segments if vectors is not None]
+        self.offsets = np.cumsum([0] + [len(b) for b in self.blocks])
+        self.ids = list(base.ids)
+        self.documents = list(base.documents)
+        self.metadatas = list(base.metadatas)
+        self.positions = {vid: i for i, vid in enumerate(self.ids)}
+        self.live = np.ones(int(self.offsets[-1]), dtype=bool)
+        self.pending = 0  # segment rows and deletions waiting to be merged
+        for _, vectors, meta in segments:
+            for vid in meta.get("deleted", []):
+                row = self.positions.pop(vid, None)
+                if row is not None:
+                    self.live[row] = False
+            for vid, doc, metadata in zip(meta["ids"], meta["documents"], meta["metadatas"]):
+                row = self.positions.get(vid)
+                if row is not None:
+                    self.live[row] = False
+                self.positions[vid] = len(self.ids)
+                self.ids.append(vid)
+                self.documents.append(doc)
+                self.metadatas.append(metadata)
+            self.pending += len(meta["ids"]) + len(meta.get("deleted", []))
+        self.live_rows = np.flatnonzero(self.live)
+
+    def row_vectors(self, rows):
+        """float32 vectors of the given rows, gathered across base and segments."""
+        rows = np.asarray(rows, dtype=int)
+        out = np.empty((len(rows), self.blocks[0].shape[1]), dtype=np.float32)
+        block_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        for b, block in enumerate(self.blocks):
+            mask = block_of == b
+            if mask.any():
+                out[mask] = block[rows[mask] - self.offsets[b]]
+        return out
+
+    def nbytes(self):
+        arrays = self.blocks + [self.centroids, self.assignments, self.components]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+
+def matches_where(metadata, where):
+    """Evaluate a Chroma-style metadata filter against one metadata dict."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _matches_condition(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, expected in condition.items():
+        if op == "$eq":
+            ok = value == expected
+        elif op == "$ne":
+            ok = value != expected
+        elif op == "$in":
+            ok = value in expected
+        elif op == "$nin":
+            ok = value not in expected
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            ok = {"$gt": value > expected, "$gte": value >= expected,
+                  "$lt": value < expected, "$lte": value <= expected}[op]
+        else:
+            raise ValueError(f"Unsupported where operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def kmeans(vectors, n_clusters, seed=0):
+    """Spherical k-means on a sample; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = sample[labels == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids /= np.clip(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12, None)
+    return centroids
+
+
+def fit_projection(vectors, dim, seed=0):
+    """
+    Top `dim` principal directions of unit vectors, uncentred so that dot
+    products (cosine similarity) are preserved as far as possible.
+    """
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    _, _, vt = np.linalg.svd(np.asarray(sample, dtype=np.float32), full_matrices=False)
+    return np.ascontiguousarray(vt[:dim], dtype=np.float32)
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def _project(vectors, components):
+    return vectors if components is None else _normalise(vectors @ components.T)
+
+
+class NumpyCollection:
+    """
+    File-backed vector collection exposing the subset of the Chroma
+    Collection API the store, search and compaction code use: count, upsert,
+    delete, get and query.
+    """
+
+    def __init__(self, path, name, dtype="float32", ivf_threshold=100000, nprobe=16, pca_dim=0,
+                 pca_min_rows=2000):
+        self.path = path
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.pca_dim = pca_dim
+        self.pca_min_rows = pca_min_rows
+
+    # ---------------- Loading ----------------
+
+    def _manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _state(self):
+        """Current generation and segments, loaded once per process and reused until they change."""
+        manifest = self._manifest()
+        if manifest is None:
+            return None
+        segments = manifest.get("segments", [])
+        with _states_lock:
+            state = _states.get(self.path)
+            if state is not None and state.generation == manifest["generation"] and state.segments == segments:
+                return state
+            base = state.base if state is not None and state.generation == manifest["generation"] else None
+        try:
+            state = self._load(manifest, base)
+        except OSError:
+            # A writer swapped generations between reading the manifest and the files
+            state = self._load(self._manifest(), None)
+        with _states_lock:
+            _states[self.path] = state
+        return state
+
+    def _load(self, manifest, base=None):
+        generation = manifest["generation"]
+        if base is None:
+            vectors = np.load(os.path.join(self.path, f"vectors.{generation}.npy"), mmap_mode="r")
+            with open(os.path.join(self.path, f"meta.{generation}.json")) as f:
+                meta = json.load(f)
+            ivf = None
+            ivf_path = os.path.join(self.path, f"ivf.{generation}.npz")
+            if os.path.exists(ivf_path):
+                with np.load(ivf_path) as data:
+                    ivf = {"centroids": data["centroids"], "assignments": data["assignments"],
+                           "trained_count": int(data["trained_count"])}
+            components = None
+            pca_path = os.path.join(self.path, f"pca.{generation}.npy")
+            if os.path.exists(pca_path):
+                components = np.load(pca_path)
+            base = _Base(generation, vectors, meta["ids"], meta["documents"], meta["metadatas"], ivf, components)
+        segments = []
+        for name in manifest.get("segments", []):
+            with open(os.path.join(self.path, f"{name}.json")) as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(self.path, f"{name}.npy")) if meta["ids"] else None
+            segments.append((name, vectors, meta))
+        return _State(base, segments)
+
+    def count(self):
+        manifest = self._manifest()
+        return manifest["count"] if manifest else 0
+
+    def projection(self):
+        """The PCA basis stored vectors are reduced with, or None."""
+        state = self._state()
+        return state.components if state is not None else None
+
+    def nbytes(self):
+        """Size of the loaded vectors, IVF lists and projection."""
+        state = self._state()
+        return state.nbytes() if state is not None else 0
+
+    # ---------------- Writing ----------------
+    # Upserts and deletes append a small delta segment (new rows and/or
+    # deleted IDs) and swap the manifest; the generation files are only
+    # rewritten when segments are merged: once there are MAX_SEGMENTS of
+    # them, they hold more than SEGMENT_MERGE_FRACTION of the base rows, or
+    # on compact().
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        ids = list(ids)
+        if not ids:
+            return
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        # A repeated ID within one call keeps its last occurrence
+        last = {vid: src for src, vid in enumerate(ids)}
+        keep = sorted(last.values())
+        new_vectors = _normalise(embeddings)[keep]
+        ids = [ids[src] for src in keep]
+        documents = [documents[src] for src in keep]
+        metadatas = [metadatas[src] for src in keep]
+
+        with self._write_lock():
+            state = self._state()
+            if state is None:
+                self._write(None, new_vectors, ids, documents, metadatas, None, None, 0)
+                return
+            new_vectors = _project(new_vectors, state.components)
+            self._append_segment(state, {"ids": ids, "documents": documents, "metadatas": metadatas},
+                                 new_vectors)
+
+    def delete(self, ids=None):
+        ids = set(ids or [])
+        with self._write_lock():
+            state = self._state()
+            if state is None or not ids:
+                return
+            deleted = [vid for vid in ids if vid in state.positions]
+            if deleted:
+                self._append_segment(state, {"ids": [], "documents": [], "metadatas": [], "deleted": deleted})
+
+    def compact(self):
+        """Merge segments into a new generation and remove every older file."""
+        with self._write_lock():
+            state = self._state()
+            if state is not None:
+                self._merge(state, keep_previous=False)
+
+    def _write_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        return FileLock(os.path.join(self.path, "write.lock"))
+
+    def _append_segment(self, state, meta, vectors=None):
+        pending = state.pending + len(meta["ids"]) + len(meta.get("deleted", []))
+        count = len(state.positions) + sum(vid not in state.positions for vid in meta["ids"]) \
+            - len(meta.get("deleted", []))
+        name = f"delta.{state.generation}.{len(state.segments) + 1}"
+        if vectors is not None:
+            np.save(os.path.join(self.path, f"{name}.npy"), vectors.astype(self.dtype))
+        with open(os.path.join(self.path, f"{name}.json"), "w") as f:
+            json.dump(meta, f)
+        self._write_manifest(state.generation, count, state.centroids, state.components, state.segments + [name])
+        if pending > max(SEGMENT_MIN_ROWS, SEGMENT_MERGE_FRACTION * len(state.base.ids)) \
+                or len(state.segments) + 1 >= MAX_SEGMENTS \
+                or (state.centroids is None and count > self.ivf_threshold) \
+                or (state.components is None and 0 < self.pca_dim < state.blocks[0].shape[1]
+                    and count >= self.pca_min_rows):
+            self._merge(self._state())
+
+    def _merge(self, state, keep_previous=True):
+        rows = state.live_rows
+        vectors = state.row_vectors(rows)
+        assignments = None
+        if state.centroids is not None:
+            n_base = len(state.base.ids)
+            assignments = np.empty(len(rows), dtype=np.int32)
+            in_base = rows < n_base
+            assignments[in_base] = state.assignments[rows[in_base]]
+            if (~in_base).any():
+                assignments[~in_base] = np.argmax(vectors[~in_base] @ state.centroids.T, axis=1)
+        self._write(state, vectors, [state.ids[i] for i in rows], [state.documents[i] for i in rows],
+                    [state.metadatas[i] for i in rows], state.centroids, assignments, state.trained_count,
+                    state.components, keep_previous=keep_previous)
+
+    def _write(self, previous, vectors, ids, documents, metadatas, centroids, assignments, trained_count,
+               components=None, keep_previous=True):
+        generation = (previous.generation + 1) if previous else 1
+        count = len(ids)
+
+        if components is None and 0 < self.pca_dim < vectors.shape[1] and count >= self.pca_min_rows:
+            components = fit_projection(vectors, self.pca_dim)
+            vectors = _project(vectors, components)
+            centroids = assignments = None  # trained in the old space
+
+        if count > self.ivf_threshold:
+            # (Re)cluster when the index first crosses the threshold or has
+            # doubled since the centroids were trained
+            if centroids is None or count > 2 * trained_count:
+                centroids = kmeans(vectors, max(1, int(np.sqrt(count))))
+                assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+                trained_count = count
+        else:
+            centroids = assignments = None
+
+        np.save(os.path.join(self.path, f"vectors.{generation}.npy"), vectors.astype(self.dtype))
+        with open(os.path.join(self.path, f"meta.{generation}.json"), "w") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+        if centroids is not None:
+            np.savez(os.path.join(self.path, f"ivf.{generation}.npz"),
+                     centroids=centroids.astype(np.float32), assignments=assignments.astype(np.int32),
+                     trained_count=np.int64(trained_count))
+        if components is not None:
+            np.save(os.path.join(self.path, f"pca.{generation}.npy"), components)
+
+        self._write_manifest(generation, count, centroids, components, [])
+        self._remove_old_generations(generation - 1 if keep_previous else generation)
+
+    def _write_manifest(self, generation, count, centroids, components, segments):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix="manifest.")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"generation": generation, "count": count, "dtype": self.dtype.name,
+                       "ivf": centroids is not None,
+                       "pca_dim": int(components.shape[0]) if components is not None else None,
+                       "segments": segments}, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def _remove_old_generations(self, keep_from):
+        # The previous generation is kept for readers that are still opening
+        # it; files still mapped by a reader (Windows) are removed on a later write
+        for name in os.listdir(self.path):
+            parts = name.split(".")
+            if len(parts) >= 3 and parts[0] in ("vectors", "meta", "ivf", "pca", "delta") and parts[1].isdigit() \
+                    and int(parts[1]) < keep_from:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    # ---------------- Reading ----------------
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        """Like Collection.get; embeddings are returned as stored (reduced when PCA is on)."""
+        state = self._state()
+        if state is None:
+            rows = []
+        elif ids is not None:
+            rows = [state.positions[vid] for vid in ids if vid in state.positions]
+        else:
+            rows = state.live_rows.tolist()
+        if where and state is not None:
+            rows = [i for i in rows if matches_where(state.metadatas[i] or {}, where)]
+        rows = list(rows)[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+        result = {"ids": [state.ids[i] for i in rows] if state else []}
+        if "documents" in include:
+            result["documents"] = [state.documents[i] for i in rows] if state else []
+        if "metadatas" in include:
+            result["metadatas"] = [state.metadatas[i] for i in rows] if state else []
+        if "embeddings" in include:
+            result["embeddings"] = state.row_vectors(rows) if state else []
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        state = self._state()
+        queries = _normalise(query_embeddings)
+        if state is not None:
+            queries = _project(queries, state.components)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in queries:
+            rows, scores = self._search(state, query, n_results, where) if state else ([], [])
+            result["ids"].append([state.ids[i] for i in rows])
+            result["documents"].append([state.documents[i] for i in rows])
+            result["metadatas"].append([state.metadatas[i] for i in rows])
+            result["distances"].append([float(2 - 2 * s) for s in scores])
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+    def _candidates(self, state, query):
+        if state.centroids is None:
+            return None
+        nearest = np.argsort(-(state.centroids @ query))[:self.nprobe]
+        # Segment rows are not in the IVF lists and are always scanned
+        rows = np.concatenate([state.lists[c] for c in nearest] + [np.arange(len(state.base.ids), len(state.ids))])
+        rows = np.sort(rows)
+        return rows[state.live[rows]]
+
+    def _search(self, state, query, k, where):
+        rows = self._candidates(state, query)
+        if where:
+            allowed = [i for i in (rows if rows is not None else state.live_rows)
+                       if matches_where(state.metadatas[i] or {}, where)]
+            rows = np.array(allowed, dtype=int)
+
+        if rows is None:
+            scores = np.concatenate([
+                np.asarray(block[i:i + SCORE_BLOCK], dtype=np.float32) @ query
+                for block in state.blocks for i in range(0, len(block), SCORE_BLOCK)
+            ]) if len(state.ids) else np.empty(0, dtype=np.float32)
+            rows = state.live_rows
+            scores = scores[rows]
+        else:
+            scores = state.row_vectors(rows) @ query if len(rows) else np.empty(0)
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top].tolist(), scores[top].tolist()
+
+
+def list_collections(root):
+    try:
+        return [name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, MANIFEST))]
+    except OSError:
+        return []
+
+
+def forget(root):
+    """Release the loaded (memory-mapped) collections under a directory."""
+    with _states_lock:
+        for path in [p for p in _states if p.startswith(root)]:
+            del _states[path]
+
+
+def delete_collection(root, name):
+    path = os.path.join(root, name)
+    with _states_lock:
+        _states.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
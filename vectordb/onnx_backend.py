@@ -0,0 +1,76 @@
+import logging
+import os
+
+import numpy as np
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from transformers import AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+HF_REPO = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256  # same truncation as the SentenceTransformer model
+
+
+def get_onnx_model_path(model_dir, quantize=False):
+    """
+    Return the path of the ONNX export of all-MiniLM-L6-v2, downloading it
+    from the Hugging Face hub once. The int8 variant is produced locally with
+    dynamic quantization and stored next to it.
+    """
+    fp32_path = hf_hub_download(HF_REPO, "onnx/model.onnx")
+    if not quantize:
+        return fp32_path
+
+    int8_path = os.path.join(model_dir, "all-MiniLM-L6-v2-int8.onnx")
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(model_dir, exist_ok=True)
+        logger.info(f"⚙️ Quantizing {fp32_path} to int8 at {int8_path}")
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+class OnnxEmbedder:
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime (CPU). Reproduces the SentenceTransformer
+    pipeline: tokenize, transformer, mean pooling over the attention mask,
+    L2 normalisation.
+    """
+
+    def __init__(self, model_dir, quantize=False, intra_op_threads=0):
+        self.model_path = get_onnx_model_path(model_dir, quantize=quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(HF_REPO)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def encode(self, texts, batch_size=64):
+        out = []
+        for i in range(0, len(texts), batch_size):
+            out.append(self._encode_batch(texts[i:i + batch_size]))
+        return np.concatenate(out).astype(np.float32) if out else np.empty((0, 0), dtype=np.float32)
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        outputs = dict(zip(self.output_names, self.session.run(None, feeds)))
+
+        if "sentence_embedding" in outputs:
+            embeddings = outputs["sentence_embedding"]
+        else:
+            token_embeddings = outputs.get("last_hidden_state", next(iter(outputs.values())))
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
@@ -0,0 +1,257 @@
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from CoreApplication.models import Product, ProductVariant
+from vectordb.search_cache import LRUCache, embed_query
+from vectordb.store import get_entity_collection, get_index_version
+
+# -----------------------------
+# Catalogue search
+# -----------------------------
+# Semantic search over the product and variant vectors only, with structured
+# pre-filters (vendor, product_type, price range, in stock) and no LLM call.
+#
+# Metadata filters evaluated inside the index run row by row, which costs
+# hundreds of milliseconds on a 50k-variant catalogue. Instead each process
+# keeps the tenant's product/variant vectors as one matrix with the filter
+# fields as columns, so a filtered search is a boolean mask plus a single
+# matrix-vector product. The matrix is rebuilt from the index when the
+# tenant's index version changes, at most every VECTOR_CATALOGUE_REFRESH_SECONDS.
+
+# Variant neighbours taken per product requested, so grouping still yields
+# k products when several variants of one product match
+VARIANTS_PER_PRODUCT = 3
+PAGE_SIZE = 5000
+
+catalogues = LRUCache(settings.VECTOR_CATALOGUE_CACHE_SIZE)
+_build_lock = threading.Lock()
+
+
+def _as_list(value, name):
+    if value in (None, "", []):
+        return None
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+        raise ValueError(f"{name} must be a string or a list of strings")
+    return values
+
+
+def _as_price(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if price < 0:
+        raise ValueError(f"{name} must not be negative")
+    return price
+
+
+def parse_product_filters(data):
+    """Validate the filter fields of a search request; raises ValueError."""
+    filters = {
+        "vendor": _as_list(data.get("vendor"), "vendor"),
+        "product_type": _as_list(data.get("product_type"), "product_type"),
+        "min_price": _as_price(data.get("min_price"), "min_price"),
+        "max_price": _as_price(data.get("max_price"), "max_price"),
+        "in_stock": data.get("in_stock") in (True, "true", "1", 1),
+    }
+    if None not in (filters["min_price"], filters["max_price"]) and filters["min_price"] > filters["max_price"]:
+        raise ValueError("min_price must not be greater than max_price")
+    return filters
+
+
+def _has_variant_filters(filters):
+    return filters["min_price"] is not None or filters["max_price"] is not None or filters["in_stock"]
+
+# ---------------- Catalogue matrix ----------------
+
+
+class CataloguePart:
+    """Vectors and filter columns of one collection (variants or products)."""
+
+    def __init__(self, entity_type, collection):
+        vectors, product_ids, pks, vendors, types, prices, stock = [], [], [], [], [], [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            for metadata in page["metadatas"]:
+                metadata = metadata or {}
+                # Variants point at their product; product vectors are their own product
+                product_ids.append(metadata.get("product_id" if entity_type == "variant" else "shopify_id") or 0)
+                pks.append(metadata.get("id") or 0)
+                vendors.append(metadata.get("vendor") or "")
+                types.append(metadata.get("product_type") or "")
+                prices.append(metadata.get("price") or 0.0)
+                stock.append(metadata.get("inventory_quantity") or 0)
+            offset += len(page["ids"])
+
+        self.entity_type = entity_type
+        self.projection = getattr(collection, "projection", lambda: None)()
+        self.vectors = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        if len(self.vectors):
+            self.vectors /= np.clip(np.linalg.norm(self.vectors, axis=1, keepdims=True), 1e-12, None)
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.pks = np.asarray(pks, dtype=np.int64)
+        self.vendors = np.asarray(vendors, dtype=object)
+        self.product_types = np.asarray(types, dtype=object)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.stock = np.asarray(stock, dtype=np.int64)
+
+    def mask(self, filters):
+        mask = self.product_ids != 0
+        if filters["vendor"]:
+            mask &= np.isin(self.vendors, filters["vendor"])
+        if filters["product_type"]:
+            mask &= np.isin(self.product_types, filters["product_type"])
+        if filters["min_price"] is not None:
+            mask &= self.prices >= filters["min_price"]
+        if filters["max_price"] is not None:
+            mask &= self.prices <= filters["max_price"]
+        if filters["in_stock"]:
+            mask &= self.stock > 0
+        return mask
+
+    def search(self, query, n, filters):
+        """[(product_id, pk, distance)] of the n nearest rows passing the filters."""
+        if not len(self.vectors) or n <= 0:
+            return []
+        if self.projection is not None:
+            query = query @ self.projection.T
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        rows = np.flatnonzero(self.mask(filters))
+        if not len(rows):
+            return []
+        # Scoring every row and masking is cheaper than gathering the rows first
+        scores = (self.vectors @ query)[rows]
+        n = min(n, len(rows))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.product_ids[rows[i]]), int(self.pks[rows[i]]), float(2 - 2 * scores[i])) for i in top]
+
+
+class Catalogue:
+    def __init__(self, company_user_id, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.variants = CataloguePart("variant", get_entity_collection(company_user_id, "variant"))
+        self.products = CataloguePart("product", get_entity_collection(company_user_id, "product"))
+
+
+def get_catalogue(company_user_id):
+    """The tenant's catalogue matrix, rebuilt when stale."""
+    version = get_index_version(company_user_id)
+    catalogue = catalogues.get(company_user_id)
+    if catalogue is not None and (catalogue.version == version or
+                                  time.monotonic() - catalogue.built_at < settings.VECTOR_CATALOGUE_REFRESH_SECONDS):
+        return catalogue
+    with _build_lock:
+        catalogue = catalogues.get(company_user_id)
+        if catalogue is None or catalogue.version != version:
+            catalogue = Catalogue(company_user_id, version)
+            catalogues.put(company_user_id, catalogue)
+    return catalogue
+
+# ---------------- Search ----------------
+# Filters are re-checked on the current DB values: the catalogue can lag
+# behind until the next incremental re-index and refresh.
+
+
+def _product_passes(product, filters):
+    if filters["vendor"] and product.vendor not in filters["vendor"]:
+        return False
+    if filters["product_type"] and product.product_type not in filters["product_type"]:
+        return False
+    return True
+
+
+def _variant_passes(variant, filters):
+    price = variant.price if variant.price is not None else Decimal(0)
+    if filters["min_price"] is not None and price < Decimal(str(filters["min_price"])):
+        return False
+    if filters["max_price"] is not None and price > Decimal(str(filters["max_price"])):
+        return False
+    if filters["in_stock"] and (variant.inventory_quantity or 0) <= 0:
+        return False
+    return True
+
+
+def _variant_to_dict(variant, distance=None):
+    return {
+        "id": variant.id,
+        "shopify_id": variant.shopify_id,
+        "title": variant.title,
+        "sku": variant.sku,
+        "price": float(variant.price) if variant.price is not None else None,
+        "compare_at_price": float(variant.compare_at_price) if variant.compare_at_price is not None else None,
+        "inventory_quantity": variant.inventory_quantity,
+        "distance": distance,
+    }
+
+
+def search_products(company_user_id, query_text, k, filters):
+    """
+    Return up to k products ranked by their closest matching variant (or
+    product) vector, each with its matching variants. At most three DB
+    queries, whatever k is.
+    """
+    catalogue = get_catalogue(company_user_id)
+    query = np.asarray(embed_query(query_text), dtype=np.float32).reshape(-1)
+
+    # Best distance per Shopify product ID, and the variant hits under it
+    ranked, variant_hits = {}, {}
+    for product_id, pk, distance in catalogue.variants.search(query, k * VARIANTS_PER_PRODUCT, filters):
+        ranked[product_id] = min(ranked.get(product_id, distance), distance)
+        variant_hits.setdefault(product_id, []).append((pk, distance))
+    if not _has_variant_filters(filters):
+        for product_id, _, distance in catalogue.products.search(query, k, filters):
+            ranked[product_id] = min(ranked.get(product_id, distance), distance)
+    if not ranked:
+        return []
+
+    products = {
+        p.shopify_id: p for p in Product.objects.filter(company_id=company_user_id, shopify_id__in=list(ranked))
+        .only("shopify_id", "title", "vendor", "product_type", "status")
+    }
+    hit_pks = [pk for hits in variant_hits.values() for pk, _ in hits if pk]
+    variants = ProductVariant.objects.filter(company_id=company_user_id).in_bulk(hit_pks)
+    # Products matched on their own vector list all their variants
+    unmatched = [pid for pid in ranked if pid not in variant_hits and pid in products]
+    siblings = {}
+    if unmatched:
+        for variant in ProductVariant.objects.filter(company_id=company_user_id, product_id__in=unmatched) \
+                .order_by("price"):
+            siblings.setdefault(variant.product_id, []).append(variant)
+
+    results = []
+    for product_id, distance in sorted(ranked.items(), key=lambda item: item[1]):
+        product = products.get(product_id)
+        if product is None or not _product_passes(product, filters):
+            continue
+        if product_id in variant_hits:
+            rows = [_variant_to_dict(variants[pk], d) for pk, d in variant_hits[product_id]
+                    if pk in variants and _variant_passes(variants[pk], filters)]
+            if not rows:
+                continue
+        else:
+            rows = [_variant_to_dict(v) for v in siblings.get(product_id, [])]
+        results.append({
+            "product_id": product.shopify_id,
+            "title": product.title,
+            "vendor": product.vendor,
+            "product_type": product.product_type,
+            "status": product.status,
+            "distance": distance,
+            "variants": rows,
+        })
+        if len(results) == k:
+            break
+    return results
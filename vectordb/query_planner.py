@@ -0,0 +1,221 @@
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+from vectordb.documents import ENTITY_DOCUMENTS, INDEXED_TYPES, build_documents, tenant_queryset
+from vectordb.search_cache import query_index
+
+# "1001", "#1001"
+NUMERIC_TOKEN = re.compile(r"^#?(\d+)$")
+# "TNX0100XTE", "US-FNG0514XC2": letters and digits, optionally dash-separated
+SKU_TOKEN = re.compile(r"^(?=.*[A-Za-z])(?=.*\d)[A-Za-z0-9]+(?:[-_/][A-Za-z0-9]+)*$")
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "and", "or", "is", "are", "was", "with",
+    "show", "find", "get", "me", "id", "no", "number", "sku", "order", "orders", "details",
+    "customer", "customers", "product", "products", "variant", "variants", "item", "items",
+}
+
+# Exact lookups per entity type: columns compared against numeric tokens.
+# Only Shopify identifiers, order numbers and SKUs; all unique or indexed.
+NUMERIC_LOOKUPS = {
+    "order": ("shopify_id", "order_number"),
+    "orderitem": ("shopify_line_item_id", "order_id", "variant_id"),
+    "customer": ("shopify_id",),
+    "product": ("shopify_id",),
+    "variant": ("shopify_id", "product_id", "sku"),
+    "collection": ("shopify_id",),
+    "collectionitem": ("product_id",),
+    "promo": ("variant_id",),
+}
+# Local primary keys are small numbers shared by every table, so "id" is only
+# matched for the entity types the query names ("order 12") or asks for.
+PK_LOOKUP = "id"
+# A bare number is an order's own identifier far more often than its
+# customer's, so orders are matched by customer only when the query names
+# customers ("orders of customer 7770001") or asks for them.
+CUSTOMER_LOOKUPS = {
+    "order": "customer_id",
+}
+# Character columns matched against the raw token text
+STRING_LOOKUPS = {"order_number", "sku"}
+SKU_LOOKUPS = {
+    "variant": "sku",
+}
+MAX_EXACT_PER_TYPE = 50
+
+
+def plan_query(query_text):
+    """
+    Split a search query into exact identifiers and free text.
+
+    Returns {"ids": [int], "skus": [str], "text": str, "named_types": [str],
+    "use_vector": bool}. Pure identifier queries skip the embedding model entirely.
+    """
+    ids, skus, words = [], [], []
+    for token in str(query_text).replace(",", " ").split():
+        numeric = NUMERIC_TOKEN.match(token)
+        if numeric:
+            ids.append(int(numeric.group(1)))
+        elif SKU_TOKEN.match(token):
+            skus.append(token)
+        else:
+            words.append(token)
+
+    text = " ".join(words)
+    meaningful = [w for w in words if w.lower().strip("?.!:") not in STOPWORDS]
+    return {
+        "ids": ids,
+        "skus": skus,
+        "text": text,
+        "named_types": named_types(text),
+        "use_vector": bool(meaningful) or not (ids or skus),
+    }
+
+
+def _numeric_filter(fields, ids):
+    condition = Q()
+    for field in fields:
+        if field in STRING_LOOKUPS:
+            # Shopify order numbers are stored either as "1001" or "#1001"
+            values = [str(i) for i in ids] + [f"#{i}" for i in ids]
+            condition |= Q(**{f"{field}__in": values})
+        else:
+            condition |= Q(**{f"{field}__in": ids})
+    return condition
+
+
+def run_exact_lookups(company_user_id, plan, types=None):
+    """
+    Resolve the plan's IDs and SKUs with indexed ORM queries. Returns matches
+    in the same shape as vector search results, with distance 0.0.
+    """
+    matches = []
+    pk_types = set(types or plan.get("named_types", ()))
+    for entity_type in (types or ENTITY_DOCUMENTS):
+        if entity_type not in ENTITY_DOCUMENTS:
+            continue
+        condition = Q()
+        if plan["ids"] and entity_type in NUMERIC_LOOKUPS:
+            condition |= _numeric_filter(NUMERIC_LOOKUPS[entity_type], plan["ids"])
+        if plan["ids"] and entity_type in pk_types:
+            condition |= Q(**{f"{PK_LOOKUP}__in": plan["ids"]})
+        if plan["ids"] and entity_type in CUSTOMER_LOOKUPS and "customer" in pk_types:
+            condition |= Q(**{f"{CUSTOMER_LOOKUPS[entity_type]}__in": plan["ids"]})
+        if plan["skus"] and entity_type in SKU_LOOKUPS:
+            condition |= Q(**{f"{SKU_LOOKUPS[entity_type]}__in": plan["skus"]})
+        if not condition:
+            continue
+
+        fields = ENTITY_DOCUMENTS[entity_type]["fields"]
+        rows = list(
+            tenant_queryset(entity_type, company_user_id).filter(condition)
+            .values_list(*fields, named=True)[:MAX_EXACT_PER_TYPE])
+        if not rows:
+            continue
+        ids, texts, metadatas = build_documents(entity_type, rows)
+        for vid, text, metadata in zip(ids, texts, metadatas):
+            matches.append({
+                "id": vid,
+                "text": text,
+                "distance": 0.0,
+                "metadata": metadata,
+                "source": "exact",
+            })
+    return matches
+
+
+# ---------------- Collection router ----------------
+# Each indexed type has its own collection; free text only searches the ones
+# the query is about, so e.g. product questions never scan order documents.
+
+TYPE_KEYWORDS = {
+    "order": {"order", "orders", "purchase", "purchases", "fulfilled", "unfulfilled", "fulfillment",
+              "refund", "refunded", "paid", "payment", "discount", "discounted"},
+    "customer": {"customer", "customers", "buyer", "buyers", "client", "clients", "shopper", "shoppers",
+                 "email", "spent", "spend"},
+    "product": {"product", "products", "vendor", "vendors", "brand", "brands", "tag", "tags"},
+    "variant": {"variant", "variants", "sku", "skus", "stock", "inventory", "price", "priced", "cost"},
+    "collection": {"collection", "collections", "category", "categories"},
+    "collectionitem": {"collection", "collections"},
+    "promo": {"promo", "promos", "promotion", "promotions", "campaign", "campaigns", "ad", "ads",
+              "clicks", "impressions", "conversions", "ctr", "cpc"},
+    "skumonth": {"sold", "sales", "sell", "selling", "seller", "sellers", "bestseller", "bestsellers",
+                 "units", "quantity", "revenue", "month", "monthly", "trend", "trends", "demand",
+                 "forecast", "region", "regions"},
+}
+# Used when the query names no entity type: the catalogue, whose size does
+# not grow with order volume. Orders, customers, promotions and monthly SKU
+# sales are only searched when the query names them or asks for them.
+DEFAULT_TYPES = ("collection", "collectionitem", "product", "variant")
+SEARCHABLE_TYPES = tuple(ENTITY_DOCUMENTS) + tuple(t for t in INDEXED_TYPES if t not in ENTITY_DOCUMENTS)
+
+
+def named_types(query_text):
+    """Entity types the query mentions by keyword, e.g. "order 12" -> ["order"]."""
+    words = set(re.findall(r"[a-z]+", str(query_text).lower()))
+    return [t for t in SEARCHABLE_TYPES if TYPE_KEYWORDS.get(t, set()) & words]
+
+
+def parse_types(value):
+    """
+    Validate an explicit "types" parameter (list or comma-separated string).
+    Returns a tuple of entity types, or None when not given.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    types = tuple(dict.fromkeys(str(t).strip().lower() for t in value if str(t).strip()))
+    unknown = [t for t in types if t not in SEARCHABLE_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown types: {', '.join(unknown)}. Valid types: {', '.join(SEARCHABLE_TYPES)}")
+    return types or None
+
+
+def route_types(query_text, types=None):
+    """
+    Pick the collections to search: the explicit types that have vectors
+    (line items are only reachable by exact lookup), or the ones the query
+    is about.
+    """
+    if types:
+        return [t for t in types if t in INDEXED_TYPES]
+    named = named_types(query_text)
+    return [t for t in INDEXED_TYPES if t in named] or list(DEFAULT_TYPES)
+
+
+def run_vector_search(company_user_id, text, k, types):
+    """Nearest-neighbour search over the given entity collections for free text."""
+    return [dict(match, source="vector") for match in query_index(company_user_id, text, k, types)]
+
+
+def clamp_k(value):
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        return settings.VECTOR_SEARCH_DEFAULT_K
+    return max(1, min(k, settings.VECTOR_SEARCH_MAX_K))
+
+
+def search(company_user_id, query_text, k=None, types=None):
+    """
+    Plan and execute a search. Exact matches come first; vector matches for
+    the same document are dropped so each vector ID appears once. Explicit
+    types restrict both; otherwise the router picks the vector collections.
+    """
+    plan = plan_query(query_text)
+    k = clamp_k(k)
+
+    matches = []
+    if plan["ids"] or plan["skus"]:
+        matches = run_exact_lookups(company_user_id, plan, types)
+    if plan["use_vector"]:
+        plan["types"] = route_types(query_text, types)
+        seen = {m["id"] for m in matches}
+        vector_text = plan["text"] if plan["text"] else str(query_text)
+        for match in run_vector_search(company_user_id, vector_text, k, plan["types"]):
+            if match["id"] not in seen:
+                matches.append(match)
+    return plan, matches
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from vectordb.documents import render_documents
+from vectordb.embeddings import embedding_model_key, encode_query
+from vectordb.store import get_entity_collection, get_index_version
+
+
+class LRUCache:
+    """Small thread-safe in-memory LRU with hit/miss counters."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+query_embeddings = LRUCache(settings.VECTOR_QUERY_EMBEDDING_CACHE_SIZE)
+search_results = LRUCache(settings.VECTOR_SEARCH_RESULT_CACHE_SIZE)
+
+
+def _query_hash(query_text):
+    return hashlib.sha1(query_text.strip().encode("utf-8")).hexdigest()
+
+
+def embed_query(query_text):
+    """Query embedding, reused across tenants for identical query text."""
+    key = (embedding_model_key(), _query_hash(query_text))
+    embedding = query_embeddings.get(key)
+    if embedding is None:
+        embedding = encode_query(query_text)
+        query_embeddings.put(key, embedding)
+    return embedding
+
+
+def query_index(company_user_id, query_text, k, types, where=None):
+    """
+    Nearest-neighbour search over the tenant's collections for the given
+    entity types, merged by distance. Served from memory when the same
+    (tenant, query, k, types, filters) was searched since the last write to
+    the tenant's index.
+
+    Returns a list of {"id", "text", "distance", "metadata"} dicts; callers
+    get their own copies and may modify them.
+    """
+    types = tuple(sorted(types))
+    key = (
+        company_user_id,
+        get_index_version(company_user_id),
+        _query_hash(query_text),
+        k,
+        types,
+        json.dumps(where, sort_keys=True, default=str) if where else None,
+    )
+    matches = search_results.get(key)
+    if matches is None:
+        matches = _run_query(company_user_id, query_text, k, types, where)
+        search_results.put(key, matches)
+    return [dict(match, metadata=dict(match["metadata"] or {})) for match in matches]
+
+
+def _run_query(company_user_id, query_text, k, types, where):
+    embedding = None
+    matches = []
+    for entity_type in types:
+        collection = get_entity_collection(company_user_id, entity_type)
+        n_results = min(k, collection.count())
+        if n_results <= 0:
+            continue
+        if embedding is None:
+            embedding = embed_query(query_text).tolist()
+        results = collection.query(
+            query_embeddings=embedding,
+            n_results=n_results,
+            where=where,
+            include=["documents", "distances", "metadatas"],
+        )
+        matches.extend(
+            {"id": vid, "text": doc, "distance": distance, "metadata": metadata}
+            for vid, doc, distance, metadata in zip(
+                results["ids"][0], results["documents"][0], results["distances"][0], results["metadatas"][0])
+        )
+    matches.sort(key=lambda m: m["distance"])
+    matches = matches[:k]
+    # Indexes built without document copies: render the texts from the DB
+    missing = [m["id"] for m in matches if m["text"] is None]
+    if missing:
+        texts = render_documents(company_user_id, missing)
+        for m in matches:
+            if m["text"] is None:
+                m["text"] = texts[m["id"]]
+    return matches
@@ -0,0 +1,157 @@
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from vectordb.documents import INDEXED_TYPES
+from vectordb.embedding_cache import text_hash
+from vectordb.embeddings import embedding_model_key, get_embedding_cache
+from vectordb.store import bump_index_version, drop_collections, entity_collection_name, get_entity_collection
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Tenant index snapshots
+# -----------------------------
+# A snapshot is a zip archive (deflate) with, per entity type and chunk:
+#   {type}/{n}.npy    float32 vectors
+#   {type}/{n}.json   ids, metadatas, documents and sha1 content hashes
+# plus manifest.json (tenant, embedding model, counts). Restoring writes the
+# stored vectors straight into the collections, so nothing is re-embedded,
+# and can seed the embedding cache so a later full training only encodes
+# texts that changed since the snapshot (only for vectors whose document text
+# is stored in the index; the others are exported without a hash).
+
+SNAPSHOT_FORMAT = 1
+EXPORT_PAGE_SIZE = 1000
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def default_snapshot_path(company_user_id):
+    stamp = timezone.now().strftime("%Y%m%d%H%M%S")
+    return os.path.join(settings.VECTOR_SNAPSHOT_DIR, f"tenant_{company_user_id}_{stamp}.zip")
+
+
+def _iter_collection_pages(collection, page_size):
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def export_snapshot(company_user_id, path, page_size=EXPORT_PAGE_SIZE):
+    """Write the tenant's index to `path`; returns the manifest."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    start = time.perf_counter()
+    counts, chunks = {}, {}
+    tmp_path = f"{path}.partial"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for entity_type in INDEXED_TYPES:
+            collection = get_entity_collection(company_user_id, entity_type)
+            if getattr(collection, "projection", lambda: None)() is not None:
+                raise SnapshotError(
+                    f"{entity_type} vectors are PCA-reduced; snapshots hold full vectors only")
+            counts[entity_type] = chunks[entity_type] = 0
+            for page in _iter_collection_pages(collection, page_size):
+                name = f"{entity_type}/{chunks[entity_type]:06d}"
+                with archive.open(f"{name}.npy", "w") as f:
+                    np.lib.format.write_array(f, np.asarray(page["embeddings"], dtype=np.float32))
+                archive.writestr(f"{name}.json", json.dumps({
+                    "ids": page["ids"],
+                    "metadatas": page["metadatas"],
+                    "documents": page["documents"],
+                    # Documents held by reference (VECTOR_STORE_DOCUMENTS off) get no hash: the
+                    # text the vector was embedded from is gone, and hashing today's rendering
+                    # would seed the embedding cache with vectors of outdated texts
+                    "hashes": [text_hash(doc).hex() if doc is not None else None for doc in page["documents"]],
+                }))
+                counts[entity_type] += len(page["ids"])
+                chunks[entity_type] += 1
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "company_user_id": company_user_id,
+            "model": embedding_model_key(),
+            "created_at": timezone.now().isoformat(),
+            "counts": counts,
+            "chunks": chunks,
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    logger.info(f"📦 Exported vector snapshot of tenant {company_user_id} to {path} "
+                f"({sum(counts.values())} vectors, {time.perf_counter() - start:.1f}s)")
+    return manifest
+
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read("manifest.json"))
+
+
+def import_snapshot(path, company_user_id=None, replace=True, warm_cache=True, force=False):
+    """
+    Bulk-load a snapshot into the tenant's index without re-embedding.
+    With `replace`, the tenant's existing collections are dropped first.
+    Returns {entity_type: vectors loaded}.
+    """
+    start = time.perf_counter()
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+        if company_user_id is None:
+            company_user_id = manifest["company_user_id"]
+        elif company_user_id != manifest["company_user_id"] and not force:
+            raise SnapshotError(
+                f"Snapshot belongs to tenant {manifest['company_user_id']}, not {company_user_id}")
+        model_key = embedding_model_key()
+        if manifest["model"] != model_key and not force:
+            raise SnapshotError(f"Snapshot vectors come from {manifest['model']}, this host embeds with {model_key}")
+
+        if replace:
+            drop_collections(company_user_id, [entity_collection_name(company_user_id, t) for t in manifest["counts"]])
+        cache = get_embedding_cache() if warm_cache and manifest["model"] == model_key else None
+
+        loaded = {}
+        for entity_type, n_chunks in manifest["chunks"].items():
+            collection = get_entity_collection(company_user_id, entity_type)
+            loaded[entity_type] = 0
+            for chunk_no in range(n_chunks):
+                name = f"{entity_type}/{chunk_no:06d}"
+                with archive.open(f"{name}.npy") as f:
+                    vectors = np.lib.format.read_array(io.BytesIO(f.read()))
+                rows = json.loads(archive.read(f"{name}.json"))
+                _check_hashes(name, rows)
+                collection.upsert(ids=rows["ids"], embeddings=vectors, metadatas=rows["metadatas"],
+                                  documents=rows["documents"] if settings.VECTOR_STORE_DOCUMENTS else None)
+                if cache is not None:
+                    # Vectors without a stored document (or from older snapshots that
+                    # hashed re-rendered texts) may not match their hash; never cache them
+                    cache.put_many(model_key, [(bytes.fromhex(h), v) for h, v, doc
+                                               in zip(rows["hashes"], vectors, rows["documents"])
+                                               if h and doc is not None])
+                loaded[entity_type] += len(rows["ids"])
+
+    bump_index_version(company_user_id)
+    logger.info(f"📦 Restored vector snapshot {path} into tenant {company_user_id} "
+                f"({sum(loaded.values())} vectors, {time.perf_counter() - start:.1f}s)")
+    return loaded
+
+
+def _check_hashes(name, rows):
+    """Stored document texts must match the content hashes they were exported with."""
+    for vid, doc, expected in zip(rows["ids"], rows["documents"], rows["hashes"]):
+        if doc is not None and expected and text_hash(doc).hex() != expected:
+            raise SnapshotError(f"Content hash mismatch for {vid} in {name}; the snapshot is corrupt")
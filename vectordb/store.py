@@ -0,0 +1,210 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+from vectordb import numpy_index
+from vectordb.documents import parse_vector_id
+from vectordb.index_manager import index_manager
+
+
+def tenant_index_path(company_user_id):
+    return f"{settings.VECTOR_DB_ROOT}/tenant_{company_user_id}"
+
+
+def get_client(company_user_id):
+    return index_manager.client(company_user_id)
+
+
+def numpy_index_path(company_user_id):
+    return os.path.join(tenant_index_path(company_user_id), "numpy")
+
+
+def entity_collection_name(company_user_id, entity_type):
+    return f"tenant_{company_user_id}_{entity_type}"
+
+
+def get_entity_collection(company_user_id, entity_type):
+    """
+    Open (or create) the tenant's collection for one entity type, in the
+    configured VECTOR_BACKEND. Both backends expose the same collection API.
+    """
+    name = entity_collection_name(company_user_id, entity_type)
+    if settings.VECTOR_BACKEND == "numpy":
+        index_manager.touch(company_user_id)
+        return numpy_index.NumpyCollection(
+            os.path.join(numpy_index_path(company_user_id), name), name,
+            dtype=settings.VECTOR_NUMPY_DTYPE,
+            ivf_threshold=settings.VECTOR_NUMPY_IVF_THRESHOLD,
+            nprobe=settings.VECTOR_NUMPY_IVF_NPROBE,
+            pca_dim=settings.VECTOR_NUMPY_PCA_DIM,
+            pca_min_rows=settings.VECTOR_NUMPY_PCA_MIN_ROWS,
+        )
+    return get_client(company_user_id).get_or_create_collection(name=name)
+
+
+def drop_collections(company_user_id, names):
+    """Delete the named collections that exist; returns the dropped names."""
+    dropped = []
+    if settings.VECTOR_BACKEND == "numpy":
+        root = numpy_index_path(company_user_id)
+        for name in numpy_index.list_collections(root):
+            if name in names:
+                numpy_index.delete_collection(root, name)
+                dropped.append(name)
+    # The legacy collections always live in Chroma
+    if os.path.exists(os.path.join(tenant_index_path(company_user_id), "chroma.sqlite3")):
+        client = get_client(company_user_id)
+        existing = {getattr(c, "name", c) for c in client.list_collections()}
+        for name in names:
+            if name in existing:
+                client.delete_collection(name)
+                dropped.append(name)
+    if dropped:
+        bump_index_version(company_user_id)
+    return dropped
+
+
+def drop_obsolete_collections(company_user_id):
+    """
+    Delete collections no longer written to: the tenant_{id} collection that
+    held every entity type before the index was split per type, and the
+    per-line-item collection replaced by SKU-month documents.
+    """
+    return drop_collections(company_user_id, [
+        f"tenant_{company_user_id}",
+        entity_collection_name(company_user_id, "orderitem"),
+    ])
+
+
+COPY_PAGE_SIZE = 5000
+
+
+def rewrite_collection(company_user_id, entity_type):
+    """
+    Rewrite one entity collection with only its live vectors so deleted rows
+    stop taking disk space. NumPy collections merge their delta segments;
+    Chroma collections are copied into a fresh collection that takes the
+    old one's name (Chroma never shrinks an index in place).
+    """
+    collection = get_entity_collection(company_user_id, entity_type)
+    if settings.VECTOR_BACKEND == "numpy":
+        collection.compact()
+        return
+    client = get_client(company_user_id)
+    name = entity_collection_name(company_user_id, entity_type)
+    tmp_name = f"{name}_rewrite"
+    if tmp_name in {getattr(c, "name", c) for c in client.list_collections()}:
+        client.delete_collection(tmp_name)  # left over by an interrupted rewrite
+    fresh = client.create_collection(name=tmp_name, metadata=collection.metadata or None)
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=COPY_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        fresh.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                  metadatas=page["metadatas"])
+        offset += len(page["ids"])
+    client.delete_collection(name)
+    fresh.modify(name=name)
+
+
+def vacuum_chroma(company_user_id):
+    """
+    Give the space of deleted Chroma rows and collections back to the
+    filesystem: VACUUM the SQLite file and remove the segment directories of
+    dropped collections, which Chroma leaves behind.
+    """
+    root = tenant_index_path(company_user_id)
+    path = os.path.join(root, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return
+    index_manager.evict(company_user_id)
+    db = sqlite3.connect(path)
+    try:
+        segments = {row[0] for row in db.execute("SELECT id FROM segments")}
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    for name in os.listdir(root):
+        try:
+            uuid.UUID(name)
+        except ValueError:
+            continue
+        if name not in segments and os.path.isdir(os.path.join(root, name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _group_by_entity(ids, *columns):
+    """Split parallel lists by the entity type prefix of each vector ID."""
+    groups = defaultdict(lambda: [[] for _ in range(len(columns) + 1)])
+    for row in zip(ids, *columns):
+        entity_type = parse_vector_id(row[0])[0]
+        for values, value in zip(groups[entity_type], row):
+            values.append(value)
+    return groups
+
+
+def upsert_vectors(company_user_id, ids, embeddings, documents, metadatas):
+    """
+    Insert or replace vectors, each in its entity type's collection, and
+    invalidate cached search results. With VECTOR_STORE_DOCUMENTS off the
+    texts are not copied into the index; search re-renders them from the DB.
+    """
+    groups = _group_by_entity(ids, list(embeddings), documents, metadatas)
+    for entity_type, (ids_, embeddings_, documents_, metadatas_) in groups.items():
+        get_entity_collection(company_user_id, entity_type).upsert(
+            ids=ids_, embeddings=embeddings_, metadatas=metadatas_,
+            documents=documents_ if settings.VECTOR_STORE_DOCUMENTS else None)
+    bump_index_version(company_user_id)
+
+
+def delete_vectors(company_user_id, ids):
+    """Remove vectors by ID; unknown IDs are ignored."""
+    ids = list(ids)
+    if not ids:
+        return
+    for entity_type, (ids_,) in _group_by_entity(ids).items():
+        get_entity_collection(company_user_id, entity_type).delete(ids=ids_)
+    bump_index_version(company_user_id)
+
+# ---------------- Index version ----------------
+# A token stored next to the tenant index and replaced on every write. Web
+# and Celery processes share it through the filesystem, so search result
+# caches in any process can tell when their entries are stale.
+
+INDEX_VERSION_FILE = "index_version"
+
+
+def bump_index_version(company_user_id):
+    path = tenant_index_path(company_user_id)
+    os.makedirs(path, exist_ok=True)
+    version_path = os.path.join(path, INDEX_VERSION_FILE)
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix=f"{INDEX_VERSION_FILE}.")
+    with os.fdopen(fd, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, version_path)
+
+
+def get_index_version(company_user_id):
+    try:
+        with open(os.path.join(tenant_index_path(company_user_id), INDEX_VERSION_FILE)) as f:
+            return f.read().strip() or "0"
+    except OSError:
+        return "0"
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
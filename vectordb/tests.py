@@ -1,3 +1,485 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from CoreApplication.models import CompanyUser, Customer, Order, OrderLineItem, Product, ProductVariant
+from vectordb import product_search
+from vectordb.aggregates import build_sku_month_documents
+from vectordb.changes import mark_queued, record_changes, reindex_changes, tenants_due
+from vectordb.compaction import compact_tenant_index
+from vectordb.documents import ENTITY_DOCUMENTS, build_documents, tenant_queryset
+from vectordb.index_manager import TenantIndexManager
+from vectordb.models import ProductNeighbour, VectorChange, VectorIndexState
+from vectordb.neighbours import compute_product_neighbours, neighbours_for, top_k_neighbours
+from vectordb.numpy_index import FileLock, NumpyCollection
+from vectordb.query_planner import plan_query, route_types, run_exact_lookups
+from vectordb.snapshots import export_snapshot, import_snapshot
+from vectordb.store import get_entity_collection, upsert_vectors
+
+
+class ExactLookupTests(TestCase):
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        self.order = Order.objects.create(company=self.company, shopify_id=5550001, order_number="#1001")
+        self.customer = Customer.objects.create(company=self.company, shopify_id=7770001)
+
+    def lookup(self, query):
+        return {m["id"] for m in run_exact_lookups(self.company.id, plan_query(query))}
+
+    def test_bare_number_matches_shopify_identifiers_only(self):
+        self.assertEqual(self.lookup("1001"), {f"order_{self.order.id}"})
+        self.assertEqual(self.lookup("7770001"), {f"customer_{self.customer.id}"})
+        self.assertEqual(self.lookup(str(self.customer.id)), set())
+
+    def test_primary_key_needs_the_entity_type(self):
+        self.assertEqual(self.lookup(f"customer {self.customer.id}"), {f"customer_{self.customer.id}"})
+        self.assertEqual(self.lookup(f"order {self.order.id}"), {f"order_{self.order.id}"})
+
+    def test_customer_orders_need_the_customer_named(self):
+        other = Order.objects.create(company=self.company, shopify_id=5550002, order_number="#1002",
+                                     customer_id=1001)
+        self.assertEqual(self.lookup("1001"), {f"order_{self.order.id}"})
+        self.assertEqual(self.lookup("orders of customer 1001"), {f"order_{self.order.id}", f"order_{other.id}"})
+
+
+class RouteTypesTests(SimpleTestCase):
+    def test_free_text_searches_the_catalogue_only(self):
+        self.assertEqual(route_types("silver rings under $50"), ["collection", "collectionitem", "product", "variant"])
+
+    def test_orders_and_sales_only_when_named_or_asked_for(self):
+        self.assertEqual(route_types("unfulfilled orders of silver rings"), ["order"])
+        self.assertEqual(route_types("best sellers last month"), ["skumonth"])
+        self.assertEqual(route_types("silver rings", types=("order", "orderitem")), ["order"])
+
+
+class NumpyCollectionTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.vectors = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+        self.collection = NumpyCollection(os.path.join(self.root, "c"), "c")
+        self.collection.upsert([f"v{i}" for i in range(40)], self.vectors[:40],
+                               documents=[f"doc {i}" for i in range(40)],
+                               metadatas=[{"i": i} for i in range(40)])
+
+    def nearest(self, row, n=1, where=None):
+        return self.collection.query(self.vectors[row:row + 1], n_results=n, where=where)["ids"][0]
+
+    def test_search_returns_nearest_first(self):
+        result = self.collection.query(self.vectors[3:4], n_results=3)
+        self.assertEqual(result["ids"][0][0], "v3")
+        self.assertAlmostEqual(result["distances"][0][0], 0.0, places=5)
+        self.assertEqual(result["distances"][0], sorted(result["distances"][0]))
+        self.assertTrue(all(int(vid[1:]) > 30 for vid in self.nearest(3, n=5, where={"i": {"$gt": 30}})))
+
+    def test_duplicate_ids_keep_last(self):
+        self.collection.upsert(["v1", "new", "v1"], self.vectors[[41, 42, 43]], documents=["a", "b", "c"])
+        self.assertEqual(self.collection.count(), 41)
+        self.assertEqual(self.collection.get(ids=["v1"])["documents"], ["c"])
+        self.assertEqual(self.nearest(43), ["v1"])
+        self.assertNotIn("v1", self.nearest(41, n=3))
+
+    def test_delete(self):
+        self.collection.delete(ids=["v3", "missing"])
+        self.assertEqual(self.collection.count(), 39)
+        self.assertNotIn("v3", self.nearest(3, n=5))
+        self.assertEqual(self.collection.get(ids=["v3"])["ids"], [])
+        self.collection.upsert(["v3"], self.vectors[3:4])
+        self.assertEqual(self.nearest(3), ["v3"])
+
+    def test_writes_append_segments_until_compacted(self):
+        base = os.path.join(self.collection.path, "vectors.1.npy")
+        mtime = os.path.getmtime(base)
+        self.collection.upsert(["v44"], self.vectors[44:45])
+        self.collection.delete(ids=["v0"])
+        self.assertEqual(os.path.getmtime(base), mtime)
+        self.assertEqual(len(self.collection._manifest()["segments"]), 2)
+
+        self.collection.compact()
+        self.assertEqual(sorted(os.listdir(self.collection.path)), ["manifest.json", "meta.2.json", "vectors.2.npy"])
+        self.assertEqual(self.collection.count(), 40)
+        self.assertEqual(self.collection.get()["ids"], [f"v{i}" for i in range(1, 40)] + ["v44"])
+        self.assertEqual(self.nearest(44), ["v44"])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = override_settings(VECTOR_DB_ROOT=root, VECTOR_BACKEND="numpy")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        product_search.catalogues.clear()
+        self.addCleanup(product_search.catalogues.clear)
+
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        Product.objects.create(company=self.company, shopify_id=11, title="Moon ring", vendor="Luna",
+                               product_type="Rings")
+        Product.objects.create(company=self.company, shopify_id=12, title="Sun necklace", vendor="Sol",
+                               product_type="Necklaces")
+        self.cheap = ProductVariant.objects.create(company=self.company, shopify_id=201, product_id=11, sku="R-S",
+                                                   price=40, inventory_quantity=5)
+        self.dear = ProductVariant.objects.create(company=self.company, shopify_id=202, product_id=11, sku="R-G",
+                                                  price=80, inventory_quantity=0)
+        self.necklace = ProductVariant.objects.create(company=self.company, shopify_id=203, product_id=12,
+                                                      sku="N-S", price=30, inventory_quantity=2)
+        self.index("variant", {self.cheap.id: [1, 0, 0, 0], self.dear.id: [0.9, 0.1, 0, 0],
+                               self.necklace.id: [0.6, 0.4, 0, 0]})
+        self.index("product", {p.id: [0, 0, 1, 0] for p in Product.objects.filter(company=self.company)})
+        # The closest vector of all is an order's, which catalogue search must not see
+        order = Order.objects.create(company=self.company, shopify_id=900, order_number="#900")
+        self.index("order", {order.id: [1, 0, 0, 0]})
+
+        patcher = mock.patch.object(product_search, "embed_query", return_value=[1.0, 0, 0, 0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def index(self, entity_type, vectors):
+        fields = ENTITY_DOCUMENTS[entity_type]["fields"]
+        rows = list(tenant_queryset(entity_type, self.company.id).filter(pk__in=list(vectors))
+                    .values_list(*fields, named=True))
+        ids, texts, metadatas = build_documents(entity_type, rows)
+        upsert_vectors(self.company.id, ids, np.array([vectors[row.id] for row in rows], dtype=np.float32),
+                       texts, metadatas)
+
+    def search(self, **filters):
+        data = product_search.parse_product_filters(filters)
+        return [(p["product_id"], [v["shopify_id"] for v in p["variants"]])
+                for p in product_search.search_products(self.company.id, "silver ring", 5, data)]
+
+    def test_products_ranked_by_closest_variant(self):
+        self.assertEqual(self.search(), [(11, [201, 202]), (12, [203])])
+
+    def test_vendor_and_product_type_filters(self):
+        self.assertEqual(self.search(vendor="Sol"), [(12, [203])])
+        self.assertEqual(self.search(product_type=["Rings", "Bracelets"]), [(11, [201, 202])])
+        self.assertEqual(self.search(vendor="Luna", product_type="Necklaces"), [])
+
+    def test_price_range_filters_variants(self):
+        self.assertEqual(self.search(max_price="50"), [(11, [201]), (12, [203])])
+        self.assertEqual(self.search(min_price=50), [(11, [202])])
+        self.assertEqual(self.search(min_price=35, max_price=45), [(11, [201])])
+
+    def test_in_stock_filter_uses_current_stock(self):
+        self.assertEqual(self.search(in_stock="true"), [(11, [201]), (12, [203])])
+        # The catalogue still has the old stock until the next re-index
+        ProductVariant.objects.filter(id=self.necklace.id).update(inventory_quantity=0)
+        self.assertEqual(self.search(in_stock=True), [(11, [201])])
+
+    def test_only_product_and_variant_collections_are_searched(self):
+        with mock.patch.object(product_search, "get_entity_collection", wraps=get_entity_collection) as opened:
+            self.search()
+        self.assertEqual({c.args[1] for c in opened.call_args_list}, {"product", "variant"})
+
+    def test_invalid_filters(self):
+        for filters in ({"min_price": "cheap"}, {"max_price": -1}, {"min_price": 50, "max_price": 10},
+                        {"vendor": [1, 2]}):
+            with self.assertRaises(ValueError):
+                product_search.parse_product_filters(filters)
+
+    def test_view(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.company)}")
+        response = client.post(reverse("vector_product_search"), {"query": "silver ring", "max_price": 50},
+                               format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["product_id"] for p in response.data["products"]], [11, 12])
+        self.assertEqual(response.data["filters"]["max_price"], 50.0)
+
+        response = client.post(reverse("vector_product_search"), {"query": "ring", "min_price": 9, "max_price": 1},
+                               format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class TopKNeighboursTests(SimpleTestCase):
+    def test_blocks_match_brute_force_without_self(self):
+        vectors = np.random.default_rng(1).normal(size=(37, 6)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        indices, scores = top_k_neighbours(vectors, 4, block_size=8)
+
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        expected = np.argsort(-similarity, axis=1)[:, :4]
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_allclose(scores, np.take_along_axis(similarity, expected, axis=1), rtol=1e-5)
+        self.assertFalse((indices == np.arange(37)[:, None]).any())
+
+    def test_k_is_limited_to_the_other_rows(self):
+        vectors = np.eye(3, dtype=np.float32)
+        self.assertEqual(top_k_neighbours(vectors, 10)[0].shape, (3, 2))
+        self.assertEqual(top_k_neighbours(vectors[:1], 10)[0].shape, (1, 0))
+
+
+class ProductNeighbourTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = override_settings(VECTOR_DB_ROOT=root, VECTOR_BACKEND="numpy")
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        self.other = CompanyUser.objects.create(company="Other", email="other@example.com")
+        vectors = {11: [1, 0, 0], 12: [0.9, 0.1, 0], 13: [0.5, 0.5, 0], 14: [0, 0, 1]}
+        for shopify_id, vector in vectors.items():
+            self.add_product(self.company, shopify_id, vector, stock=0 if shopify_id == 12 else 3)
+        # Another tenant's product right next to 11
+        self.add_product(self.other, 21, [1, 0.01, 0], stock=3)
+
+    def add_product(self, company, shopify_id, vector, stock):
+        product = Product.objects.create(company=company, shopify_id=shopify_id, title=f"P{shopify_id}")
+        ProductVariant.objects.create(company=company, shopify_id=shopify_id * 10, product_id=shopify_id,
+                                      inventory_quantity=stock)
+        rows = list(tenant_queryset("product", company.id).filter(pk=product.pk)
+                    .values_list(*ENTITY_DOCUMENTS["product"]["fields"], named=True))
+        ids, texts, metadatas = build_documents("product", rows)
+        upsert_vectors(company.id, ids, np.array([vector], dtype=np.float32), texts, metadatas)
+
+    def stored(self, company, product_id):
+        return list(ProductNeighbour.objects.filter(company=company, product_id=product_id)
+                    .values_list("neighbour_id", flat=True))
+
+    def test_top_k_per_product_within_the_tenant(self):
+        self.assertEqual(compute_product_neighbours(self.company.id, k=2), 4)
+        self.assertEqual(self.stored(self.company, 11), [12, 13])
+        self.assertEqual(ProductNeighbour.objects.filter(company=self.company).count(), 8)
+        self.assertFalse(ProductNeighbour.objects.filter(company=self.company, neighbour_id=21).exists())
+
+        compute_product_neighbours(self.other.id, k=2)
+        self.assertEqual(self.stored(self.other, 21), [])
+        # Recomputing replaces the tenant's rows only
+        compute_product_neighbours(self.company.id, k=1)
+        self.assertEqual(self.stored(self.company, 11), [12])
+        self.assertEqual(ProductNeighbour.objects.filter(company=self.company).count(), 4)
+
+    def test_lookup_limit_and_in_stock(self):
+        compute_product_neighbours(self.company.id, k=3)
+        self.assertEqual(self.found(11), [12, 13, 14])
+        self.assertEqual(self.found(11, limit=1), [12])
+        self.assertEqual(self.found(11, in_stock_only=True), [13, 14])
+        self.assertEqual(neighbours_for(self.other.id, [11]), {})
+
+    def found(self, product_id, **options):
+        return [e["product_id"] for e in neighbours_for(self.company.id, [product_id], **options)[product_id]]
+
+
+class FileLockTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.path = os.path.join(root, "write.lock")
+
+    def test_lock_held_past_the_timeout_is_not_taken_over(self):
+        acquired, timed_out = [], []
+
+        def second_writer():
+            try:
+                with FileLock(self.path, timeout=0.2):
+                    acquired.append(time.monotonic())
+            except TimeoutError:
+                timed_out.append(True)
+
+        with FileLock(self.path, timeout=0.2):
+            waiter = threading.Thread(target=second_writer)
+            waiter.start()
+            time.sleep(0.6)
+            released = time.monotonic()
+        waiter.join()
+        # The lock was never taken from the first writer while it was writing
+        self.assertEqual((acquired, timed_out), ([], [True]))
+        self.assertFalse(os.path.exists(self.path))
+
+        with FileLock(self.path, timeout=0.2):
+            acquired.append(time.monotonic())
+        self.assertGreater(acquired[0], released)
+
+    def test_dead_writers_lock_is_taken_over_and_not_removed_by_it(self):
+        dead = FileLock(self.path, timeout=0.2)
+        dead.__enter__()
+        dead._released.set()  # the holder stops touching the lock, as if it died
+        dead._heartbeat.join()
+        os.utime(self.path, (time.time() - 10, time.time() - 10))
+
+        with FileLock(self.path, timeout=0.2) as writer:
+            dead.__exit__(None, None, None)
+            with open(self.path) as f:
+                self.assertEqual(f.read(), writer.token)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class ChangeTrackingTests(TestCase):
+    def setUp(self):
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        self.other = CompanyUser.objects.create(company="Other", email="other@example.com")
+        self.now = timezone.now()
+
+    def record_at(self, when, company, keys, entity_type="customer"):
+        with mock.patch("vectordb.changes.timezone.now", return_value=when):
+            record_changes(company.id, entity_type, keys)
+
+    def test_repeated_changes_only_move_changed_at(self):
+        self.record_at(self.now - timedelta(hours=2), self.company, [1, 2, None])
+        self.record_at(self.now, self.company, [2, 3])
+
+        changes = {c.object_key: c for c in VectorChange.objects.filter(company=self.company)}
+        self.assertEqual(sorted(changes), [1, 2, 3])
+        self.assertEqual(changes[2].created_at, self.now - timedelta(hours=2))
+        self.assertEqual(changes[2].changed_at, self.now)
+        self.assertEqual(changes[1].changed_at, self.now - timedelta(hours=2))
+
+    def test_tenants_are_due_by_count_or_age(self):
+        self.record_at(self.now, self.company, [1, 2, 3])
+        self.record_at(self.now - timedelta(minutes=5), self.other, [1])
+        self.assertEqual(tenants_due(threshold=3, max_age_minutes=60), [self.company.id])
+
+        self.record_at(self.now - timedelta(minutes=90), self.other, [2])
+        self.assertEqual(sorted(tenants_due(threshold=3, max_age_minutes=60)), [self.company.id, self.other.id])
+
+    def test_queued_tenant_is_skipped_until_built_or_requeue_window_passes(self):
+        self.record_at(self.now, self.company, [1])
+        mark_queued(self.company.id)
+        self.assertEqual(tenants_due(threshold=1, max_age_minutes=60), [])
+
+        # The queued task was lost
+        VectorIndexState.objects.filter(company=self.company).update(
+            reindex_queued_at=self.now - timedelta(minutes=61))
+        self.assertEqual(tenants_due(threshold=1, max_age_minutes=60, requeue_after_minutes=60), [self.company.id])
+
+        # The queued task ran, and new changes came in since
+        VectorIndexState.objects.filter(company=self.company).update(
+            reindex_queued_at=self.now - timedelta(minutes=5), last_incremental_at=self.now - timedelta(minutes=1))
+        self.assertEqual(tenants_due(threshold=1, max_age_minutes=60), [self.company.id])
+
+    def test_rows_changed_during_a_run_are_left_for_the_next(self):
+        self.record_at(self.now - timedelta(minutes=5), self.company, [1, 2])
+        self.record_at(self.now - timedelta(minutes=5), self.other, [1])
+
+        def reindex_rows(company_user_id, entity_type, keys):
+            # A webhook changes row 2 again while the run is embedding it
+            self.record_at(timezone.now() + timedelta(seconds=1), self.company, [2])
+            return len(keys)
+
+        with mock.patch("vectordb.changes._reindex_rows", side_effect=reindex_rows) as reindex:
+            counts = reindex_changes(self.company.id, chunk_size=500)
+
+        reindex.assert_called_once_with(self.company.id, "customer", [1, 2])
+        self.assertEqual(counts, {"customer": 2})
+        self.assertEqual(list(VectorChange.objects.filter(company=self.company).values_list("object_key", flat=True)),
+                         [2])
+        self.assertEqual(VectorChange.objects.filter(company=self.other).count(), 1)
+        state = VectorIndexState.objects.get(company=self.company)
+        self.assertEqual(state.rows_reindexed, 2)
+        self.assertIsNotNone(state.last_incremental_at)
+
+    @override_settings(VECTOR_REINDEX_THRESHOLD=2, VECTOR_REINDEX_MAX_AGE_MINUTES=60)
+    def test_scheduler_queues_due_tenants_once(self):
+        from CoreApplication.views import reindex_vector_changes_task, schedule_vector_reindexing
+
+        self.record_at(self.now, self.company, [1, 2])
+        self.record_at(self.now, self.other, [1])
+        with mock.patch.object(reindex_vector_changes_task, "delay") as delay:
+            schedule_vector_reindexing()
+            schedule_vector_reindexing()
+        delay.assert_called_once_with(self.company.id)
+        self.assertIsNotNone(VectorIndexState.objects.get(company=self.company).reindex_queued_at)
+
+
+class CompactionTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = override_settings(VECTOR_DB_ROOT=root, VECTOR_BACKEND="numpy")
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.company = CompanyUser.objects.create(company="Acme", email="acme@example.com")
+        self.kept = ProductVariant.objects.create(company=self.company, shopify_id=101, product_id=1, sku="A")
+        self.deleted = ProductVariant.objects.create(company=self.company, shopify_id=102, product_id=1, sku="B")
+        for n, (variant, month) in enumerate([(self.kept, 1), (self.kept, 2), (self.deleted, 1)]):
+            Order.objects.create(company=self.company, shopify_id=900 + n, order_number=str(n),
+                                 order_date=timezone.make_aware(datetime(2025, month, 10)))
+            OrderLineItem.objects.create(company=self.company, shopify_line_item_id=800 + n, order_id=900 + n,
+                                         variant_id=variant.shopify_id, quantity=1, price=5)
+        ids, texts, metadatas = build_sku_month_documents(self.company.id, [101, 102])
+        upsert_vectors(self.company.id, ids, np.random.default_rng(0).random((len(ids), 8)), texts, metadatas)
+
+    def test_sku_month_orphans_are_removed_and_space_reclaimed(self):
+        OrderLineItem.objects.filter(order_id=901).delete()  # the kept variant's February sales
+        self.deleted.delete()
+
+        report = compact_tenant_index(self.company.id)
+        self.assertEqual(report["removed_by_type"], {"skumonth": 2})
+        self.assertLess(report["bytes_after"], report["bytes_before"])
+        self.assertEqual(get_entity_collection(self.company.id, "skumonth").get()["ids"], ["skumonth_101_202501"])
+
+
+class IndexManagerStatsTests(SimpleTestCase):
+    def test_tenant_sizes_are_not_shared(self):
+        manager = TenantIndexManager(budget_bytes=10 ** 9)
+        with tempfile.TemporaryDirectory() as root, override_settings(VECTOR_DB_ROOT=root):
+            manager.touch(1)
+            manager.touch(2)
+        self.assertEqual(set(manager.stats()["tenants"]), {"1", "2"})
+        stats = manager.stats(company_user_id=1)
+        self.assertNotIn("tenants", stats)
+        self.assertEqual(stats["tenant_bytes"], 0)
+        self.assertEqual(stats["open_tenants"], 2)
+
+    def test_eviction_closes_the_tenants_chroma_client(self):
+        manager = TenantIndexManager(budget_bytes=10 ** 9)
+        with tempfile.TemporaryDirectory() as root, override_settings(VECTOR_DB_ROOT=root):
+            client = manager.client(1)
+            self.assertIs(manager.client(1), client)
+            client.get_or_create_collection("tenant_1_product")
+
+            manager.evict(1)
+            with self.assertRaises(Exception):
+                client.list_collections()
+            reopened = manager.client(1)
+            self.assertIsNot(reopened, client)
+            self.assertEqual([c.name for c in reopened.list_collections()], ["tenant_1_product"])
+            manager.evict(1)
+
+
+class SnapshotCacheWarmingTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings = override_settings(VECTOR_DB_ROOT=self.root, VECTOR_BACKEND="numpy")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.path = os.path.join(self.root, "snapshot.zip")
+
+    def round_trip(self):
+        upsert_vectors(1, ["product_1", "product_2"], np.eye(2, 8), ["Ring", "Necklace"], [{}, {}])
+        export_snapshot(1, self.path)
+        with zipfile.ZipFile(self.path) as archive:
+            hashes = json.loads(archive.read("product/000000.json"))["hashes"]
+        cache = mock.Mock()
+        with mock.patch("vectordb.snapshots.get_embedding_cache", return_value=cache):
+            import_snapshot(self.path, company_user_id=1)
+        return hashes, cache.put_many.call_args[0][1]
+
+    def test_stored_documents_warm_the_cache(self):
+        hashes, cached = self.round_trip()
+        self.assertTrue(all(hashes))
+        self.assertEqual(len(cached), 2)
+
+    @override_settings(VECTOR_STORE_DOCUMENTS=False)
+    def test_documents_by_reference_are_not_hashed_or_cached(self):
+        hashes, cached = self.round_trip()
+        self.assertEqual(hashes, [None, None])
+        self.assertEqual(cached, [])
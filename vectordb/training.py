@@ -0,0 +1,89 @@
+import queue
+import threading
+
+from django.db import connection
+
+from vectordb.aggregates import iter_sku_month_batches
+from vectordb.documents import ENTITY_DOCUMENTS, build_documents, tenant_queryset
+
+_DONE = object()
+
+
+def iter_row_chunks(queryset, fields, chunk_size):
+    """
+    Yield lists of named rows, one page of at most chunk_size rows at a time.
+
+    Pages are read by primary key (keyset pagination) rather than with
+    QuerySet.iterator(): the MySQL driver buffers the whole result set of an
+    iterator() query client-side, so only paging keeps memory bounded there.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page.values_list(*fields, named=True)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1].id
+
+
+def iter_document_batches(entity_type, company_user_id, chunk_size):
+    """Yield (ids, texts, metadatas) per chunk of one entity type for a tenant."""
+    fields = ENTITY_DOCUMENTS[entity_type]["fields"]
+    for rows in iter_row_chunks(tenant_queryset(entity_type, company_user_id), fields, chunk_size):
+        yield build_documents(entity_type, rows)
+
+
+def iter_index_batches(entity_type, company_user_id, chunk_size):
+    """Document batches for any indexed type, row-backed or aggregate."""
+    if entity_type == "skumonth":
+        return iter_sku_month_batches(company_user_id, chunk_size)
+    return iter_document_batches(entity_type, company_user_id, chunk_size)
+
+
+def prefetch(iterable, depth=2):
+    """
+    Run an iterator in a background thread, keeping at most `depth` items
+    ready ahead of the consumer. Used to read/render the next chunk from the
+    DB while the current chunk is being encoded.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:
+            put(exc)
+        finally:
+            # The producer thread gets its own DB connection; release it
+            connection.close()
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        worker.join()
@@ -1,9 +1,12 @@
 
 
 from django.urls import path
-from .views import GenericVectorSearchView,gemini_chatbot
+from .views import GenericVectorSearchView, ProductNeighboursView, ProductSearchView, VectorIndexStatsView, gemini_chatbot
 
 urlpatterns = [
     path('vectordb/query/', GenericVectorSearchView.as_view(), name='vector_query') ,#Testing Vector DB Both number and text
-    path('trooba_gemini_query/',gemini_chatbot, name='trooba_gemini_query') #Testing gemini 
+    path('trooba_gemini_query/',gemini_chatbot, name='trooba_gemini_query'), #Testing gemini 
+    path('vectordb/index-stats/', VectorIndexStatsView.as_view(), name='vector_index_stats'),
+    path('vectordb/products/search/', ProductSearchView.as_view(), name='vector_product_search'),
+    path('vectordb/products/<int:product_id>/neighbours/', ProductNeighboursView.as_view(), name='vector_product_neighbours'),
 ]
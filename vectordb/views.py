@@ -1,17 +1,20 @@
 import os
 import json
+import time
 import requests
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from sentence_transformers import SentenceTransformer
-import chromadb
-from CoreApplication.models import Order, OrderLineItem
 from CoreApplication.views import get_user_from_token
+from vectordb.enrichment import attach_orders_and_line_items
+from vectordb.product_search import catalogues, parse_product_filters, search_products
+from vectordb.query_planner import clamp_k, parse_types, route_types
+from vectordb.index_manager import index_manager
+from vectordb.neighbours import neighbours_for
+from vectordb.search_cache import query_embeddings, query_index, search_results
 
 #Working version 1.0
-# Initialize model once
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Query embeddings come from vectordb.embeddings (configured backend, loaded once)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MAX_CONTEXT_CHARS = 3000  # Limit context size sent to Gemini
@@ -32,9 +35,14 @@ class GenericVectorSearchView(APIView):
 
         print(f"[DEBUG] Received query: {query_text}")
 
+        try:
+            types = parse_types(request.data.get("types"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             # Step 1: Query vector DB
-            matches = self.query_vector_db(user.id, query_text, n_results=MAX_MATCHES)
+            matches = self.query_vector_db(user.id, query_text, n_results=MAX_MATCHES, types=types)
             print(f"[DEBUG] Vector DB returned {len(matches)} matches")
 
             if not matches:
@@ -54,92 +62,19 @@ class GenericVectorSearchView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @staticmethod
-    def query_vector_db(user_id, query_text, n_results=10):
+    def query_vector_db(user_id, query_text, n_results=10, types=None):
         """
-        Query Chroma DB for both Orders and OrderLineItems.
+        Query the tenant's entity collections (explicit types, or the ones
+        the query is about) and attach the referenced Orders/OrderLineItems.
         """
-        folder_path = f"D:/TROOBA_PRODUCTION/chroma_db/tenant_{user_id}"
-        client = chromadb.PersistentClient(path=folder_path)
-        collection_name = f"tenant_{user_id}"
-        vector_collection = client.get_or_create_collection(name=collection_name)
-
-        # Embed the query text
-        query_embedding = model.encode([query_text], convert_to_tensor=False)
-        print(f"[DEBUG] Query embedding generated")
-
-        # Query vector DB
-        results = vector_collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-            include=["documents", "distances", "metadatas"]
-        )
-
-        matches = []
-
-        for i, doc in enumerate(results['documents'][0]):
-            metadata = results['metadatas'][0][i]
-            order_data = None
-            line_item_data = None
-
-            # --- Lookup Order ---
-            order_id = metadata.get("id") or metadata.get("order_id") or metadata.get("shopify_id")
-            if order_id:
-                try:
-                    if isinstance(order_id, int):
-                        order = Order.objects.get(id=order_id, company_id=user_id)
-                    else:
-                        order = Order.objects.get(shopify_id=order_id, company_id=user_id)
-
-                    order_data = {
-                        "id": order.id,
-                        "shopify_id": order.shopify_id,
-                        "order_number": order.order_number,
-                        "order_date": str(order.order_date),
-                        "fulfillment_status": order.fulfillment_status,
-                        "financial_status": order.financial_status,
-                        "currency": order.currency,
-                        "total_price": float(order.total_price),
-                        "subtotal_price": float(order.subtotal_price),
-                        "total_tax": float(order.total_tax),
-                        "total_discount": float(order.total_discount),
-                        "region": order.region,
-                        "created_at": str(order.created_at),
-                        "updated_at": str(order.updated_at)
-                    }
-                except Order.DoesNotExist:
-                    print(f"[DEBUG] Order not found for ID/shopify_id={order_id}")
-
-            # --- Lookup Line Item ---
-            line_item_id = metadata.get("id") or metadata.get("line_item_id") or metadata.get("variant_id")
-            if line_item_id:
-                try:
-                    if isinstance(line_item_id, int):
-                        line_item = OrderLineItem.objects.get(id=line_item_id, company_id=user_id)
-                    else:
-                        line_item = OrderLineItem.objects.filter(variant_id=line_item_id, company_id=user_id).first()
-
-                    if line_item:
-                        line_item_data = {
-                            "id": line_item.id,
-                            "order_id": line_item.order_id,
-                            "product_id": line_item.product_id,
-                            "variant_id": line_item.variant_id,
-                            "quantity": line_item.quantity,
-                            "price": float(line_item.price),
-                            "total": float(line_item.total)
-                        }
-                    else:
-                        print(f"[DEBUG] LineItem not found for variant_id={line_item_id}")
-                except OrderLineItem.DoesNotExist:
-                    print(f"[DEBUG] LineItem not found for ID={line_item_id}")
-
-            matches.append({
-                "text": doc,
-                "distance": results['distances'][0][i],
-                "metadata": metadata,
-                "order": order_data,
-                "line_item": line_item_data
-            })
+        types = route_types(query_text, types)
+        print(f"[DEBUG] Searching collections: {', '.join(types)}")
+        # Cached per (tenant, query, k, types) until the tenant's index changes
+        matches = query_index(user_id, query_text, n_results, types)
+        print(f"[DEBUG] Vector DB search done")
+
+        # Resolve referenced orders/line items for all matches at once
+        attach_orders_and_line_items(user_id, matches)
 
         return matches
 
@@ -190,6 +125,91 @@ class GenericVectorSearchView(APIView):
             return "Failed to get AI answer"
 
 
+class ProductSearchView(APIView):
+    """
+    Catalogue search: product/variant vectors only, optional vendor,
+    product_type, min_price/max_price and in_stock filters, ranked products
+    in the response and no LLM call.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request):
+        user, error_response = get_user_from_token(request)
+        if error_response:
+            return error_response
+
+        query_text = request.data.get("query")
+        if not query_text:
+            return Response({"error": "Query text is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            k = clamp_k(request.data.get("k"))
+            filters = parse_product_filters(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = time.perf_counter()
+        try:
+            products = search_products(user.id, query_text, k, filters)
+        except Exception as e:
+            print(f"[ERROR] Product search failed: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            "products": products,
+            "filters": filters,
+            "took_ms": round((time.perf_counter() - start) * 1000, 1),
+        }, status=status.HTTP_200_OK)
+
+
+class ProductNeighboursView(APIView):
+    """
+    Similar products for one product (Shopify ID), from the table the
+    nightly neighbours job fills. ?limit=N, ?in_stock=true.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, product_id):
+        user, error_response = get_user_from_token(request)
+        if error_response:
+            return error_response
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 50))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        in_stock = request.query_params.get("in_stock") in ("true", "1")
+
+        neighbours = neighbours_for(user.id, [product_id], limit=limit, in_stock_only=in_stock)
+        return Response({
+            "product_id": product_id,
+            "neighbours": neighbours.get(product_id, []),
+        }, status=status.HTTP_200_OK)
+
+
+class VectorIndexStatsView(APIView):
+    """
+    Open tenant indexes, memory budget and cache counters of this worker
+    process. Only the caller's own index size is reported.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        user, error_response = get_user_from_token(request)
+        if error_response:
+            return error_response
+
+        return Response({
+            "pid": os.getpid(),
+            "index_manager": index_manager.stats(company_user_id=user.id),
+            "query_embedding_cache": query_embeddings.stats(),
+            "search_result_cache": search_results.stats(),
+            "catalogue_cache": catalogues.stats(),
+        }, status=status.HTTP_200_OK)
+
+
 import json
 import re
 import requests